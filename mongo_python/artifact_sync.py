@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .artifact_upload import DEFAULT_WORKERS, UploadSummary
+from .log_memo import file_digest
+
+MANIFEST_NAME = ".selene-sync.json"
+CHUNK_SIZE = 1024 * 1024
+
+
+class SyncManifest:
+    """
+    Local record of the sha256 of each file in a results folder, kept in
+    the folder itself. An entry is trusted while the file's size and mtime
+    are unchanged, so unchanged files are not even read on the next sync.
+
+    Parameters:
+        path -- location of the manifest. An unreadable manifest starts empty.
+    """
+
+    def __init__(self, path):
+        self._path = path
+        self._lock = threading.Lock()
+        self._entries = self._load()
+
+    @property
+    def path(self):
+        return self._path
+
+    def digest_for(self, scanned):
+        with self._lock:
+            entry = self._entries.get(scanned.relative_path)
+        if entry and entry[0] == scanned.size and entry[1] == scanned.mtime_ns:
+            return entry[2]
+        return None
+
+    def record(self, scanned, digest):
+        with self._lock:
+            self._entries[scanned.relative_path] = [
+                scanned.size,
+                scanned.mtime_ns,
+                digest,
+            ]
+
+    def save(self):
+        directory = os.path.dirname(os.path.abspath(self._path))
+        with self._lock:
+            data = json.dumps(self._entries, sort_keys=True)
+        handle, temp_path = tempfile.mkstemp(dir=directory, prefix=MANIFEST_NAME)
+        try:
+            with os.fdopen(handle, "w", encoding="utf-8") as fp:
+                fp.write(data)
+            os.replace(temp_path, self._path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def _load(self):
+        try:
+            with open(self._path, encoding="utf-8") as fp:
+                entries = json.load(fp)
+        except (OSError, ValueError):
+            return {}
+        return entries if isinstance(entries, dict) else {}
+
+
+class ArtifactSync:
+    """
+    Uploads only the result files whose content is not already stored
+    under the same relative path in a GridFS bucket. Stored files carry
+    their sha256 in metadata. Files new to the bucket are hashed while
+    they stream; files the bucket already has are hashed first, unless
+    the manifest still knows their digest. A changed file replaces the
+    stored copies of its path.
+
+    Parameters:
+        fs -- GridFS the files are stored in
+        files_collection -- files collection of the bucket, queried for stored copies
+        manifest -- SyncManifest of the results folder
+        workers -- number of upload threads
+        clock -- monotonic time source, replaceable in tests
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        fs,
+        files_collection,
+        manifest,
+        workers=DEFAULT_WORKERS,
+        clock=time.monotonic,
+    ):
+        self._fs = fs
+        self._files_collection = files_collection
+        self._manifest = manifest
+        self._workers = max(workers or 1, 1)
+        self._clock = clock
+
+    def sync(self, scanned_files):
+        scanned_files = list(scanned_files)
+        started = self._clock()
+        stored = self._stored_digests()
+        try:
+            with ThreadPoolExecutor(max_workers=self._workers) as executor:
+                sizes = list(
+                    executor.map(
+                        lambda scanned: self._sync_one(scanned, stored), scanned_files
+                    )
+                )
+        finally:
+            # Keep the digests of whatever was done, so a rerun after a
+            # failure does not hash those files again.
+            self._save_manifest()
+        uploaded = [size for size in sizes if size is not None]
+        return UploadSummary(
+            len(uploaded),
+            sum(uploaded),
+            self._clock() - started,
+            skipped=len(sizes) - len(uploaded),
+        )
+
+    def _save_manifest(self):
+        try:
+            self._manifest.save()
+        except OSError:
+            # A read-only results folder only costs rehashing next time.
+            pass
+
+    def _stored_digests(self):
+        stored = {}
+        documents = self._files_collection.find(
+            {"metadata.relative_path": {"$exists": True}}, {"metadata": True}
+        )
+        for document in documents:
+            metadata = document["metadata"]
+            stored.setdefault(metadata["relative_path"], []).append(
+                (document["_id"], metadata.get("sha256"))
+            )
+        return stored
+
+    def _sync_one(self, scanned, stored):
+        relative_path = scanned.relative_path.replace(os.sep, "/")
+        copies = stored.get(relative_path, [])
+        if copies:
+            digest = self._manifest.digest_for(scanned)
+            if digest is None:
+                digest = file_digest(scanned.path)
+                self._manifest.record(scanned, digest)
+            if any(stored_digest == digest for _, stored_digest in copies):
+                return None
+        size = self._upload(scanned, relative_path)
+        for file_id, _ in copies:
+            self._fs.delete(file_id)
+        return size
+
+    def _upload(self, scanned, relative_path):
+        digest = hashlib.sha256()
+        size = 0
+        with open(scanned.path, "rb") as file:
+            with self._fs.new_file(
+                filename=os.path.basename(scanned.path),
+                metadata={"relative_path": relative_path},
+            ) as grid_in:
+                for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    grid_in.write(chunk)
+                    size += len(chunk)
+                # Fields set before close are written with the file document.
+                grid_in.metadata = {
+                    "relative_path": relative_path,
+                    "sha256": digest.hexdigest(),
+                }
+        self._manifest.record(scanned, digest.hexdigest())
+        return size
@@ -0,0 +1,94 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_WORKERS = 4
+_MIB = 1024 * 1024
+
+
+class UploadSummary:
+    """
+    Model for the outcome of an artifact upload.
+
+    Parameters:
+        files -- number of files uploaded
+        bytes -- total size of the uploaded files
+        seconds -- wall time the upload took
+        skipped -- number of unchanged files that were not uploaded
+    """
+
+    def __init__(self, files, size, seconds, skipped=0):
+        self._files = files
+        self._bytes = size
+        self._seconds = seconds
+        self._skipped = skipped
+
+    @property
+    def files(self):
+        return self._files
+
+    @property
+    def bytes(self):
+        return self._bytes
+
+    @property
+    def seconds(self):
+        return self._seconds
+
+    @property
+    def skipped(self):
+        return self._skipped
+
+    @property
+    def throughput(self):
+        """
+        Bytes uploaded per second.
+        """
+        return self._bytes / self._seconds if self._seconds > 0 else 0.0
+
+    def __str__(self):
+        text = "Uploaded {0} files ({1:.1f} MiB) in {2:.1f}s, {3:.1f} MiB/s".format(
+            self._files, self._bytes / _MIB, self._seconds, self.throughput / _MIB
+        )
+        if self._skipped:
+            text += ", skipped {0} unchanged".format(self._skipped)
+        return text
+
+
+class ArtifactUploader:
+    """
+    Uploads scanned result files to a GridFS bucket on a thread pool. The
+    workers share the bucket's MongoClient and its connection pool. Each
+    file keeps its path relative to the results directory in its metadata.
+
+    Parameters:
+        fs -- GridFS the files are stored in
+        workers -- number of upload threads
+        clock -- monotonic time source, replaceable in tests
+    """
+
+    def __init__(self, fs, workers=DEFAULT_WORKERS, clock=time.monotonic):
+        self._fs = fs
+        self._workers = max(workers or 1, 1)
+        self._clock = clock
+
+    def upload(self, scanned_files):
+        scanned_files = list(scanned_files)
+        started = self._clock()
+        if self._workers == 1:
+            sizes = [self._upload_one(scanned) for scanned in scanned_files]
+        else:
+            with ThreadPoolExecutor(max_workers=self._workers) as executor:
+                sizes = list(executor.map(self._upload_one, scanned_files))
+        return UploadSummary(len(sizes), sum(sizes), self._clock() - started)
+
+    def _upload_one(self, scanned):
+        relative_path = scanned.relative_path.replace(os.sep, "/")
+        with open(scanned.path, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            self._fs.put(
+                file,
+                filename=os.path.basename(scanned.path),
+                metadata={"relative_path": relative_path},
+            )
+        return size
@@ -0,0 +1,210 @@
+import asyncio
+import json
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+from .build import BuildNotFoundError
+from .branch import BranchNotFoundError
+from .selene_server import (
+    DEFAULT_BATCH_BYTES,
+    DEFAULT_BATCH_SIZE,
+    SeleneRequestError,
+    _BRANCH_KEYS,
+    _BUILD_KEYS,
+    _MISSING_ENDPOINT_STATUSES,
+    _check_records,
+    _chunk_payloads,
+    _encode_payload,
+    _join_payloads,
+)
+
+DEFAULT_CONCURRENCY = 8
+_JSON_HEADERS = {"content-type": "application/json"}
+
+
+class AsyncSeleneServer:
+    """
+    Model for a selene server driven by an asyncio HTTP client. Mirrors the
+    SeleneServer API with coroutines.
+
+    Parameters:
+        url -- the url the server is running
+        concurrency -- maximum number of requests in flight at once
+        batch size -- maximum number of tests sent per bulk request
+        batch bytes -- maximum size in bytes of a bulk request body
+    """
+
+    def __init__(
+        self,
+        url,
+        concurrency=DEFAULT_CONCURRENCY,
+        batch_size=DEFAULT_BATCH_SIZE,
+        batch_bytes=DEFAULT_BATCH_BYTES,
+    ):
+        self._url = url
+        self._concurrency = concurrency
+        self._batch_size = batch_size
+        self._batch_bytes = batch_bytes
+        self._bulk_unsupported = set()
+        self._semaphore = None
+        self._client = None
+
+    @property
+    def url(self):
+        return self._url
+
+    @property
+    def concurrency(self):
+        return self._concurrency
+
+    def _get_client(self):
+        if self._client is None:
+            if aiohttp is None:
+                raise ImportError(
+                    "AsyncSeleneServer requires aiohttp, install mongo_python[async]"
+                )
+            connector = aiohttp.TCPConnector(limit=self._concurrency)
+            self._client = aiohttp.ClientSession(connector=connector)
+        return self._client
+
+    def _get_semaphore(self):
+        # Created on first use so it binds to the running event loop.
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._concurrency)
+        return self._semaphore
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    async def _request(self, method, api, body=None):
+        client = self._get_client()
+        async with self._get_semaphore():
+            try:
+                async with client.request(
+                    method, api, data=body, headers=_JSON_HEADERS
+                ) as response:
+                    return response.status, await response.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as exception:
+                raise SeleneRequestError(exception) from exception
+
+    async def make_get_request(self, api):
+        status, body = await self._request("get", api)
+        _raise_for_status(api, status)
+        return json.loads(body)
+
+    async def send_to_api(self, method, api, data):
+        return await self.send_data_to_api(method, api, _encode_payload(data))
+
+    async def send_data_to_api(self, method, api, body):
+        status, response = await self._request(method, api, body)
+        _raise_for_status(api, status)
+        return response
+
+    async def get_builds(self):
+        api_call = "{0}/api/build".format(self.url)
+        return await self.make_get_request(api_call)
+
+    async def get_build_id(self, build):
+        builds = await self.get_builds()
+
+        try:
+            return next(
+                b["build_id"]
+                for b in _check_records(builds, _BUILD_KEYS)
+                if b["name"] == build.name and b["branch_name"] == build.branch.name
+            )
+        except StopIteration as exception:
+            raise BuildNotFoundError(build) from exception
+
+    async def create_build(self, build):
+        try:
+            await self.get_branch_id(build.branch)
+        except BranchNotFoundError:
+            await self.create_branch(build.branch)
+
+        api_call = "{0}/api/build".format(self.url)
+        await self.send_to_api("post", api_call, build.to_json())
+
+    async def update_build(self, build):
+        api_call = "{0}/api/build/{1}".format(self.url, build.build_id)
+        await self.send_to_api("patch", api_call, build.to_json())
+
+    async def get_branches(self):
+        api_call = "{0}/api/branch".format(self.url)
+        return await self.make_get_request(api_call)
+
+    async def get_branch_id(self, branch):
+        branches = await self.get_branches()
+
+        try:
+            return next(
+                b["branch_id"]
+                for b in _check_records(branches, _BRANCH_KEYS)
+                if b["name"] == branch.name
+            )
+        except StopIteration as exception:
+            raise BranchNotFoundError(branch) from exception
+
+    async def create_branch(self, branch):
+        call_api = "{0}/api/branch".format(self.url)
+        await self.send_to_api("post", call_api, branch.to_json())
+
+    async def create_test_case(self, test):
+        call_api = "{0}/api/testcase".format(self.url)
+        await self.send_data_to_api("post", call_api, test.payload())
+
+    async def create_test_result(self, test):
+        call_api = "{0}/api/test-result".format(self.url)
+        await self.send_data_to_api("post", call_api, test.payload())
+
+    async def create_test_cases(self, tests):
+        await self._create_in_bulk("testcase", tests, self.create_test_case)
+
+    async def create_test_results(self, tests):
+        await self._create_in_bulk("test-result", tests, self.create_test_result)
+
+    async def _create_in_bulk(self, endpoint, tests, create_one):
+        call_api = "{0}/api/{1}/bulk".format(self.url, endpoint)
+        items = ((test, test.payload()) for test in tests)
+        chunks = _chunk_payloads(items, self._batch_size, self._batch_bytes)
+        await asyncio.gather(
+            *(
+                self._post_chunk(endpoint, call_api, chunk, create_one)
+                for chunk in chunks
+            )
+        )
+
+    async def _post_chunk(self, endpoint, call_api, chunk, create_one):
+        if endpoint not in self._bulk_unsupported:
+            try:
+                await self.send_data_to_api("post", call_api, _join_payloads(chunk))
+                return
+            except SeleneStatusError as exception:
+                if exception.status not in _MISSING_ENDPOINT_STATUSES:
+                    raise
+                self._bulk_unsupported.add(endpoint)
+        await asyncio.gather(*(create_one(test) for test, _ in chunk))
+
+
+def _raise_for_status(api, status):
+    if status >= 400:
+        raise SeleneStatusError(api, status)
+
+
+class SeleneStatusError(SeleneRequestError):
+    """
+    Raised when the selene server answers with an error status.
+
+    Parameters:
+        api -- url of the failed request
+        status -- HTTP status code of the response
+    """
+
+    def __init__(self, api, status):
+        super().__init__("{0} returned HTTP {1}".format(api, status))
+        self.status = status
@@ -0,0 +1,74 @@
+import threading
+import time
+
+DEFAULT_TTL = 300
+
+
+class IdCache:
+    """
+    Thread-safe memo of ids resolved from the selene server.
+
+    Parameters:
+        ttl -- seconds an entry stays valid. None keeps entries until they
+            are invalidated.
+        clock -- monotonic time source, replaceable in tests
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, clock=time.monotonic):
+        self._ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._flights = {}
+
+    @property
+    def ttl(self):
+        return self._ttl
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= self._clock():
+                del self._entries[key]
+                return None
+            return value
+
+    def put(self, key, value):
+        expires_at = None if self._ttl is None else self._clock() + self._ttl
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def load(self, key, loader, flight=None):
+        """
+        Return the value cached for key, calling loader on a miss.
+
+        Concurrent misses that share a flight (the key itself by default)
+        wait for a single loader call and then re-read the cache, so a
+        loader that fills in several keys serves all of them at once.
+        Errors raised by loader are not cached.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            flight_lock = self._flights.setdefault(
+                key if flight is None else flight, threading.Lock()
+            )
+        with flight_lock:
+            value = self.get(key)
+            if value is not None:
+                return value
+            value = loader()
+            self.put(key, value)
+            return value
@@ -1,6 +1,107 @@
 import os
-import requests
 import gzip
+import shutil
+import struct
+import tempfile
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from requests import RequestException
+
+from .log_memo import HashingWriter, LogMemo
+from .multipart import MultipartFileEncoder
+from .selene_server import _MISSING_ENDPOINT_STATUSES
+from .server import create_session
+
+GZIP_MAGIC = b"\x1f\x8b"
+DEFAULT_COMPRESS_LEVEL = 9
+CHUNK_SIZE = 1024 * 1024
+PARALLEL_BLOCK_SIZE = 16 * 1024 * 1024
+# Deflate back-references reach this far, so each block is primed with
+# the tail of the one before it.
+DICTIONARY_SIZE = 32 * 1024
+RESUMABLE_THRESHOLD = 64 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+MAX_UPLOAD_ATTEMPTS = 5
+RETRY_DELAY = 0.5
+DIGEST_HEADER = "X-Content-SHA256"
+_LOOKUP_UNSUPPORTED_STATUSES = (405, 501)
+
+
+def get_log_path(output_file):
+    """
+    Derive the robot log path that belongs to an output file.
+    """
+    directory, name = os.path.split(output_file)
+    return os.path.join(directory, name.split("output")[0] + "log.html")
+
+
+def is_gzipped(path):
+    with open(path, "rb") as fp:
+        return fp.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+
+
+def _compress_stream(source, output, compresslevel):
+    # mtime=0 and no file name keep the output byte-for-byte reproducible.
+    with gzip.GzipFile(
+        filename="", mode="wb", compresslevel=compresslevel, fileobj=output, mtime=0
+    ) as compressed:
+        shutil.copyfileobj(source, compressed, CHUNK_SIZE)
+
+
+def _gzip_header(compresslevel):
+    # Same header gzip.compress writes with mtime=0.
+    extra_flags = {1: 4, 9: 2}.get(compresslevel, 0)
+    return struct.pack("<BBBBLBB", 0x1F, 0x8B, 8, 0, 0, extra_flags, 255)
+
+
+def _deflate_block(block, dictionary, compresslevel):
+    """
+    Raw deflate a block, ending on a sync flush so the next block's output
+    can follow it in the same stream.
+    """
+    if dictionary:
+        compressor = zlib.compressobj(
+            compresslevel, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=dictionary
+        )
+    else:
+        compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(block) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+def _compress_blocks(source, output, compresslevel, workers):
+    """
+    Compress fixed-size blocks on a thread pool, pigz style, into a single
+    gzip member. Each block is deflated on its own, primed with the tail of
+    the previous block, and ends on a sync flush, so the blocks join into
+    one deflate stream under one header and trailer. zlib releases the
+    GIL, so blocks compress in parallel while the CRC is chained over them
+    as they are read.
+    """
+    output.write(_gzip_header(compresslevel))
+    crc = 0
+    size = 0
+    dictionary = b""
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for block in iter(lambda: source.read(PARALLEL_BLOCK_SIZE), b""):
+            pending.append(
+                executor.submit(_deflate_block, block, dictionary, compresslevel)
+            )
+            crc = zlib.crc32(block, crc)
+            size += len(block)
+            dictionary = block[-DICTIONARY_SIZE:]
+            if len(pending) >= workers * 2:
+                output.write(pending.popleft().result())
+        while pending:
+            output.write(pending.popleft().result())
+    # An empty final block closes the deflate stream.
+    output.write(
+        zlib.compressobj(compresslevel, zlib.DEFLATED, -zlib.MAX_WBITS).flush()
+    )
+    output.write(struct.pack("<LL", crc, size & 0xFFFFFFFF))
 
 
 class LogFile:
@@ -12,13 +113,35 @@ class LogFile:
         receiver -- the url the server is running
         log path -- full path to the log file. Starts empty
         log file -- name of the log file saved to the server. Starts empty
+        session -- pooled session used for the upload, usually shared with
+            the selene server. A new one is created when omitted.
+        progress -- optional callable taking (bytes uploaded, log size)
+        resumable threshold -- logs at least this large are uploaded in
+            chunks through a resumable upload session
+        memo -- digests and stored names of logs already handled, usually
+            shared by every log file of a run. Private when omitted.
+        digest -- sha256 of the log content. Starts empty
     """
 
-    def __init__(self, output_file, receiver):
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        output_file,
+        receiver,
+        session=None,
+        progress=None,
+        resumable_threshold=RESUMABLE_THRESHOLD,
+        memo=None,
+    ):
         self._output_file = output_file
         self._receiver = receiver
         self._log_path = None
         self._log_file = None
+        self._session = session if session is not None else create_session()
+        self._progress = progress
+        self._resumable_threshold = resumable_threshold
+        self._memo = memo if memo is not None else LogMemo()
+        self._digest = None
 
     @property
     def output_file(self):
@@ -36,6 +159,10 @@ class LogFile:
     def log_file(self):
         return self._log_file
 
+    @property
+    def digest(self):
+        return self._digest
+
     def post_log_file(self, log_path=""):
         """
         Post the log file
@@ -47,27 +174,168 @@ class LogFile:
         if os.path.isfile(self._log_path):
             self._post_log()
 
-    def gzip_log(self, file=""):
+    def gzip_log(self, file="", compresslevel=DEFAULT_COMPRESS_LEVEL, workers=1):
+        """
+        Compress the log in place, streaming it through a temporary file
+        that atomically replaces the original. Logs that are already
+        gzipped are left alone. With workers above one, blocks are
+        compressed in parallel. The compressed stream is hashed as it is
+        written, so posting the log does not read it again to find its
+        digest.
+        """
         file = file if file else self._get_log_path()
-        if not os.path.isfile(file):
+        if not os.path.isfile(file) or is_gzipped(file):
             return
-        with open(file, "rb") as fp:
-            data = fp.read()
-            bindata = bytearray(data)
-        with gzip.open(file, "wb") as f:
-            f.write(bindata)
+        handle, temp_path = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(file)), suffix=".gz.tmp"
+        )
+        try:
+            with os.fdopen(handle, "wb") as output, open(file, "rb") as source:
+                hashing = HashingWriter(output)
+                if workers > 1:
+                    _compress_blocks(source, hashing, compresslevel, workers)
+                else:
+                    _compress_stream(source, hashing, compresslevel)
+            shutil.copymode(file, temp_path)
+            os.replace(temp_path, file)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        self._memo.remember_digest(file, hashing.hexdigest())
 
     def _get_log_path(self):
-        log = self._output_file.split("output")
-        return os.path.join(log[0] + "log.html")
+        return get_log_path(self._output_file)
 
     def _post_log(self):
+        if not os.path.isfile(self._log_path):
+            return
+        self._digest = self._memo.digest_for(self._log_path)
+        # Holding the digest's flight makes concurrent posts of the same
+        # content wait for one upload and reuse its stored name.
+        with self._memo.flight(self._digest):
+            log_file = self._memo.stored_name(self._digest)
+            if log_file is None:
+                log_file = self._find_log() or self._upload_log()
+                if log_file:
+                    self._memo.remember_name(self._digest, log_file)
+        self._log_file = log_file
+
+    def _find_log(self):
+        """
+        Ask the receiver for a log it already stores with this digest.
+        Returns the stored name, or None when the content is unknown.
+        """
+        if not self._memo.lookup_supported:
+            return None
+        url = "{0}/api/log/digest/{1}".format(self._receiver, self._digest)
+        try:
+            res = self._session.get(url=url)
+        except RequestException:
+            # The lookup only saves an upload, so failing it is not fatal.
+            return None
+        if res.status_code in _LOOKUP_UNSUPPORTED_STATUSES:
+            self._memo.disable_lookup()
+            return None
+        if res.status_code != 200:
+            return None
+        return res.text or None
+
+    def _upload_log(self):
+        log_file = None
+        if os.path.getsize(self._log_path) >= self._resumable_threshold:
+            log_file = self._post_log_resumable()
+        if log_file is None:
+            log_file = self._post_log_multipart()
+        return log_file
+
+    def _post_log_multipart(self):
         url = self._receiver + "/api/log/upload"
-        if os.path.isfile(self._log_path):
-            with open(self._log_path, "rb") as fin:
-                files = {"file": fin}
-                res = requests.post(url=url, files=files)
-                self._log_file = res.text
+        try:
+            with MultipartFileEncoder("file", self._log_path, self._progress) as body:
+                res = self._session.post(
+                    url=url,
+                    data=body,
+                    headers={
+                        "Content-Type": body.content_type,
+                        DIGEST_HEADER: self._digest,
+                    },
+                )
+            # An error page is not a stored name.
+            res.raise_for_status()
+        except RequestException as exception:
+            raise LogUploadError(self._log_path, exception) from exception
+        return res.text
+
+    def _post_log_resumable(self):
+        """
+        Upload the log in chunks through an upload session, asking the
+        server for its offset and carrying on from there after a failure.
+        Returns None when the server has no upload sessions.
+        """
+        url = self._receiver + "/api/log/upload/session"
+        size = os.path.getsize(self._log_path)
+        try:
+            res = self._session.post(
+                url=url,
+                json={
+                    "filename": os.path.basename(self._log_path),
+                    "size": size,
+                    "sha256": self._digest,
+                },
+            )
+            if res.status_code in _MISSING_ENDPOINT_STATUSES:
+                return None
+            res.raise_for_status()
+            upload_url = "{0}/{1}".format(url, res.json()["upload_id"])
+        except (RequestException, ValueError, KeyError) as exception:
+            raise LogUploadError(self._log_path, exception) from exception
+
+        offset = 0
+        failures = 0
+        with open(self._log_path, "rb") as fin:
+            while True:
+                try:
+                    if offset is None:
+                        offset = self._get_upload_offset(upload_url)
+                    if offset >= size:
+                        break
+                    offset = self._put_chunk(upload_url, fin, offset, size)
+                    failures = 0
+                except (RequestException, ValueError, KeyError) as exception:
+                    failures += 1
+                    if failures >= MAX_UPLOAD_ATTEMPTS:
+                        raise LogUploadError(self._log_path, exception) from exception
+                    time.sleep(RETRY_DELAY * 2 ** (failures - 1))
+                    offset = None
+
+        try:
+            res = self._session.post(url=upload_url + "/commit")
+            res.raise_for_status()
+        except RequestException as exception:
+            raise LogUploadError(self._log_path, exception) from exception
+        return res.text
+
+    def _get_upload_offset(self, upload_url):
+        res = self._session.get(url=upload_url)
+        res.raise_for_status()
+        return int(res.json()["offset"])
+
+    def _put_chunk(self, upload_url, fin, offset, size):
+        fin.seek(offset)
+        chunk = fin.read(UPLOAD_CHUNK_SIZE)
+        end = offset + len(chunk)
+        res = self._session.put(
+            url=upload_url,
+            data=chunk,
+            headers={
+                "Content-Type": "application/octet-stream",
+                "Content-Range": "bytes {0}-{1}/{2}".format(offset, end - 1, size),
+            },
+        )
+        res.raise_for_status()
+        if self._progress is not None:
+            self._progress(end, size)
+        return end
 
 
 class LogFileBuilder:
@@ -80,6 +348,9 @@ class LogFileBuilder:
         self._receiver = None
         self._log_path = None
         self._log_file = None
+        self._session = None
+        self._progress = None
+        self._memo = None
 
     def with_output_file(self, output_file):
         self._output_file = output_file
@@ -89,8 +360,26 @@ class LogFileBuilder:
         self._receiver = receiver
         return self
 
+    def with_session(self, session):
+        self._session = session
+        return self
+
+    def with_progress(self, progress):
+        self._progress = progress
+        return self
+
+    def with_memo(self, memo):
+        self._memo = memo
+        return self
+
     def construct(self):
-        return LogFile(self._output_file, self._receiver)
+        return LogFile(
+            self._output_file,
+            self._receiver,
+            self._session,
+            self._progress,
+            memo=self._memo,
+        )
 
 
 class LogFileNotFoundError(Exception):
@@ -104,3 +393,17 @@ class LogFileNotFoundError(Exception):
     def __init__(self, log_path):
         msg = "Error not found: No file found in path: {0}".format(log_path)
         super().__init__(msg)
+
+
+class LogUploadError(Exception):
+    """
+    Raised when a log could not be uploaded to the selene server
+
+    Parameters:
+        log path -- path of the log that failed to upload
+        reason -- the underlying error
+    """
+
+    def __init__(self, log_path, reason):
+        msg = "Error: Failed to upload {0}: {1}".format(log_path, reason)
+        super().__init__(msg)
@@ -0,0 +1,98 @@
+import hashlib
+import os
+import threading
+
+DIGEST_CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path):
+    """
+    Return the hex sha256 of the file at path, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as fp:
+        for chunk in iter(lambda: fp.read(DIGEST_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _stat_key(path):
+    stat = os.stat(path)
+    return os.path.realpath(path), stat.st_size, stat.st_mtime_ns
+
+
+class HashingWriter:
+    """
+    Wraps a binary file object and hashes everything written through it.
+
+    Parameters:
+        output -- file object the data is written to
+    """
+
+    def __init__(self, output):
+        self._output = output
+        self._digest = hashlib.sha256()
+
+    def write(self, data):
+        self._digest.update(data)
+        return self._output.write(data)
+
+    def flush(self):
+        self._output.flush()
+
+    def hexdigest(self):
+        return self._digest.hexdigest()
+
+
+class LogMemo:
+    """
+    Thread-safe memo of log digests and the names the receiver stored them
+    under, so every distinct log is hashed and uploaded at most once per run.
+
+    Digests are keyed by real path, size and mtime, so a file that changes
+    is hashed again. Stored names are keyed by digest.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._digests = {}
+        self._names = {}
+        self._flights = {}
+        self._lookup_supported = True
+
+    @property
+    def lookup_supported(self):
+        return self._lookup_supported
+
+    def disable_lookup(self):
+        self._lookup_supported = False
+
+    def digest_for(self, path):
+        key = _stat_key(path)
+        with self._lock:
+            digest = self._digests.get(key)
+        if digest is None:
+            digest = file_digest(path)
+            self.remember_digest(path, digest, key)
+        return digest
+
+    def remember_digest(self, path, digest, key=None):
+        key = key or _stat_key(path)
+        with self._lock:
+            self._digests[key] = digest
+
+    def stored_name(self, digest):
+        with self._lock:
+            return self._names.get(digest)
+
+    def remember_name(self, digest, name):
+        with self._lock:
+            self._names[digest] = name
+
+    def flight(self, digest):
+        """
+        Return the lock held while the log with digest is looked up or
+        uploaded, so concurrent posts of the same content upload once.
+        """
+        with self._lock:
+            return self._flights.setdefault(digest, threading.Lock())
@@ -0,0 +1,81 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_BYTES_IN_FLIGHT = 256 * 1024 * 1024
+
+
+class LogUploadPool:
+    """
+    Uploads logs on a thread pool so parsing and posting do not wait on
+    them. Uploads start in submission order for as long as the logs in
+    flight stay under a byte budget. A log larger than the whole budget
+    still starts once nothing else is in flight.
+
+    Parameters:
+        workers -- number of upload threads
+        max bytes in flight -- combined size of the logs uploading at once
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, max_bytes=DEFAULT_MAX_BYTES_IN_FLIGHT):
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._futures = {}
+        self._queue = deque()
+        self._bytes_in_flight = 0
+
+    @property
+    def bytes_in_flight(self):
+        return self._bytes_in_flight
+
+    def submit(self, log_path, upload, *args, **kwargs):
+        """
+        Schedule upload(*args, **kwargs) for the log at log_path and return
+        a future for its result. A log that was already submitted is not
+        uploaded again; its existing future is returned.
+        """
+        key = os.path.realpath(log_path)
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                return future
+            future = Future()
+            self._futures[key] = future
+            size = os.path.getsize(log_path) if os.path.isfile(log_path) else 0
+            self._queue.append((future, size, upload, args, kwargs))
+            self._start_ready()
+        return future
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            while self._queue:
+                self._queue.popleft()[0].cancel()
+        self._executor.shutdown(wait=wait)
+
+    def _start_ready(self):
+        # Called with the lock held.
+        while self._queue:
+            size = self._queue[0][1]
+            if self._bytes_in_flight and self._bytes_in_flight + size > self._max_bytes:
+                return
+            future, size, upload, args, kwargs = self._queue.popleft()
+            if not future.set_running_or_notify_cancel():
+                continue
+            self._bytes_in_flight += size
+            self._executor.submit(self._run, future, size, upload, args, kwargs)
+
+    # pylint: disable=too-many-arguments
+    def _run(self, future, size, upload, args, kwargs):
+        try:
+            result = upload(*args, **kwargs)
+        except BaseException as exception:  # pylint: disable=broad-except
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                self._bytes_in_flight -= size
+                self._start_ready()
@@ -0,0 +1,197 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_TTL = 24 * 60 * 60
+CACHE_FILE_VARIABLE = "SELENE_CACHE_FILE"
+_BRANCH = "branch"
+_BUILD = "build"
+
+# Bumped whenever the tables change. Older caches are dropped and refilled.
+_SCHEMA_VERSION = 1
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS ids (
+        receiver TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        key TEXT NOT NULL,
+        value TEXT NOT NULL,
+        updated_at REAL NOT NULL,
+        PRIMARY KEY (receiver, kind, key)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS test_cases (
+        receiver TEXT NOT NULL,
+        name TEXT NOT NULL,
+        updated_at REAL NOT NULL,
+        PRIMARY KEY (receiver, name)
+    )
+    """,
+]
+
+
+def open_lookup_cache(path, receiver, disabled=False):
+    """
+    Open the lookup cache at path, falling back to the SELENE_CACHE_FILE
+    environment variable. Returns None when neither is set or the cache is
+    disabled.
+    """
+    path = path or os.environ.get(CACHE_FILE_VARIABLE)
+    if disabled or not path:
+        return None
+    return LookupCache(path, receiver)
+
+
+class LookupCache:
+    """
+    On-disk cache of branch ids, build ids and known test case names shared
+    by separate mongo and mongo-post invocations. Entries are scoped to the
+    receiver they came from. SQLite's file locks serialize writers, so
+    concurrent runners can share one cache file.
+
+    Parameters:
+        path -- location of the SQLite database. Created when missing.
+        receiver -- base url of the selene server the entries belong to
+        ttl -- seconds a branch id, build id or test case name stays valid
+        timeout -- seconds to wait for another runner's lock
+        clock -- wall clock time source, replaceable in tests
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, path, receiver, ttl=DEFAULT_TTL, timeout=30, clock=time.time):
+        self._path = path
+        self._receiver = receiver
+        self._ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(
+            path, timeout=timeout, isolation_level=None, check_same_thread=False
+        )
+        with self._lock:
+            self._create_schema()
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def receiver(self):
+        return self._receiver
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def get_branch_id(self, branch_name):
+        return self._get_id(_BRANCH, [branch_name])
+
+    def put_branch_id(self, branch_name, branch_id):
+        self._put_id(_BRANCH, [branch_name], branch_id)
+
+    def invalidate_branch(self, branch_name):
+        self._invalidate_id(_BRANCH, [branch_name])
+
+    def get_build_id(self, branch_name, build_name):
+        return self._get_id(_BUILD, [branch_name, build_name])
+
+    def put_build_id(self, branch_name, build_name, build_id):
+        self._put_id(_BUILD, [branch_name, build_name], build_id)
+
+    def invalidate_build(self, branch_name, build_name):
+        self._invalidate_id(_BUILD, [branch_name, build_name])
+
+    def known_test_cases(self, names):
+        """
+        Return the subset of names created on the receiver within the ttl.
+        """
+        names = list(names)
+        known = set()
+        oldest = self._clock() - self._ttl
+        with self._lock:
+            # Stay well below SQLite's limit on bound parameters.
+            for start in range(0, len(names), 500):
+                chunk = names[start : start + 500]
+                query = (
+                    "SELECT name FROM test_cases WHERE receiver = ? "
+                    "AND updated_at > ? AND name IN ({0})".format(
+                        ",".join("?" * len(chunk))
+                    )
+                )
+                rows = self._connection.execute(query, [self._receiver, oldest] + chunk)
+                known.update(row[0] for row in rows)
+        return known
+
+    def has_test_case(self, name):
+        return bool(self.known_test_cases([name]))
+
+    def add_test_cases(self, names):
+        now = self._clock()
+        rows = [(self._receiver, name, now) for name in names]
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO test_cases (receiver, name, updated_at) "
+                    "VALUES (?, ?, ?)",
+                    rows,
+                )
+            except sqlite3.Error:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+
+    def _create_schema(self):
+        # Called with the lock held. The immediate transaction keeps another
+        # runner from migrating the same file at once.
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+            if version != _SCHEMA_VERSION:
+                self._connection.execute("DROP TABLE IF EXISTS ids")
+                self._connection.execute("DROP TABLE IF EXISTS test_cases")
+                self._connection.execute(
+                    "PRAGMA user_version = {0}".format(_SCHEMA_VERSION)
+                )
+            for statement in _SCHEMA:
+                self._connection.execute(statement)
+        except sqlite3.Error:
+            self._connection.execute("ROLLBACK")
+            raise
+        self._connection.execute("COMMIT")
+
+    def _get_id(self, kind, key):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, updated_at FROM ids "
+                "WHERE receiver = ? AND kind = ? AND key = ?",
+                (self._receiver, kind, json.dumps(key)),
+            ).fetchone()
+        if row is None or row[1] + self._ttl <= self._clock():
+            return None
+        return json.loads(row[0])
+
+    def _put_id(self, kind, key, value):
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO ids (receiver, kind, key, value, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    self._receiver,
+                    kind,
+                    json.dumps(key),
+                    json.dumps(value),
+                    self._clock(),
+                ),
+            )
+
+    def _invalidate_id(self, kind, key):
+        with self._lock:
+            self._connection.execute(
+                "DELETE FROM ids WHERE receiver = ? AND kind = ? AND key = ?",
+                (self._receiver, kind, json.dumps(key)),
+            )
@@ -0,0 +1,107 @@
+import atexit
+import os
+import threading
+
+MONGO_URI_VARIABLE = "SELENE_MONGO_URI"
+DEFAULT_MONGO_URI = "mongodb://10.49.15.188:27017/"
+DEFAULT_MAX_POOL_SIZE = 32
+DEFAULT_TIMEOUT = 10
+
+
+class MongoConnection:
+    """
+    Model for a lazily opened MongoDB connection. The client and its pool
+    are only created, and the network only touched, on first use.
+
+    Parameters:
+        uri -- MongoDB connection string. Defaults to $SELENE_MONGO_URI,
+            then to the shared results database.
+        max pool size -- maximum number of connections the client keeps
+        timeout -- seconds allowed for connecting and selecting a server
+    """
+
+    def __init__(self, uri=None, max_pool_size=DEFAULT_MAX_POOL_SIZE, timeout=None):
+        self._uri = uri or os.environ.get(MONGO_URI_VARIABLE) or DEFAULT_MONGO_URI
+        self._max_pool_size = max_pool_size
+        self._timeout = DEFAULT_TIMEOUT if timeout is None else timeout
+        self._lock = threading.Lock()
+        self._client = None
+
+    @property
+    def uri(self):
+        return self._uri
+
+    @property
+    def max_pool_size(self):
+        return self._max_pool_size
+
+    @property
+    def timeout(self):
+        return self._timeout
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                # Imported here so commands that never reach MongoDB do not
+                # pay for loading pymongo either.
+                # pylint: disable=import-outside-toplevel
+                from pymongo import MongoClient
+
+                timeout_ms = int(self._timeout * 1000)
+                self._client = MongoClient(
+                    self._uri,
+                    maxPoolSize=self._max_pool_size,
+                    connectTimeoutMS=timeout_ms,
+                    serverSelectionTimeoutMS=timeout_ms,
+                )
+            return self._client
+
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+
+_LOCK = threading.Lock()
+_CONNECTION = None
+
+
+def configure(uri=None, max_pool_size=DEFAULT_MAX_POOL_SIZE, timeout=None):
+    """
+    Replace the process-wide connection settings, closing any client opened
+    with the previous ones.
+    """
+    global _CONNECTION  # pylint: disable=global-statement
+    with _LOCK:
+        previous = _CONNECTION
+        _CONNECTION = MongoConnection(uri, max_pool_size, timeout)
+    if previous is not None:
+        previous.close()
+    return _CONNECTION
+
+
+def get_connection():
+    global _CONNECTION  # pylint: disable=global-statement
+    with _LOCK:
+        if _CONNECTION is None:
+            _CONNECTION = MongoConnection()
+        return _CONNECTION
+
+
+def get_client():
+    """
+    Return the process-wide MongoClient, creating it on first use.
+    """
+    return get_connection().client
+
+
+def close():
+    with _LOCK:
+        connection = _CONNECTION
+    if connection is not None:
+        connection.close()
+
+
+atexit.register(close)
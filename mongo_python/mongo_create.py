@@ -1,72 +1,135 @@
 from __future__ import print_function
 import argparse
-import glob
+import asyncio
+import functools
+import itertools
 import os
 import logging
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
  
-import pymongo
-from pymongo import MongoClient
-from gridfs import GridFS
 import sys
  
  
-client = MongoClient("mongodb://10.49.15.188:27017/")
-mongo_uri = "mongodb://10.49.15.188:27017/"
 database_name = ""
 collection_name=""
  
  
 def files(db, col):
-    db = client[db]
+    # pylint: disable=import-outside-toplevel
+    from gridfs import GridFS
+
+    db = mongo_client.get_client()[db]
     fs = GridFS(db, collection=col)
     return fs
+
+
+def files_collection(db, col):
+    return mongo_client.get_client()[db]["{0}.files".format(col)]
  
  
 script_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(script_dir)
  
  
-from mongo_python.test import TestBuilder
+from mongo_python import mongo_client
+from mongo_python.selene_mongodb import (
+    DEFAULT_BATCH_SIZE as DEFAULT_MONGO_BATCH_SIZE,
+    SeleneMongoDB,
+    parse_write_concern,
+)
+from mongo_python.record import TestContext, TestRecord
+from mongo_python.result_batch import ResultBatch, has_numpy
 from mongo_python.output_file import OutputFileBuilder
-from mongo_python.log_file import LogFileBuilder
-from mongo_python.selene_server import SeleneServerBuilder
+from mongo_python.log_file import DEFAULT_COMPRESS_LEVEL, LogFileBuilder
+from mongo_python.log_memo import LogMemo
+from mongo_python.log_upload_pool import DEFAULT_MAX_BYTES_IN_FLIGHT, LogUploadPool
+from mongo_python.selene_server import (
+    DEFAULT_BATCH_BYTES,
+    DEFAULT_BATCH_SIZE,
+    SelenePostError,
+    SeleneRequestError,
+    SeleneServerBuilder,
+)
+from mongo_python.async_selene_server import AsyncSeleneServer
+from mongo_python.server import DEFAULT_MAX_RETRIES, DEFAULT_POOL_SIZE, create_session
 from mongo_python.build import BuildBuilder
+from mongo_python.lookup_cache import open_lookup_cache
+from mongo_python.result_scanner import ResultScanner
+from mongo_python.artifact_upload import DEFAULT_WORKERS as DEFAULT_UPLOAD_WORKERS
+from mongo_python.artifact_upload import ArtifactUploader
+from mongo_python.artifact_sync import MANIFEST_NAME, ArtifactSync, SyncManifest
+from mongo_python.spool import ALWAYS, MODES as SPOOL_MODES, ON_ERROR
+from mongo_python.spool import ResultSpool, SpoolingServer
+from mongo_python.upload_journal import (
+    BUILD,
+    CASE,
+    JOURNAL_NAME,
+    LOG,
+    RESULT,
+    OutputJournal,
+    open_journal,
+)
 # pylint: disable=W0603
 _LOGGER = None
+# Shared by every log posted in this process, so a log given with
+# --logfile is uploaded once per run rather than once per output file.
+_LOG_MEMO = LogMemo()
  
  
 def test():
     print("running")
  
 def run_cli():
-    args = _create_parser_add_args().parse_args()
+    parser = _create_parser_add_args()
+    args = parser.parse_args()
+    if args.concurrency:
+        # The async client posts in bulk and keeps no lookup cache.
+        for option, value in (
+            ("--spool", args.spool),
+            ("--jobs", args.jobs),
+            ("--cache-file", args.cache_file),
+        ):
+            if value:
+                parser.error("{0} cannot be combined with --concurrency".format(option))
     _create_logger(args.logger)
-    post_results(args)
- 
-class SeleneMongoDB:
-    def __init__(self, mongo_uri, database_name, collection_name):
-        self.client = pymongo.MongoClient(mongo_uri)
-        self.db = self.client[database_name]
-        self.collection = self.db[collection_name]
- 
-    def post_build(self, build_data):
-        self.collection.insert_one(build_data)
- 
- 
-def upload_file(fs, file_path):
-    with open(file_path, "rb") as file:
-        file_id = fs.put(file, filename=os.path.basename(file_path))
-        print("File uploaded with id:", file_id)
- 
-def upload_files_in_directory(fs, directory):
+    # Every artifact upload thread may hold a connection at once.
+    mongo_client.configure(
+        args.mongo_uri,
+        max(args.mongo_pool_size, args.upload_workers),
+        args.mongo_timeout,
+    )
+    try:
+        if args.concurrency:
+            asyncio.run(async_post_results(args))
+        else:
+            post_results(args)
+    finally:
+        mongo_client.close()
+ 
+def upload_files_in_directory(
+    fs,
+    directory,
+    scan=None,
+    workers=DEFAULT_UPLOAD_WORKERS,
+    sync=False,
+    stored_files=None,
+):
+    # pylint: disable=too-many-arguments
     if not os.path.isdir(directory):
         print(f"{directory} is not a directory.")
-        return
- 
-    for filename in os.listdir(directory):
-        file_path = os.path.join(directory, filename)
-        if os.path.isfile(file_path):
-            upload_file(fs, file_path)
+        return None
+
+    scan = scan if scan is not None else _scan_directory(directory)
+    if sync:
+        manifest = SyncManifest(os.path.join(directory, MANIFEST_NAME))
+        summary = ArtifactSync(fs, stored_files, manifest, workers).sync(scan.files)
+    else:
+        summary = ArtifactUploader(fs, workers).upload(scan.files)
+    print(summary)
+    return summary
  
 def _create_parser_add_args():
     parser = argparse.ArgumentParser()
@@ -86,22 +149,318 @@ def _create_parser_add_args():
         help="Set log level: CRITICAL, ERROR, WARNING, INFO, DEBUG, NOTSET",
         default="NOTSET",
     )
+    parser.add_argument(
+        "--pool-size",
+        help="Maximum number of keep-alive connections to the receiver",
+        type=int,
+        default=DEFAULT_POOL_SIZE,
+    )
+    parser.add_argument(
+        "--max-retries",
+        help="Retries for failed connections to the receiver",
+        type=int,
+        default=DEFAULT_MAX_RETRIES,
+    )
+    parser.add_argument(
+        "--batch-size",
+        help="Maximum number of tests sent per bulk request",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+    )
+    parser.add_argument(
+        "--batch-bytes",
+        help="Maximum size in bytes of a bulk request body",
+        type=int,
+        default=DEFAULT_BATCH_BYTES,
+    )
+    parser.add_argument(
+        "--concurrency",
+        help="Post with an asyncio client keeping this many requests in flight",
+        type=int,
+    )
+    parser.add_argument(
+        "--jobs",
+        help="Post tests one by one on this many threads sharing one session",
+        type=int,
+    )
+    parser.add_argument(
+        "--parse-workers",
+        help="Parse output files on this many processes",
+        type=int,
+    )
+    parser.add_argument(
+        "--exclude",
+        help="Skip files and folders matching this pattern (repeatable)",
+        action="append",
+        default=[],
+    )
+    parser.add_argument(
+        "--scan-workers",
+        help="Scan result subfolders on this many threads",
+        type=int,
+    )
+    parser.add_argument(
+        "--cache-file",
+        help="Cache branch/build ids and test case names here across runs "
+        "(defaults to $SELENE_CACHE_FILE)",
+    )
+    parser.add_argument(
+        "--no-cache", help="Ignore the lookup cache", action="store_true"
+    )
+    parser.add_argument(
+        "--upload-workers",
+        help="Upload result files to GridFS on this many threads",
+        type=int,
+        default=DEFAULT_UPLOAD_WORKERS,
+    )
+    parser.add_argument(
+        "--sync",
+        help="Upload only result files that are new or changed since the "
+        "last upload of this branch and build",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--mongo-uri",
+        help="MongoDB connection string (defaults to ${0} or {1})".format(
+            mongo_client.MONGO_URI_VARIABLE, mongo_client.DEFAULT_MONGO_URI
+        ),
+    )
+    parser.add_argument(
+        "--mongo-pool-size",
+        help="Maximum number of MongoDB connections",
+        type=int,
+        default=mongo_client.DEFAULT_MAX_POOL_SIZE,
+    )
+    parser.add_argument(
+        "--mongo-timeout",
+        help="Seconds allowed for connecting to MongoDB",
+        type=float,
+        default=mongo_client.DEFAULT_TIMEOUT,
+    )
+    parser.add_argument(
+        "--mongo-tests",
+        help="Also upsert every parsed test into the build's MongoDB collection",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--mongo-batch-size",
+        help="Maximum number of tests per MongoDB bulk write",
+        type=int,
+        default=DEFAULT_MONGO_BATCH_SIZE,
+    )
+    parser.add_argument(
+        "--mongo-write-concern",
+        help="Write concern for test records, e.g. 0, 1 or majority",
+    )
+    parser.add_argument(
+        "--gzip-level",
+        help="Compression level used for log files (1-9)",
+        type=int,
+        choices=range(1, 10),
+        metavar="LEVEL",
+        default=DEFAULT_COMPRESS_LEVEL,
+    )
+    parser.add_argument(
+        "--gzip-workers",
+        help="Compress log files on this many threads",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--log-workers",
+        help="Upload log files on this many threads while tests are parsed",
+        type=int,
+    )
+    parser.add_argument(
+        "--log-bytes-in-flight",
+        help="Maximum combined size of the log files uploading at once",
+        type=int,
+        default=DEFAULT_MAX_BYTES_IN_FLIGHT,
+    )
+    parser.add_argument(
+        "--resume",
+        help="Skip the build, logs, test cases and test results an earlier "
+        "run of the same branch, build and stage already posted",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--spool",
+        help="Write what could not be posted to the receiver to a compressed "
+        "spool in this folder, to post later with mongo spool replay",
+    )
+    parser.add_argument(
+        "--spool-mode",
+        help="Spool once the receiver fails (on-error) or without "
+        "contacting it at all (always)",
+        choices=SPOOL_MODES,
+        default=ON_ERROR,
+    )
     return parser
  
  
 def post_results(args):
-    server = SeleneServerBuilder().with_url(args.receiver).construct()
-    _post_build(server, args)
-    output_path = os.path.join(args.path, "**/*output*.xml")
- 
-    print(args.path)
-    fs = files(args.branch, args.build)
-    upload_files_in_directory(fs, args.path)
-    print("Files uploaded to GridFS.")
- 
-    _parse_output_files(server, output_path, args)
-    output_path = os.path.join(args.path, "**/*TESTS-*.xml")
-    _parse_output_files(server, output_path, args)
+    server = (
+        SeleneServerBuilder()
+        .with_url(args.receiver)
+        .with_pool_size(max(args.pool_size, args.jobs or 0, args.log_workers or 0))
+        .with_max_retries(args.max_retries)
+        .with_batch_size(args.batch_size)
+        .with_batch_bytes(args.batch_bytes)
+        .with_lookup_cache(
+            open_lookup_cache(args.cache_file, args.receiver, args.no_cache)
+        )
+        .construct()
+    )
+    spooler = None
+    if args.spool:
+        spool = ResultSpool(args.spool, args.gzip_level)
+        server = spooler = SpoolingServer(server, spool, args.spool_mode == ALWAYS)
+    journal = _open_journal(args)
+    poster = ParallelTestPoster(server, args.jobs) if args.jobs else None
+    try:
+        _post_build(server, args, journal)
+
+        print(args.path)
+        scan = _scan_results(args)
+        fs = files(args.branch, args.build)
+        upload_files_in_directory(
+            fs,
+            args.path,
+            scan,
+            args.upload_workers,
+            args.sync,
+            files_collection(args.branch, args.build),
+        )
+        print("Files uploaded to GridFS.")
+
+        mongodb = _create_mongodb(args)
+        _parse_output_files(server, scan, args, poster, mongodb, journal, spooler)
+        if poster:
+            poster.finish()
+    finally:
+        # Workers still posting must stop before their session and journal close.
+        if poster:
+            poster.shutdown()
+        _LOGGER.info("receiver connections: %s", server.connection_stats())
+        server.close()
+        if journal is not None:
+            journal.close()
+    if spooler is not None and spooler.spool.entries:
+        print(
+            "Spooled {0} entries to {1}".format(
+                spooler.spool.entries, spooler.spool.path
+            )
+        )
+
+
+class ParallelTestPoster:
+    """
+    Posts tests on a thread pool whose workers share the server's session.
+    Each test's case is created before its result. Request errors are
+    collected and raised together by finish() instead of stopping the run.
+
+    Parameters:
+        server -- selene server the tests are posted to
+        jobs -- number of worker threads
+    """
+
+    def __init__(self, server, jobs):
+        self._server = server
+        self._executor = ThreadPoolExecutor(max_workers=jobs)
+        self._lock = threading.Lock()
+        self._futures = set()
+        self._errors = []
+
+    def submit(self, test, key=None, journal=None):
+        """
+        Post test, recording its case and result under key in journal, the
+        OutputJournal of its output file.
+        """
+        future = self._executor.submit(self._post, test, key, journal)
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(lambda done: self._collect(test, done))
+
+    def finish(self):
+        self._executor.shutdown(wait=True)
+        for future in self._futures:
+            future.result()
+        if self._errors:
+            raise SelenePostError(self._errors)
+
+    def shutdown(self):
+        """
+        Cancel the tests not yet started and wait for the ones in flight.
+        """
+        with self._lock:
+            futures = list(self._futures)
+        for future in futures:
+            future.cancel()
+        self._executor.shutdown(wait=True)
+
+    def _post(self, test, key, journal):
+        rows = [(key, test)]
+        if _pending(journal, CASE, rows):
+            self._server.create_test_case(test)
+            _acknowledge(journal, CASE, rows)
+        self._server.create_test_result(test)
+        _acknowledge(journal, RESULT, rows)
+
+    def _collect(self, test, future):
+        if future.cancelled():
+            with self._lock:
+                self._futures.discard(future)
+            return
+        error = future.exception()
+        with self._lock:
+            if isinstance(error, SeleneRequestError):
+                self._errors.append((test.name, error))
+            if not error or isinstance(error, SeleneRequestError):
+                self._futures.discard(future)
+
+
+async def async_post_results(args):
+    server = AsyncSeleneServer(
+        args.receiver, args.concurrency, args.batch_size, args.batch_bytes
+    )
+    session = create_session(
+        pool_size=max(args.pool_size, args.log_workers or 0),
+        max_retries=args.max_retries,
+    )
+    loop = asyncio.get_running_loop()
+    journal = _open_journal(args)
+    try:
+        if not _build_acknowledged(journal, args):
+            build = _create_build(args)
+            await loop.run_in_executor(None, _post_build_to_mongo, args)
+            await server.create_build(build)
+            _acknowledge_build(journal, args)
+
+        print(args.path)
+        scan = await loop.run_in_executor(None, _scan_results, args)
+        fs = files(args.branch, args.build)
+        # Logs are gzipped in place while output files are parsed, so they
+        # go to GridFS first, as in post_results.
+        await loop.run_in_executor(
+            None,
+            upload_files_in_directory,
+            fs,
+            args.path,
+            scan,
+            args.upload_workers,
+            args.sync,
+            files_collection(args.branch, args.build),
+        )
+        print("Files uploaded to GridFS.")
+
+        await _async_parse_output_files(
+            server, session, scan, args, _create_mongodb(args), journal
+        )
+    finally:
+        await server.close()
+        session.close()
+        if journal is not None:
+            journal.close()
  
  
 def _create_logger(level):
@@ -115,22 +474,95 @@ def _create_logger(level):
     _LOGGER = logging.getLogger(__name__)
  
  
-def _post_build(server, args):
-    build = (
+def _post_build(server, args, journal=None):
+    if _build_acknowledged(journal, args):
+        return
+    build = _create_build(args)
+    _post_build_to_mongo(args)
+    server.create_build(build)
+    _acknowledge_build(journal, args)
+
+
+def _open_journal(args):
+    if not os.path.isdir(args.path):
+        return None
+    scope = [args.receiver, args.branch, args.build, args.stage]
+    journal = open_journal(args.path, scope, args.resume)
+    if journal is None:
+        _LOGGER.warning("No journal in %s, this run cannot be resumed", args.path)
+    return journal
+
+
+def _resuming(journal):
+    # A journal only skips work when the run was asked to resume.
+    return journal is not None and journal.resume
+
+
+def _build_acknowledged(journal, args):
+    return _resuming(journal) and journal.acknowledged(BUILD, args.build)
+
+
+def _acknowledge_build(journal, args):
+    if journal is not None:
+        journal.record(BUILD, args.build)
+
+
+def _output_journal(journal, output_file, args):
+    if journal is None:
+        return None
+    return OutputJournal(journal, os.path.relpath(output_file, args.path))
+
+
+def _keyed(journal, tests):
+    # Without a journal no test needs a key.
+    if journal is None:
+        return [(None, test) for test in tests]
+    return journal.keyed(tests)
+
+
+def _pending(journal, kind, rows):
+    # Without a journal nothing has been acknowledged.
+    return rows if journal is None else journal.pending(kind, rows)
+
+
+def _acknowledge(journal, kind, rows):
+    if journal is not None:
+        journal.record(kind, rows)
+
+
+def _acknowledger(journal, kind, rows):
+    """
+    Callback for a bulk post that records the tests of each request the
+    receiver accepted, so a batch failing partway keeps its progress.
+    """
+    if journal is None:
+        return None
+    keys = {id(test): key for key, test in rows}
+
+    def acknowledge(tests):
+        journal.record(kind, [(keys[id(test)], test) for test in tests])
+
+    return acknowledge
+
+
+def _create_build(args):
+    return (
         BuildBuilder()
         .with_name(args.build)
         .with_branch_name(args.branch)
         .with_status(args.result)
         .construct()
     )
-     
+
+
+def _post_build_to_mongo(args):
     print(args.build)
     print(args.branch)
     print(args.path)
     print(args)
     database_name = args.branch
     collection_name = args.build
-    selene_mongodb = SeleneMongoDB(mongo_uri, database_name, collection_name)
+    selene_mongodb = SeleneMongoDB(database_name, collection_name)
  
     build_data = {
         "stage": args.stage,
@@ -141,50 +573,360 @@ def _post_build(server, args):
  
     selene_mongodb.post_build(build_data)
     print("Build data posted to MongoDB.")
-    server.create_build(build)
- 
- 
-def _parse_output_files(server, output_path, args):
-    for filename in glob.iglob(output_path, recursive=True):
-        _LOGGER.info("output filename: %s", filename)
-        log_file = _post_log_file(filename, args.receiver, args.logfile)
-        _LOGGER.info("log filename: %s", log_file)
-        tests = _get_tests(filename)
-        _post_tests(server, tests, log_file, args)
  
  
-def _post_log_file(output_file, url, new_logfile_name):
+def _scan_results(args):
+    return _scan_directory(args.path, args.exclude, args.scan_workers)
+
+
+def _scan_directory(directory, excludes=(), workers=None):
+    # The sync manifest, the journal and their temporary files are never
+    # results.
+    excludes = list(excludes) + [MANIFEST_NAME + "*", JOURNAL_NAME + "*"]
+    return ResultScanner(directory, excludes, workers).scan()
+
+
+def _create_mongodb(args):
+    if not args.mongo_tests:
+        return None
+    return SeleneMongoDB(
+        args.branch,
+        args.build,
+        batch_size=args.mongo_batch_size,
+        write_concern=parse_write_concern(args.mongo_write_concern),
+    )
+
+
+def _parse_output_files(
+    server, scan, args, poster=None, mongodb=None, journal=None, spooler=None
+):
+    pool = _create_log_upload_pool(args)
+    try:
+        uploads = _submit_log_uploads(
+            pool, scan, args, server.session, journal, spooler
+        )
+        for filename, tests in _iter_output_tests(scan.outputs(), args.parse_workers):
+            _LOGGER.info("output filename: %s", filename)
+            if filename in uploads:
+                upload = uploads[filename]
+                if not upload.done():
+                    # Parse the file while its log is still uploading.
+                    tests = list(tests)
+                log_file = upload.result()
+            else:
+                log_file = _post_log_file_for(
+                    filename, scan, args, server.session, journal, spooler
+                )
+            _LOGGER.info("log filename: %s", log_file)
+            _post_tests(
+                server,
+                tests,
+                log_file,
+                args,
+                poster,
+                mongodb,
+                _output_journal(journal, filename, args),
+            )
+    finally:
+        if pool:
+            pool.shutdown()
+
+
+def _create_log_upload_pool(args):
+    if not args.log_workers:
+        return None
+    return LogUploadPool(args.log_workers, args.log_bytes_in_flight)
+
+
+def _submit_log_uploads(pool, scan, args, session, journal=None, spooler=None):
+    """
+    Submit the log of every output file to the upload pool up front and
+    return the futures of their stored names by output file. Returns an
+    empty dict without a pool, in which case logs are uploaded inline.
+    """
+    if pool is None:
+        return {}
+    uploads = {}
+    for filename in scan.outputs():
+        log_path = _log_path_for(filename, scan, args)
+        if log_path:
+            uploads[filename] = pool.submit(
+                log_path,
+                _post_log_file_for,
+                filename,
+                scan,
+                args,
+                session,
+                journal,
+                spooler,
+            )
+    return uploads
+
+
+def _iter_output_tests(filenames, workers=None):
+    """
+    Yield (filename, tests) in the order of filenames. With workers, files
+    are parsed ahead on a process pool, keeping at most two files per
+    worker in flight.
+    """
+    if not workers or workers < 2 or len(filenames) < 2:
+        for filename in filenames:
+            yield filename, _get_tests(filename)
+        return
+
+    remaining = iter(filenames)
+    with _create_parse_pool(workers) as executor:
+        pending = deque(
+            (filename, executor.submit(_get_compact_tests, filename))
+            for filename in itertools.islice(remaining, workers * 2)
+        )
+        while pending:
+            filename, future = pending.popleft()
+            following = next(remaining, None)
+            if following is not None:
+                pending.append(
+                    (following, executor.submit(_get_compact_tests, following))
+                )
+            yield filename, _expand_compact_tests(future.result())
+
+
+def _create_parse_pool(workers):
+    # The MongoDB monitors, log uploads and artifact uploads are running by
+    # now. A forked child could inherit a lock one of them holds, so the
+    # workers start from a fresh interpreter instead.
+    methods = multiprocessing.get_all_start_methods()
+    method = "forkserver" if "forkserver" in methods else "spawn"
+    return ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context(method)
+    )
+
+
+def _get_compact_tests(output_file):
+    # Columns, or else tuples, pickle far smaller than records on their way
+    # back to the parent.
+    if has_numpy():
+        output_file = OutputFileBuilder().with_filename(output_file).construct()
+        return output_file.result_batch()
+    return [
+        (test.name, test.result, test.critical, test.test_duration)
+        for test in _get_tests(output_file)
+    ]
+
+
+def _expand_compact_tests(rows):
+    if isinstance(rows, ResultBatch):
+        yield from rows.records()
+        return
+    for name, result, critical, test_duration in rows:
+        yield TestRecord(name, result, critical, test_duration)
+
+
+def _next_test_list(parsed):
+    item = next(parsed, None)
+    if item is None:
+        return None
+    filename, tests = item
+    return filename, list(tests)
+
+
+async def _async_parse_output_files(
+    server, session, scan, args, mongodb=None, journal=None
+):
+    """
+    Parse files and upload their logs in the default executor while the
+    tests of earlier files are still being posted.
+    """
+    loop = asyncio.get_running_loop()
+    pool = _create_log_upload_pool(args)
+    try:
+        uploads = _submit_log_uploads(pool, scan, args, session, journal)
+        parsed = _iter_output_tests(scan.outputs(), args.parse_workers)
+        posts = []
+        while True:
+            item = await loop.run_in_executor(None, _next_test_list, parsed)
+            if item is None:
+                break
+            filename, tests = item
+            _LOGGER.info("output filename: %s", filename)
+            if filename in uploads:
+                log_file = asyncio.wrap_future(uploads[filename])
+            else:
+                log_file = loop.create_future()
+                log_file.set_result(
+                    await loop.run_in_executor(
+                        None,
+                        _post_log_file_for,
+                        filename,
+                        scan,
+                        args,
+                        session,
+                        journal,
+                    )
+                )
+            posts.append(
+                asyncio.ensure_future(
+                    _async_post_tests_after_log(
+                        server,
+                        tests,
+                        log_file,
+                        args,
+                        mongodb,
+                        _output_journal(journal, filename, args),
+                    )
+                )
+            )
+        await asyncio.gather(*posts)
+    finally:
+        if pool:
+            pool.shutdown()
+
+
+async def _async_post_tests_after_log(
+    server, tests, log_file, args, mongodb=None, journal=None
+):
+    # Tests wait for their own log only, so parsing carries on meanwhile.
+    log_file = await log_file
+    _LOGGER.info("log filename: %s", log_file)
+    await _async_post_tests(server, tests, log_file, args, mongodb, journal)
+ 
+ 
+def _log_path_for(output_file, scan, args):
+    # The scan already knows which logs exist, so outputs without one skip
+    # the upload instead of probing the filesystem.
+    return args.logfile or scan.log_for(output_file)
+
+
+def _post_log_file_for(output_file, scan, args, session, journal=None, spooler=None):
+    log_path = _log_path_for(output_file, scan, args)
+    if not log_path:
+        return None
+    key = os.path.abspath(log_path)
+    if _resuming(journal) and journal.acknowledged(LOG, key):
+        return journal.value(LOG, key)
+    upload = functools.partial(
+        _post_log_file,
+        output_file,
+        args.receiver,
+        log_path,
+        session,
+        compresslevel=args.gzip_level,
+        gzip_workers=args.gzip_workers,
+    )
+    if spooler is None:
+        log_file = upload()
+    else:
+        log_file = spooler.post_log(log_path, upload, output_file)
+    # Only a stored name is journaled, never a missing one or a spool
+    # reference.
+    if (
+        journal is not None
+        and log_file
+        and (spooler is None or not spooler.spool.is_log_reference(log_file))
+    ):
+        journal.record(LOG, key, log_file)
+    return log_file
+
+
+def _post_log_file(
+    output_file,
+    url,
+    new_logfile_name,
+    session=None,
+    compresslevel=DEFAULT_COMPRESS_LEVEL,
+    gzip_workers=1,
+):
     log_file = (
-        LogFileBuilder().with_output_file(output_file).with_receiver(url).construct()
+        LogFileBuilder()
+        .with_output_file(output_file)
+        .with_receiver(url)
+        .with_session(session)
+        .with_progress(_log_upload_progress(new_logfile_name))
+        .with_memo(_LOG_MEMO)
+        .construct()
+    )
+    log_file.gzip_log(
+        new_logfile_name, compresslevel=compresslevel, workers=gzip_workers
     )
-    log_file.gzip_log(new_logfile_name)
     log_file.post_log_file(new_logfile_name)
     return log_file.log_file
  
  
+def _log_upload_progress(log_path):
+    reported = [-1]
+
+    def progress(sent, total):
+        # Log every tenth of the upload rather than every chunk.
+        step = 10 * sent // total if total else 10
+        if step > reported[0]:
+            reported[0] = step
+            _LOGGER.debug("Uploading %s: %d/%d bytes", log_path, sent, total)
+
+    return progress
+
+
 def _get_tests(output_file):
     output_file = OutputFileBuilder().with_filename(output_file).construct()
-    output_file.parse_output_file()
-    return output_file.get_tests()
- 
- 
-def _post_tests(server, tests, log_file, args):
-    for row in tests:
-        test = (
-            TestBuilder()
-            .with_name(row["name"])
-            .with_result(row["result"])
-            .with_critical(row["critical"])
-            .with_test_duration(row["test_duration"])
-            .with_branch_name(args.branch)
-            .with_build_name(args.build)
-            .with_stage(args.stage)
-            .with_log(log_file)
-            .construct()
-        )
-        _LOGGER.info("Test: %s", test)
-        server.create_test_case(test)
-        server.create_test_result(test)
+    return output_file.iter_records()
+ 
+ 
+def _batched(rows, size):
+    rows = iter(rows)
+    batch = list(itertools.islice(rows, size))
+    while batch:
+        yield batch
+        batch = list(itertools.islice(rows, size))
+
+
+def _post_tests(server, tests, log_file, args, poster=None, mongodb=None, journal=None):
+    context = _create_context(log_file, args)
+    for rows in _batched(tests, args.batch_size):
+        # Tests whose result a resumed run already posted are skipped.
+        rows = _pending(journal, RESULT, _keyed(journal, rows))
+        if not rows:
+            continue
+        batch = [_attach_context(record, context) for _, record in rows]
+        if mongodb:
+            mongodb.post_tests(batch)
+        if poster:
+            for key, test in rows:
+                poster.submit(test, key, journal)
+        else:
+            cases = _pending(journal, CASE, rows)
+            if cases:
+                server.create_test_cases(
+                    [test for _, test in cases], _acknowledger(journal, CASE, cases)
+                )
+            server.create_test_results(batch, _acknowledger(journal, RESULT, rows))
+
+
+async def _async_post_tests(server, tests, log_file, args, mongodb=None, journal=None):
+    loop = asyncio.get_running_loop()
+    context = _create_context(log_file, args)
+    # Each group spans enough chunks to keep every request slot busy.
+    for rows in _batched(tests, args.batch_size * server.concurrency):
+        rows = _pending(journal, RESULT, _keyed(journal, rows))
+        if not rows:
+            continue
+        batch = [_attach_context(record, context) for _, record in rows]
+        if mongodb:
+            await loop.run_in_executor(None, mongodb.post_tests, batch)
+        cases = _pending(journal, CASE, rows)
+        if cases:
+            await server.create_test_cases([test for _, test in cases])
+            _acknowledge(journal, CASE, cases)
+        await server.create_test_results(batch)
+        _acknowledge(journal, RESULT, rows)
+
+
+def _create_context(log_file, args):
+    # One context per output file, shared by all of its records.
+    return TestContext(args.branch, args.build, args.stage, log_file)
+
+
+def _attach_context(record, context):
+    record.attach(context)
+    _LOGGER.info("Test: %s", record)
+    return record
  
  
 if __name__ == "__main__":
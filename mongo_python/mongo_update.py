@@ -3,7 +3,12 @@ import argparse
 from . import branch as selene_branch
 from . import build as selene_build
 from . import log_file
+from . import lookup_cache
+from . import mongo_client
+from . import selene_mongodb
 from . import selene_server
+from . import server as selene_http
+from . import spool as selene_spool
 from . import test as selene_test_result
 
 
@@ -19,9 +24,19 @@ def _create_parser_add_args():
         help="Base URL for the Selene application server",
         default="http://skydocker.adtran.com",
     )
+    parser.add_argument(
+        "--cache-file",
+        help="Cache branch/build ids here across invocations "
+        "(defaults to $SELENE_CACHE_FILE)",
+    )
+    parser.add_argument(
+        "--no-cache", help="Ignore the lookup cache", action="store_true"
+    )
     subparser = parser.add_subparsers()
     _create_build_parser(subparser.add_parser("build"))
     _create_result_parser(subparser.add_parser("result"))
+    _create_index_parser(subparser.add_parser("index"))
+    _create_spool_parser(subparser.add_parser("spool"))
     return parser
 
 
@@ -36,6 +51,16 @@ def _create_result_parser(parser):
     _create_result_create_parser(subparser.add_parser("create"))
 
 
+def _create_index_parser(parser):
+    subparser = parser.add_subparsers()
+    _create_index_ensure_parser(subparser.add_parser("ensure"))
+
+
+def _create_spool_parser(parser):
+    subparser = parser.add_subparsers()
+    _create_spool_replay_parser(subparser.add_parser("replay"))
+
+
 def _create_update_build_parser(parser):
     parser.add_argument("--status", help="Current build status")
     parser.add_argument("--branch-name", help="Current branch name")
@@ -56,8 +81,56 @@ def _create_result_create_parser(parser):
     parser.set_defaults(func=create_result)
 
 
+def _create_index_ensure_parser(parser):
+    parser.add_argument(
+        "--branch-name", help="Branch whose database is indexed", required=True
+    )
+    parser.add_argument(
+        "--build-name", help="Index only this build's collection (defaults to all)"
+    )
+    parser.add_argument(
+        "--mongo-uri",
+        help="MongoDB connection string (defaults to ${0} or {1})".format(
+            mongo_client.MONGO_URI_VARIABLE, mongo_client.DEFAULT_MONGO_URI
+        ),
+    )
+    parser.add_argument(
+        "--dry-run", help="Only list the missing indexes", action="store_true"
+    )
+    parser.set_defaults(func=ensure_indexes)
+
+
+def _create_spool_replay_parser(parser):
+    parser.add_argument("directory", help="Spool folder given to mongo-post --spool")
+    parser.add_argument(
+        "--jobs",
+        help="Number of bulk requests and log uploads in flight at once",
+        type=int,
+        default=selene_spool.DEFAULT_REPLAY_JOBS,
+    )
+    parser.add_argument(
+        "--batch-size",
+        help="Maximum number of tests sent per bulk request",
+        type=int,
+        default=selene_server.DEFAULT_BATCH_SIZE,
+    )
+    parser.set_defaults(func=replay_spool)
+
+
+def _create_server(args):
+    cache = lookup_cache.open_lookup_cache(
+        args.cache_file, args.receiver, args.no_cache
+    )
+    return (
+        selene_server.SeleneServerBuilder()
+        .with_url(args.receiver)
+        .with_lookup_cache(cache)
+        .construct()
+    )
+
+
 def update_build(args):
-    server = selene_server.SeleneServerBuilder().with_url(args.receiver).construct()
+    server = _create_server(args)
     build = (
         selene_build.BuildBuilder()
         .with_name(args.build_name)
@@ -81,27 +154,82 @@ def update_build(args):
         server.update_build(build)
     except selene_build.BuildNotFoundError:
         server.create_build(build)
+    finally:
+        server.close()
 
 
 def create_result(args):
-    server = selene_server.SeleneServer(url=args.receiver)
+    server = _create_server(args)
     branch = selene_branch.Branch(name=args.branch_name)
     build_result = "SUCCESS" if args.result == "pass" else "FAILURE"
     build = selene_build.Build(name=args.build_name, branch=branch, status=build_result)
     try:
-        build.build_id = server.get_build_id(build)
-    except selene_build.BuildNotFoundError:
-        server.create_build(build)
+        try:
+            build.build_id = server.get_build_id(build)
+        except selene_build.BuildNotFoundError:
+            server.create_build(build)
+
+        test_log = log_file.LogFile(
+            output_file=None, receiver=args.receiver, session=server.session
+        )
+        test_log.post_log_file(args.log_path)
+        test = selene_test_result.Test(
+            name=args.test_name,
+            result=args.result,
+            branch_name=args.branch_name,
+            build_name=args.build_name,
+            log=test_log.log_file,
+            critical=True,
+        )
+        server.create_test_case(test)
+        server.create_test_result(test)
+    finally:
+        server.close()
+
 
-    test_log = log_file.LogFile(output_file=None, receiver=args.receiver)
-    test_log.post_log_file(args.log_path)
-    test = selene_test_result.Test(
-        name=args.test_name,
-        result=args.result,
-        branch_name=args.branch_name,
-        build_name=args.build_name,
-        log=test_log.log_file,
-        critical=True,
-    )
-    server.create_test_case(test)
-    server.create_test_result(test)
+def ensure_indexes(args):
+    connection = mongo_client.configure(args.mongo_uri)
+    try:
+        if args.build_name:
+            build_names = [args.build_name]
+        else:
+            database = connection.client[args.branch_name]
+            build_names = sorted(
+                name
+                for name in database.list_collection_names()
+                if selene_mongodb.is_build_collection(name)
+            )
+        for build_name in build_names:
+            mongodb = selene_mongodb.SeleneMongoDB(args.branch_name, build_name)
+            missing = mongodb.missing_indexes()
+            if not missing:
+                print("{0}: all indexes present".format(build_name))
+                continue
+            print("{0}: missing {1}".format(build_name, ", ".join(missing)))
+            if not args.dry_run:
+                mongodb.ensure_indexes()
+                print("{0}: built {1}".format(build_name, ", ".join(missing)))
+    finally:
+        connection.close()
+
+
+def replay_spool(args):
+    cache = lookup_cache.open_lookup_cache(
+        args.cache_file, args.receiver, args.no_cache
+    )
+    server = (
+        selene_server.SeleneServerBuilder()
+        .with_url(args.receiver)
+        .with_pool_size(max(selene_http.DEFAULT_POOL_SIZE, args.jobs))
+        .with_batch_size(args.batch_size)
+        .with_lookup_cache(cache)
+        .construct()
+    )
+    try:
+        replay = selene_spool.SpoolReplay(server, args.jobs, args.batch_size)
+        posted = replay.replay(args.directory)
+    finally:
+        server.close()
+    print("Replayed {0} tests from {1}".format(posted, args.directory))
+    if replay.without_log:
+        print("{0} of them were posted without their log".format(replay.without_log))
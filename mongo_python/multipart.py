@@ -0,0 +1,97 @@
+import os
+import uuid
+
+CHUNK_SIZE = 64 * 1024
+
+
+class MultipartFileEncoder:
+    """
+    File-like multipart/form-data body holding a single file field. The file
+    is read in chunks as the body is consumed, so requests streams it with a
+    known Content-Length instead of building the body in memory.
+
+    Parameters:
+        field name -- form field the file is sent as
+        path -- path of the file to send
+        progress -- optional callable taking (bytes of the file sent, file size)
+        boundary -- multipart boundary. Random when omitted.
+    """
+
+    def __init__(self, field_name, path, progress=None, boundary=None):
+        self._boundary = boundary or uuid.uuid4().hex
+        self._progress = progress
+        self._file = open(path, "rb")
+        self._file_size = os.fstat(self._file.fileno()).st_size
+        self._header = (
+            "--{0}\r\n"
+            'Content-Disposition: form-data; name="{1}"; filename="{2}"\r\n'
+            "\r\n".format(self._boundary, field_name, os.path.basename(path))
+        ).encode()
+        self._footer = "\r\n--{0}--\r\n".format(self._boundary).encode()
+        self._file_end = len(self._header) + self._file_size
+        self._length = self._file_end + len(self._footer)
+        self._position = 0
+
+    @property
+    def content_type(self):
+        return "multipart/form-data; boundary={0}".format(self._boundary)
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        return iter(lambda: self.read(CHUNK_SIZE), b"")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        # urllib3 rewinds the body through seek/tell before retrying.
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence == os.SEEK_END:
+            offset += self._length
+        self._position = max(0, min(offset, self._length))
+        if self._position > len(self._header):
+            self._file.seek(min(self._position, self._file_end) - len(self._header))
+        else:
+            self._file.seek(0)
+        return self._position
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._length - self._position
+        parts = []
+        while size > 0 and self._position < self._length:
+            chunk = self._read_segment(size)
+            parts.append(chunk)
+            size -= len(chunk)
+            self._position += len(chunk)
+        data = b"".join(parts)
+        if data and self._progress is not None:
+            sent = min(max(self._position - len(self._header), 0), self._file_size)
+            self._progress(sent, self._file_size)
+        return data
+
+    def _read_segment(self, size):
+        header_size = len(self._header)
+        if self._position < header_size:
+            return self._header[self._position : self._position + size]
+        if self._position < self._file_end:
+            chunk = self._file.read(min(size, self._file_end - self._position))
+            if not chunk:
+                raise ValueError(
+                    "{0} shrank while it was being uploaded".format(self._file.name)
+                )
+            return chunk
+        offset = self._position - self._file_end
+        return self._footer[offset : offset + size]
@@ -1,5 +1,7 @@
 import xml.etree.ElementTree as ET
 from .test import TestBuilder
+from .record import TestRecord
+from .result_batch import ResultBatch
 
 
 def _parse_robot(output_xml_root):
@@ -11,20 +13,48 @@ def _parse_robot(output_xml_root):
 def _parse_not_robot(suites):
     for item in suites.iter():
         if item.tag == "testcase":
-            yield TestBuilder().with_name(
-                item.get("classname") + "." + item.get("name")
-            ).with_result(
-                "fail"
-                if item.findall("skipped")
-                or item.findall("failure")
-                or item.get("status") == "skipped"
-                or item.get("status") == "failure"
-                else "pass"
-            ).with_critical(
-                item.get("status") != "skipped" and not item.findall("skipped")
-            ).with_test_duration(
-                float(item.get("time"))
-            ).construct().to_json()
+            yield _parse_testcase(item)
+
+
+def _iterparse_not_robot(filename):
+    """
+    Stream the tests of a JUnit style file. Each <testcase> is parsed once
+    when it closes and then detached. Children of a testcase only keep
+    their tag, so captured output and failure messages are dropped as soon
+    as they are read.
+    """
+    elements = []
+    for event, element in ET.iterparse(filename, events=("start", "end")):
+        if event == "start":
+            elements.append(element)
+            continue
+
+        elements.pop()
+        parent = elements[-1] if elements else None
+        if element.tag == "testcase":
+            yield _parse_testcase(element)
+        if parent is None:
+            continue
+        if parent.tag == "testcase":
+            element.clear()
+        else:
+            parent.remove(element)
+
+
+def _parse_testcase(item):
+    skipped = failed = False
+    for child in item:
+        if child.tag == "skipped":
+            skipped = True
+        elif child.tag == "failure":
+            failed = True
+    status = item.get("status")
+    return TestRecord(
+        item.get("classname") + "." + item.get("name"),
+        "fail" if skipped or failed or status in ("skipped", "failure") else "pass",
+        status != "skipped" and not skipped,
+        float(item.get("time")),
+    )
 
 
 def _parse_robot_suite(suite, parent_name=None):
@@ -34,12 +64,59 @@ def _parse_robot_suite(suite, parent_name=None):
     else:
         suite_name = suite.get("name")
     for test in suite.findall("test"):
-        yield test_builder.parse_test(test, suite_name)
+        yield test_builder.parse_record(test, suite_name)
     for subsuite in suite.findall("suite"):
         for test in _parse_robot_suite(subsuite, suite_name):
             yield test
 
 
+def _iterparse_robot(filename):
+    """
+    Stream the tests of a robot output file. Each <test> is parsed as soon
+    as it closes and every finished element is detached from its parent,
+    so memory is bounded by the largest single test instead of the file.
+    """
+    test_builder = TestBuilder().construct()
+    elements = []
+    suites = []
+    top_suite_seen = False
+    for event, element in ET.iterparse(filename, events=("start", "end")):
+        if event == "start":
+            parent = elements[-1] if elements else None
+            if element.tag == "suite":
+                if suites and parent is suites[-1][0]:
+                    suites.append(
+                        (element, "{}.{}".format(suites[-1][1], element.get("name")))
+                    )
+                elif len(elements) == 1 and not top_suite_seen:
+                    top_suite_seen = True
+                    suites.append((element, element.get("name")))
+            elements.append(element)
+            continue
+
+        elements.pop()
+        parent = elements[-1] if elements else None
+        if element.tag == "test" and suites and parent is suites[-1][0]:
+            yield test_builder.parse_record(element, suites[-1][1])
+        elif suites and element is suites[-1][0]:
+            suites.pop()
+        # A test only needs its own <status> once it closes; everything else
+        # has been consumed by now.
+        if parent is not None and element.tag != "status":
+            parent.remove(element)
+
+
+def _as_json(test):
+    # Parse functions passed in by callers may still return dicts.
+    return test.to_json() if isinstance(test, TestRecord) else test
+
+
+_STREAMING_PARSERS = {
+    _parse_robot: _iterparse_robot,
+    _parse_not_robot: _iterparse_not_robot,
+}
+
+
 class OutputFile:
     """
     Model for an individual output file.
@@ -66,11 +143,40 @@ class OutputFile:
 
     def parse_output_file(self):
         root = ET.parse(self._filename).getroot()
-        self._tests = list(self.parse_output_file_function(root))
+        self._tests = [_as_json(test) for test in self.parse_output_file_function(root)]
 
     def get_tests(self):
         return self._tests
 
+    def iter_tests(self):
+        """
+        Yield the tests of the output file one at a time as dicts.
+        """
+        for record in self.iter_records():
+            yield record.to_json()
+
+    def iter_records(self):
+        """
+        Yield the tests of the output file one at a time as TestRecords.
+        Uses a streaming parser when there is one for the file type instead
+        of loading the whole tree.
+        """
+        stream_function = _STREAMING_PARSERS.get(self.parse_output_file_function)
+        if stream_function is None:
+            root = ET.parse(self._filename).getroot()
+            for test in self.parse_output_file_function(root):
+                yield (
+                    test if isinstance(test, TestRecord) else TestRecord.from_json(test)
+                )
+            return
+        yield from stream_function(self._filename)
+
+    def result_batch(self):
+        """
+        Parse the output file into a columnar ResultBatch. Requires numpy.
+        """
+        return ResultBatch.from_records(self.iter_records())
+
 
 class OutputFileBuilder:
     """
@@ -0,0 +1,165 @@
+import json
+
+
+class TestContext:
+    """
+    Model for the fields every test of an output file shares. One context
+    is attached to all of the file's records instead of copying the fields
+    into each of them.
+
+    Parameters:
+        branch name -- name of the branch on which the tests were run
+        build name -- name of the build on which the tests were run
+        stage -- name of the testing stage the tests were run in
+        log -- log file associated with the tests
+    """
+
+    __slots__ = ("_branch_name", "_build_name", "_stage", "_log")
+
+    def __init__(self, branch_name=None, build_name=None, stage=None, log=None):
+        self._branch_name = branch_name
+        self._build_name = build_name
+        self._stage = stage
+        self._log = log
+
+    @property
+    def branch_name(self):
+        return self._branch_name
+
+    @property
+    def build_name(self):
+        return self._build_name
+
+    @property
+    def stage(self):
+        return self._stage
+
+    @property
+    def log(self):
+        return self._log
+
+
+_EMPTY_CONTEXT = TestContext()
+
+
+class TestRecord:
+    """
+    Compact model for a parsed test, emitted directly by the output file
+    parsers. Offers the read side of Test, so servers accept either. The
+    JSON payload is encoded on first use and reused afterwards, so posting
+    the test case and the test result serializes the test once.
+
+    Parameters:
+        name -- name of the test
+        result -- pass/fail result of the test
+        critical -- boolean of whether the test was critical or not
+        test duration -- time (in seconds) it took the test to run
+        context -- shared per-file fields. Empty until attached.
+    """
+
+    __slots__ = (
+        "_name",
+        "_result",
+        "_critical",
+        "_test_duration",
+        "_context",
+        "_payload",
+    )
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, name, result, critical=True, test_duration=None, context=None):
+        self._name = name
+        self._result = result
+        self._critical = critical
+        self._test_duration = test_duration
+        self._context = context if context is not None else _EMPTY_CONTEXT
+        self._payload = None
+
+    @classmethod
+    def from_json(cls, items):
+        """
+        Build a record from a dict as returned by Test.to_json. The per-file
+        fields get a context of their own.
+        """
+        context = TestContext(
+            items.get("branch_name"),
+            items.get("build_name"),
+            items.get("stage"),
+            items.get("log"),
+        )
+        return cls(
+            items.get("name"),
+            items.get("result"),
+            items.get("critical"),
+            items.get("test_duration"),
+            context,
+        )
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def result(self):
+        return self._result
+
+    @property
+    def critical(self):
+        return self._critical
+
+    @property
+    def test_duration(self):
+        return self._test_duration
+
+    @property
+    def context(self):
+        return self._context
+
+    @property
+    def branch_name(self):
+        return self._context.branch_name
+
+    @property
+    def build_name(self):
+        return self._context.build_name
+
+    @property
+    def stage(self):
+        return self._context.stage
+
+    @property
+    def log(self):
+        return self._context.log
+
+    def attach(self, context):
+        """
+        Share context's fields with this record. Returns the record.
+        """
+        self._context = context
+        self._payload = None
+        return self
+
+    def to_json(self):
+        # Same keys in the same order as Test.to_json.
+        context = self._context
+        items = (
+            ("name", self._name),
+            ("result", self._result),
+            ("branch_name", context.branch_name),
+            ("build_name", context.build_name),
+            ("log", context.log),
+            ("stage", context.stage),
+            ("critical", self._critical),
+            ("test_duration", self._test_duration),
+        )
+        return {k: v for k, v in items if v is not None}
+
+    def payload(self):
+        if self._payload is None:
+            self._payload = json.dumps(self.to_json(), separators=(",", ":")).encode(
+                "utf-8"
+            )
+        return self._payload
+
+    def __repr__(self):
+        return "TestRecord({0!r}, {1!r})".format(self._name, self._result)
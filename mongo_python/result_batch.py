@@ -0,0 +1,324 @@
+import importlib.util
+import math
+
+from .record import TestContext, TestRecord
+
+DEFAULT_SLOWEST = 10
+
+
+def has_numpy():
+    return importlib.util.find_spec("numpy") is not None
+
+
+def _numpy():
+    # Imported on first use so the CLI does not pay for loading numpy.
+    try:
+        # pylint: disable=import-outside-toplevel
+        import numpy
+    except ImportError as error:
+        raise ImportError(
+            "ResultBatch requires numpy, install mongo_python[summary]"
+        ) from error
+    return numpy
+
+
+def _intern(table, index, value):
+    position = index.get(value)
+    if position is None:
+        position = index[value] = len(table)
+        table.append(value)
+    return position
+
+
+class StageSummary:
+    """
+    Model for the results of one stage.
+
+    Parameters:
+        stage -- name of the stage. None for tests without one.
+        tests -- number of tests
+        passed -- number of passing tests
+        critical failures -- number of critical tests that did not pass
+        total duration -- summed duration of the tests, in seconds
+        slowest -- (name, duration) of the slowest tests, slowest first
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self, stage, tests, passed, critical_failures, total_duration, slowest
+    ):
+        self._stage = stage
+        self._tests = tests
+        self._passed = passed
+        self._critical_failures = critical_failures
+        self._total_duration = total_duration
+        self._slowest = slowest
+
+    @property
+    def stage(self):
+        return self._stage
+
+    @property
+    def tests(self):
+        return self._tests
+
+    @property
+    def passed(self):
+        return self._passed
+
+    @property
+    def failed(self):
+        return self._tests - self._passed
+
+    @property
+    def pass_rate(self):
+        return self._passed / self._tests if self._tests else 0.0
+
+    @property
+    def critical_failures(self):
+        return self._critical_failures
+
+    @property
+    def total_duration(self):
+        return self._total_duration
+
+    @property
+    def slowest(self):
+        return self._slowest
+
+    def __str__(self):
+        return "{0}: {1} tests, {2:.1%} passed, {3} critical failures, {4:.1f}s".format(
+            self._stage,
+            self._tests,
+            self.pass_rate,
+            self._critical_failures,
+            self._total_duration,
+        )
+
+
+class ResultBatch:
+    """
+    Columnar model for parsed tests. Each column is a NumPy array with one
+    entry per test; names, results and stages are stored once in tables
+    and referenced by index, so a history holding the same test many times
+    keeps one copy of its name.
+
+    Parameters:
+        names -- table of distinct test names
+        name ids -- index into names per test
+        results -- table of distinct results
+        result ids -- index into results per test
+        stages -- table of distinct stages
+        stage ids -- index into stages per test
+        critical -- whether each test was critical
+        durations -- duration of each test in seconds. NaN when unknown.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        names,
+        name_ids,
+        results,
+        result_ids,
+        stages,
+        stage_ids,
+        critical,
+        durations,
+    ):
+        self._names = names
+        self._name_ids = name_ids
+        self._results = results
+        self._result_ids = result_ids
+        self._stages = stages
+        self._stage_ids = stage_ids
+        self._critical = critical
+        self._durations = durations
+
+    @classmethod
+    def from_records(cls, records, stage=None):
+        """
+        Build a batch from TestRecords, or anything with the same fields.
+        stage, when given, replaces the stage of every record.
+        """
+        numpy = _numpy()
+        names, name_index, name_ids = [], {}, []
+        results, result_index, result_ids = [], {}, []
+        stages, stage_index, stage_ids = [], {}, []
+        critical, durations = [], []
+        for record in records:
+            name_ids.append(_intern(names, name_index, record.name))
+            result_ids.append(_intern(results, result_index, record.result))
+            stage_ids.append(
+                _intern(stages, stage_index, record.stage if stage is None else stage)
+            )
+            critical.append(bool(record.critical))
+            duration = record.test_duration
+            durations.append(math.nan if duration is None else duration)
+        return cls(
+            names,
+            numpy.array(name_ids, dtype=numpy.int32),
+            results,
+            numpy.array(result_ids, dtype=numpy.int32),
+            stages,
+            numpy.array(stage_ids, dtype=numpy.int32),
+            numpy.array(critical, dtype=bool),
+            numpy.array(durations, dtype=numpy.float64),
+        )
+
+    @classmethod
+    def concatenate(cls, batches):
+        """
+        Join batches into one, merging their tables.
+        """
+        numpy = _numpy()
+        batches = list(batches)
+        tables = ([], [], [])
+        indexes = ({}, {}, {})
+        ids = ([], [], [])
+        for batch in batches:
+            columns = (
+                (batch.names, batch.name_ids),
+                (batch.results, batch.result_ids),
+                (batch.stages, batch.stage_ids),
+            )
+            for column, (table, local_ids) in enumerate(columns):
+                remap = numpy.array(
+                    [_intern(tables[column], indexes[column], v) for v in table],
+                    dtype=numpy.int32,
+                )
+                ids[column].append(remap[local_ids] if len(remap) else local_ids)
+
+        def join(arrays, dtype):
+            return numpy.concatenate(arrays) if arrays else numpy.zeros(0, dtype)
+
+        return cls(
+            tables[0],
+            join(ids[0], numpy.int32),
+            tables[1],
+            join(ids[1], numpy.int32),
+            tables[2],
+            join(ids[2], numpy.int32),
+            join([batch.critical for batch in batches], bool),
+            join([batch.durations for batch in batches], numpy.float64),
+        )
+
+    @property
+    def names(self):
+        return self._names
+
+    @property
+    def name_ids(self):
+        return self._name_ids
+
+    @property
+    def results(self):
+        return self._results
+
+    @property
+    def result_ids(self):
+        return self._result_ids
+
+    @property
+    def stages(self):
+        return self._stages
+
+    @property
+    def stage_ids(self):
+        return self._stage_ids
+
+    @property
+    def critical(self):
+        return self._critical
+
+    @property
+    def durations(self):
+        return self._durations
+
+    def __len__(self):
+        return len(self._name_ids)
+
+    def passed(self):
+        """
+        Boolean array of which tests passed.
+        """
+        if "pass" not in self._results:
+            return self._result_ids < 0
+        return self._result_ids == self._results.index("pass")
+
+    def records(self, context=None):
+        """
+        Yield the tests as TestRecords, ready to post. Every record shares
+        context; without one, records of a stage share a context holding
+        just that stage.
+        """
+        contexts = None
+        if context is None:
+            contexts = [TestContext(stage=stage) for stage in self._stages]
+        columns = zip(
+            self._name_ids.tolist(),
+            self._result_ids.tolist(),
+            self._stage_ids.tolist(),
+            self._critical.tolist(),
+            self._durations.tolist(),
+        )
+        for name_id, result_id, stage_id, critical, duration in columns:
+            yield TestRecord(
+                self._names[name_id],
+                self._results[result_id],
+                critical,
+                None if math.isnan(duration) else duration,
+                context if context is not None else contexts[stage_id],
+            )
+
+    def summarize(self, slowest=DEFAULT_SLOWEST):
+        """
+        Return a StageSummary per stage, in the order stages first appear.
+        Test, pass and critical failure counts come from a single bincount
+        over (stage, passed, critical) keys and the totals from a weighted
+        one; only the slowest tests are picked stage by stage.
+        """
+        numpy = _numpy()
+        count = len(self._stages)
+        stage_ids = self._stage_ids.astype(numpy.intp)
+        keys = stage_ids * 4
+        keys += self.passed() * 2
+        keys += self._critical
+        outcomes = numpy.bincount(keys, minlength=count * 4).reshape(count, 4)
+        # Unknown durations add nothing to totals and never rank as slowest.
+        known = ~numpy.isnan(self._durations)
+        totals = numpy.bincount(
+            stage_ids,
+            weights=numpy.where(known, self._durations, 0.0),
+            minlength=count,
+        )
+        summaries = []
+        for index, stage in enumerate(self._stages):
+            in_stage = known if count == 1 else known & (stage_ids == index)
+            summaries.append(
+                StageSummary(
+                    stage,
+                    int(outcomes[index].sum()),
+                    int(outcomes[index, 2:].sum()),
+                    int(outcomes[index, 1]),
+                    float(totals[index]),
+                    self._slowest(numpy, numpy.flatnonzero(in_stage), slowest),
+                )
+            )
+        return summaries
+
+    def _slowest(self, numpy, positions, count):
+        count = min(count, len(positions))
+        if count <= 0:
+            return []
+        durations = self._durations[positions]
+        if len(positions) > count:
+            top = numpy.argpartition(durations, -count)[-count:]
+            positions, durations = positions[top], durations[top]
+        order = numpy.argsort(-durations, kind="stable")
+        return [
+            (self._names[name_id], duration)
+            for name_id, duration in zip(
+                self._name_ids[positions[order]].tolist(), durations[order].tolist()
+            )
+        ]
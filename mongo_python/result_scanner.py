@@ -0,0 +1,188 @@
+import fnmatch
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from .log_file import get_log_path
+
+ROBOT_OUTPUT = "robot_output"
+JUNIT = "junit"
+LOG = "log"
+ARTIFACT = "artifact"
+
+
+def _classify(name):
+    # Hidden files are never treated as results, mirroring glob.
+    if name.startswith("."):
+        return ARTIFACT
+    if fnmatch.fnmatch(name, "*TESTS-*.xml"):
+        return JUNIT
+    if fnmatch.fnmatch(name, "*output*.xml"):
+        return ROBOT_OUTPUT
+    if fnmatch.fnmatch(name, "*log*.html"):
+        return LOG
+    return ARTIFACT
+
+
+class ScannedFile:
+    """
+    Model for a file found while scanning a results directory.
+
+    Parameters:
+        path -- path of the file, joined onto the scanned directory
+        relative path -- path relative to the scanned directory
+        kind -- one of ROBOT_OUTPUT, JUNIT, LOG or ARTIFACT
+        entry -- os.DirEntry the file was found through. Its stat result
+            is cached, so size and mtime cost at most one stat call.
+    """
+
+    def __init__(self, path, relative_path, kind, entry=None):
+        self._path = path
+        self._relative_path = relative_path
+        self._kind = kind
+        self._entry = entry
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def relative_path(self):
+        return self._relative_path
+
+    @property
+    def kind(self):
+        return self._kind
+
+    @property
+    def size(self):
+        return self._stat().st_size
+
+    @property
+    def mtime(self):
+        return self._stat().st_mtime
+
+    @property
+    def mtime_ns(self):
+        return self._stat().st_mtime_ns
+
+    def _stat(self):
+        if self._entry is not None:
+            return self._entry.stat()
+        return os.stat(self._path)
+
+
+class ScanResult:
+    """
+    Classified files of a results directory.
+
+    Parameters:
+        directory -- the scanned directory
+        files -- scanned files, sorted by relative path
+    """
+
+    def __init__(self, directory, files):
+        self._directory = directory
+        self._files = files
+        self._paths = {scanned.path for scanned in files}
+
+    @property
+    def directory(self):
+        return self._directory
+
+    @property
+    def files(self):
+        return self._files
+
+    def of_kind(self, kind):
+        return [scanned for scanned in self._files if scanned.kind == kind]
+
+    def outputs(self):
+        """
+        Paths of the files holding test results, robot outputs first.
+        """
+        return [scanned.path for scanned in self.of_kind(ROBOT_OUTPUT)] + [
+            scanned.path for scanned in self.of_kind(JUNIT)
+        ]
+
+    def log_for(self, output_file):
+        """
+        Return the log scanned alongside output_file, or None.
+        """
+        log_path = get_log_path(output_file)
+        return log_path if log_path in self._paths else None
+
+
+class ResultScanner:
+    """
+    Walks a results directory once with os.scandir.
+
+    Parameters:
+        directory -- results directory to scan
+        excludes -- fnmatch patterns matched against relative paths and
+            names. Matching directories are not descended into.
+        workers -- scan subdirectories on this many threads. Helps on
+            filesystems with high per-call latency such as NFS.
+    """
+
+    def __init__(self, directory, excludes=None, workers=None):
+        self._directory = directory
+        self._excludes = list(excludes or [])
+        self._workers = workers
+
+    @property
+    def directory(self):
+        return self._directory
+
+    def scan(self):
+        if not os.path.isdir(self._directory):
+            return ScanResult(self._directory, [])
+        if self._workers and self._workers > 1:
+            files = self._scan_in_parallel()
+        else:
+            files = self._scan_serially()
+        files.sort(key=lambda scanned: scanned.relative_path)
+        return ScanResult(self._directory, files)
+
+    def _scan_serially(self):
+        files = []
+        pending = [(self._directory, "")]
+        while pending:
+            found, subdirectories = self._scan_directory(*pending.pop())
+            files.extend(found)
+            pending.extend(subdirectories)
+        return files
+
+    def _scan_in_parallel(self):
+        files = []
+        with ThreadPoolExecutor(max_workers=self._workers) as executor:
+            pending = [executor.submit(self._scan_directory, self._directory, "")]
+            while pending:
+                found, subdirectories = pending.pop().result()
+                files.extend(found)
+                pending.extend(
+                    executor.submit(self._scan_directory, *subdirectory)
+                    for subdirectory in subdirectories
+                )
+        return files
+
+    def _scan_directory(self, directory, relative_directory):
+        files = []
+        subdirectories = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                relative_path = os.path.join(relative_directory, entry.name)
+                if self._is_excluded(entry.name, relative_path):
+                    continue
+                if entry.is_dir():
+                    if not entry.name.startswith("."):
+                        subdirectories.append((entry.path, relative_path))
+                elif entry.is_file():
+                    kind = _classify(entry.name)
+                    files.append(ScannedFile(entry.path, relative_path, kind, entry))
+        return files, subdirectories
+
+    def _is_excluded(self, name, relative_path):
+        return any(
+            fnmatch.fnmatch(relative_path, pattern) or fnmatch.fnmatch(name, pattern)
+            for pattern in self._excludes
+        )
@@ -0,0 +1,146 @@
+import itertools
+import threading
+
+from . import mongo_client
+
+DEFAULT_BATCH_SIZE = 1000
+# Fields identifying a test record. Reposting a test updates its record.
+TEST_KEY = ("branch", "build", "stage", "name")
+# Indexes of a build collection as (name, keys, options). The test key index
+# skips the build document, which has no name.
+INDEXES = (
+    ("name_1", [("name", 1)], {}),
+    ("result_1", [("result", 1)], {}),
+    ("stage_1", [("stage", 1)], {}),
+    ("critical_1", [("critical", 1)], {}),
+    (
+        "test_key",
+        [(field, 1) for field in TEST_KEY],
+        {"unique": True, "partialFilterExpression": {"name": {"$exists": True}}},
+    ),
+)
+
+_ENSURED_LOCK = threading.Lock()
+_ENSURED = set()
+
+
+def parse_write_concern(value):
+    """
+    Turn a --mongo-write-concern value such as "majority" or "1" into
+    WriteConcern keyword arguments.
+    """
+    if value is None:
+        return None
+    return {"w": int(value) if str(value).isdigit() else value}
+
+
+def is_build_collection(name):
+    """
+    Tell build collections apart from GridFS buckets and system collections
+    sharing the branch database.
+    """
+    return not (name.startswith("system.") or name.endswith((".files", ".chunks")))
+
+
+def _test_record(test):
+    record = test.to_json()
+    record["branch"] = record.pop("branch_name", None)
+    record["build"] = record.pop("build_name", None)
+    record.setdefault("stage", None)
+    return record
+
+
+class SeleneMongoDB:
+    """
+    Model for the collection build records are posted to.
+
+    Parameters:
+        database name -- database holding the collection
+        collection name -- collection the records are posted to
+        client -- MongoClient to use. The process-wide client when omitted.
+        batch size -- maximum number of test records per bulk write
+        write concern -- WriteConcern keyword arguments for test writes,
+            such as {"w": "majority"}. The client's default when omitted.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        database_name,
+        collection_name,
+        client=None,
+        batch_size=DEFAULT_BATCH_SIZE,
+        write_concern=None,
+    ):
+        self.client = client if client is not None else mongo_client.get_client()
+        self.db = self.client[database_name]
+        self.collection = self.db[collection_name]
+        self.batch_size = batch_size
+        self.write_concern = write_concern
+
+    def post_build(self, build_data):
+        self.collection.insert_one(build_data)
+
+    def missing_indexes(self):
+        """
+        Return the names of the INDEXES the collection does not have yet.
+        Indexes are compared by their keys, so equivalent indexes created
+        under another name count as present.
+        """
+        indexes = self.collection.index_information().values()
+        existing = [list(index["key"]) for index in indexes]
+        return [name for name, keys, _ in INDEXES if keys not in existing]
+
+    def ensure_indexes(self):
+        """
+        Build any missing INDEXES. Runs once per collection per process;
+        later calls return straight away. Returns the names built.
+        """
+        key = (id(self.client), self.db.name, self.collection.name)
+        with _ENSURED_LOCK:
+            if key in _ENSURED:
+                return []
+        # pylint: disable=import-outside-toplevel
+        from pymongo import IndexModel
+
+        missing = self.missing_indexes()
+        if missing:
+            self.collection.create_indexes(
+                [
+                    IndexModel(keys, name=name, **options)
+                    for name, keys, options in INDEXES
+                    if name in missing
+                ]
+            )
+        with _ENSURED_LOCK:
+            _ENSURED.add(key)
+        return missing
+
+    def post_tests(self, tests):
+        """
+        Upsert a record per test, keyed on branch, build, stage and name, in
+        unordered bulk writes. Returns the number of records written.
+        """
+        # pylint: disable=import-outside-toplevel
+        from pymongo import UpdateOne
+        from pymongo.write_concern import WriteConcern
+
+        self.ensure_indexes()
+        collection = self.collection
+        if self.write_concern:
+            collection = collection.with_options(
+                write_concern=WriteConcern(**self.write_concern)
+            )
+        written = 0
+        tests = iter(tests)
+        batch = list(itertools.islice(tests, self.batch_size))
+        while batch:
+            requests = []
+            for test in batch:
+                record = _test_record(test)
+                key = {field: record[field] for field in TEST_KEY}
+                requests.append(UpdateOne(key, {"$set": record}, upsert=True))
+            collection.bulk_write(requests, ordered=False)
+            written += len(requests)
+            batch = list(itertools.islice(tests, self.batch_size))
+        return written
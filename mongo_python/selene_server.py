@@ -1,9 +1,73 @@
-from requests import RequestException
+import json
+
+from requests import HTTPError, RequestException
 
 from .build import BuildNotFoundError
 from .branch import BranchNotFoundError
+from .id_cache import DEFAULT_TTL, IdCache
 from .server import Server, ServerBuilder
 
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_BATCH_BYTES = 1024 * 1024
+DEFAULT_PAGE_SIZE = 100
+# Status codes returned by receivers that predate the bulk endpoints.
+_MISSING_ENDPOINT_STATUSES = (404, 405, 501)
+_BUILD_KEYS = ("build_id", "name", "branch_name")
+_BRANCH_KEYS = ("branch_id", "name")
+
+
+def _encode_payload(payload):
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+def _chunk_payloads(items, max_count, max_bytes):
+    """
+    Group (item, encoded payload) pairs into chunks whose JSON array stays
+    within max_count entries and max_bytes bytes. A single payload larger
+    than max_bytes is sent on its own.
+    """
+    chunk = []
+    size = 2
+    for item, payload in items:
+        if chunk and (len(chunk) >= max_count or size + len(payload) + 1 > max_bytes):
+            yield chunk
+            chunk = []
+            size = 2
+        chunk.append((item, payload))
+        size += len(payload) + 1
+    if chunk:
+        yield chunk
+
+
+def _join_payloads(chunk):
+    return b"[" + b",".join(payload for _, payload in chunk) + b"]"
+
+
+def _branch_key(branch_name):
+    return ("branch", branch_name)
+
+
+def _build_key(branch_name, build_name):
+    return ("build", branch_name, build_name)
+
+
+def _check_records(records, keys):
+    """
+    Yield records, raising SeleneRequestError at the first one that is not
+    an object with keys, such as an error envelope sent in place of a list.
+    """
+    if isinstance(records, (dict, str)) or not hasattr(records, "__iter__"):
+        raise SeleneRequestError("Unexpected response {0!r}".format(records))
+    for record in records:
+        if not isinstance(record, dict) or any(key not in record for key in keys):
+            raise SeleneRequestError("Unexpected response item {0!r}".format(record))
+        yield record
+
+
+def _is_missing_endpoint(exception):
+    response = exception.response
+    return response is not None and response.status_code in _MISSING_ENDPOINT_STATUSES
+
 
 class SeleneServer(Server):
     """
@@ -11,8 +75,43 @@ class SeleneServer(Server):
 
     Parameters:
         url -- the url the server is running
+        session -- pooled keep-alive session shared by every request
+        batch size -- maximum number of tests sent per bulk request
+        batch bytes -- maximum size in bytes of a bulk request body
+        id cache -- memo of resolved branch and build ids
+        lookup cache -- optional on-disk cache shared with other invocations
     """
 
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        url,
+        session=None,
+        batch_size=DEFAULT_BATCH_SIZE,
+        batch_bytes=DEFAULT_BATCH_BYTES,
+        id_cache=None,
+        lookup_cache=None,
+    ):
+        super().__init__(url, session)
+        self._batch_size = batch_size
+        self._batch_bytes = batch_bytes
+        self._bulk_unsupported = set()
+        self._ids = id_cache if id_cache is not None else IdCache()
+        self._lookup_cache = lookup_cache
+
+    @property
+    def id_cache(self):
+        return self._ids
+
+    @property
+    def lookup_cache(self):
+        return self._lookup_cache
+
+    def close(self):
+        super().close()
+        if self._lookup_cache is not None:
+            self._lookup_cache.close()
+
     def get_builds(self):
         api_call = "{0}/api/build".format(self.url)
 
@@ -24,16 +123,55 @@ class SeleneServer(Server):
         return builds
 
     def get_build_id(self, build):
-        builds = self.get_builds()
+        key = _build_key(build.branch.name, build.name)
+        return self._ids.load(key, lambda: self._load_build_id(build))
 
-        try:
-            return next(
-                b["build_id"]
-                for b in builds
-                if b["name"] == build.name and b["branch_name"] == build.branch.name
-            )
-        except StopIteration as exception:
-            raise BuildNotFoundError(build) from exception
+    def _load_build_id(self, build):
+        if self._lookup_cache is None:
+            return self._find_build_id(build)
+        build_id = self._lookup_cache.get_build_id(build.branch.name, build.name)
+        if build_id is None:
+            build_id = self._find_build_id(build)
+            self._lookup_cache.put_build_id(build.branch.name, build.name, build_id)
+        return build_id
+
+    def _find_build_id(self, build):
+        """
+        Ask the server for the build with name and branch filters, one page
+        at a time. A server that ignores the filters answers with its whole
+        build list, which is decoded incrementally and dropped at the first
+        match instead of being loaded in full.
+        """
+        api_call = "{0}/api/build".format(self.url)
+        params = {
+            "name": build.name,
+            "branch_name": build.branch.name,
+            "limit": DEFAULT_PAGE_SIZE,
+            "offset": 0,
+        }
+        previous_first = None
+        while True:
+            count = 0
+            first = None
+            try:
+                builds = self.iter_get_request(api_call, params)
+                for b in _check_records(builds, _BUILD_KEYS):
+                    count += 1
+                    first = b if first is None else first
+                    if (
+                        b["name"] == build.name
+                        and b["branch_name"] == build.branch.name
+                    ):
+                        return b["build_id"]
+            except (RequestException, ValueError) as exception:
+                raise SeleneRequestError(exception) from exception
+
+            # Stop on a short page, an unpaged full list, or a server that
+            # ignores the offset and keeps sending the same page.
+            if count != DEFAULT_PAGE_SIZE or first == previous_first:
+                raise BuildNotFoundError(build)
+            previous_first = first
+            params["offset"] += count
 
     def create_build(self, build):
         try:
@@ -47,6 +185,10 @@ class SeleneServer(Server):
             self._make_post_request(api_call, build.to_json())
         except RequestException as exception:
             raise SeleneRequestError(exception) from exception
+        finally:
+            self._ids.invalidate(_build_key(build.branch.name, build.name))
+            if self._lookup_cache is not None:
+                self._lookup_cache.invalidate_build(build.branch.name, build.name)
 
     def update_build(self, build):
         api_call = "{0}/api/build/{1}".format(self.url, build.build_id)
@@ -63,7 +205,22 @@ class SeleneServer(Server):
         return branches
 
     def get_branch_id(self, branch):
-        branches = self.get_branches()
+        key = _branch_key(branch.name)
+        return self._ids.load(key, lambda: self._load_branch_id(branch), "branches")
+
+    def _load_branch_id(self, branch):
+        if self._lookup_cache is None:
+            return self._find_branch_id(branch)
+        branch_id = self._lookup_cache.get_branch_id(branch.name)
+        if branch_id is None:
+            branch_id = self._find_branch_id(branch)
+            self._lookup_cache.put_branch_id(branch.name, branch_id)
+        return branch_id
+
+    def _find_branch_id(self, branch):
+        branches = list(_check_records(self.get_branches(), _BRANCH_KEYS))
+        for b in branches:
+            self._ids.put(_branch_key(b["name"]), b["branch_id"])
 
         try:
             return next(b["branch_id"] for b in branches if b["name"] == branch.name)
@@ -76,30 +233,113 @@ class SeleneServer(Server):
             self._make_post_request(call_api, branch.to_json())
         except RequestException as exception:
             raise SeleneRequestError(exception) from exception
+        finally:
+            self._ids.invalidate(_branch_key(branch.name))
+            if self._lookup_cache is not None:
+                self._lookup_cache.invalidate_branch(branch.name)
 
     def create_test_case(self, test):
+        if self._lookup_cache is not None and self._lookup_cache.has_test_case(
+            test.name
+        ):
+            return
         call_api = "{0}/api/testcase".format(self.url)
         try:
-            self._make_post_request(call_api, test.to_json())
+            self.send_data_to_api("post", call_api, test.payload())
         except RequestException as exception:
             raise SeleneRequestError(exception) from exception
+        if self._lookup_cache is not None:
+            self._lookup_cache.add_test_cases([test.name])
 
     def create_test_result(self, test):
         call_api = "{0}/api/test-result".format(self.url)
         try:
-            self._make_post_request(call_api, test.to_json())
+            self.send_data_to_api("post", call_api, test.payload())
         except RequestException as exception:
             raise SeleneRequestError(exception) from exception
 
+    def create_test_cases(self, tests, posted=None):
+        if self._lookup_cache is None:
+            self._create_in_bulk("testcase", tests, self.create_test_case, posted)
+            return
+        tests = list(tests)
+        known = self._lookup_cache.known_test_cases(test.name for test in tests)
+        if posted is not None and known:
+            posted([test for test in tests if test.name in known])
+        tests = [test for test in tests if test.name not in known]
+        self._create_in_bulk("testcase", tests, self.create_test_case, posted)
+        self._lookup_cache.add_test_cases(test.name for test in tests)
+
+    def create_test_results(self, tests, posted=None):
+        self._create_in_bulk("test-result", tests, self.create_test_result, posted)
+
+    def _create_in_bulk(self, endpoint, tests, create_one, posted=None):
+        """
+        Send tests as JSON arrays to the bulk variant of endpoint. Falls back
+        to create_one per test once the receiver reports the bulk endpoint
+        as missing. posted, when given, is called with the tests of every
+        request the receiver accepted, so a caller knows how far a batch
+        got when a later request fails.
+        """
+        call_api = "{0}/api/{1}/bulk".format(self.url, endpoint)
+        items = ((test, test.payload()) for test in tests)
+        for chunk in _chunk_payloads(items, self._batch_size, self._batch_bytes):
+            if endpoint not in self._bulk_unsupported:
+                try:
+                    self.send_data_to_api("post", call_api, _join_payloads(chunk))
+                    if posted is not None:
+                        posted([test for test, _ in chunk])
+                    continue
+                except HTTPError as exception:
+                    if not _is_missing_endpoint(exception):
+                        raise SeleneRequestError(exception) from exception
+                    self._bulk_unsupported.add(endpoint)
+                except RequestException as exception:
+                    raise SeleneRequestError(exception) from exception
+            for test, _ in chunk:
+                create_one(test)
+                if posted is not None:
+                    posted([test])
+
 
 class SeleneServerBuilder(ServerBuilder):
     """
     Helper class for creating selene server objects.
     """
 
+    def __init__(self):
+        super().__init__()
+        self._batch_size = DEFAULT_BATCH_SIZE
+        self._batch_bytes = DEFAULT_BATCH_BYTES
+        self._cache_ttl = DEFAULT_TTL
+        self._lookup_cache = None
+
+    def with_batch_size(self, batch_size):
+        self._batch_size = batch_size
+        return self
+
+    def with_batch_bytes(self, batch_bytes):
+        self._batch_bytes = batch_bytes
+        return self
+
+    def with_cache_ttl(self, ttl):
+        self._cache_ttl = ttl
+        return self
+
+    def with_lookup_cache(self, lookup_cache):
+        self._lookup_cache = lookup_cache
+        return self
+
     def construct(self):
         assert self._url is not None
-        return SeleneServer(self._url)
+        return SeleneServer(
+            self._url,
+            self._get_session(),
+            self._batch_size,
+            self._batch_bytes,
+            IdCache(self._cache_ttl),
+            self._lookup_cache,
+        )
 
 
 class SeleneRequestError(Exception):
@@ -113,3 +353,20 @@ class SeleneRequestError(Exception):
     def __init__(self, error):
         msg = "Error: {0}".format(error)
         super().__init__(msg)
+
+
+class SelenePostError(Exception):
+    """
+    Raised once a parallel upload finishes if any test failed to post.
+
+    Parameters:
+        errors -- list of (test name, SeleneRequestError) pairs
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+        shown = "; ".join("{0}: {1}".format(name, error) for name, error in errors[:5])
+        if len(errors) > 5:
+            shown += "; ..."
+        msg = "Error: {0} test(s) failed to post: {1}".format(len(errors), shown)
+        super().__init__(msg)
@@ -1,4 +1,134 @@
+import codecs
+import json
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_POOL_CONNECTIONS = 4
+DEFAULT_POOL_SIZE = 10
+DEFAULT_MAX_RETRIES = 3
+STREAM_CHUNK_SIZE = 64 * 1024
+_WHITESPACE = " \t\n\r"
+_NUMBER = "0123456789.eE+-"
+
+
+def create_session(
+    pool_connections=DEFAULT_POOL_CONNECTIONS,
+    pool_size=DEFAULT_POOL_SIZE,
+    max_retries=DEFAULT_MAX_RETRIES,
+):
+    """
+    Create a keep-alive session backed by a shared connection pool.
+
+    Parameters:
+        pool_connections -- number of hosts to keep a connection pool for
+        pool_size -- maximum number of connections kept open per host
+        max_retries -- retries for failed connections and 502/503/504 replies
+    """
+    retries = Retry(
+        total=max_retries,
+        connect=max_retries,
+        backoff_factor=0.5,
+        status_forcelist=(502, 503, 504),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections, pool_maxsize=pool_size, max_retries=retries
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def connection_stats(session):
+    """
+    Summarize connection reuse for every pool owned by the session.
+
+    Returns a dict with the number of requests sent, the number of
+    connections opened and how many requests reused an open connection.
+    """
+    stats = {"requests": 0, "connections": 0}
+    adapters = {id(adapter): adapter for adapter in session.adapters.values()}
+    for adapter in adapters.values():
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            stats["requests"] += pool.num_requests
+            stats["connections"] += pool.num_connections
+    stats["reused"] = max(stats["requests"] - stats["connections"], 0)
+    return stats
+
+
+def iter_json_array(chunks):
+    """
+    Incrementally decode a JSON array from an iterable of byte chunks and
+    yield its items as soon as each one is complete. A document that is
+    not an array is decoded whole and yielded as a single item.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    buffer = ""
+    position = 0
+    exhausted = False
+
+    def read_more():
+        nonlocal buffer, exhausted
+        chunk = next(chunks, None)
+        if chunk is None:
+            exhausted = True
+            buffer += utf8.decode(b"", final=True)
+        else:
+            buffer += utf8.decode(chunk)
+
+    def skip(characters):
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in characters:
+                position += 1
+            if position < len(buffer) or exhausted:
+                return
+            read_more()
+
+    skip(_WHITESPACE)
+    if buffer[position : position + 1] != "[":
+        while not exhausted:
+            read_more()
+        yield json.loads(buffer)
+        return
+
+    position += 1
+    while True:
+        skip(_WHITESPACE + ",")
+        if position >= len(buffer):
+            raise ValueError("Unterminated JSON array")
+        if buffer[position] == "]":
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except ValueError:
+            if exhausted:
+                raise
+            read_more()
+            continue
+        # A number running up to the end of the buffer may still be cut
+        # short; strings, objects and arrays delimit themselves.
+        if (
+            not exhausted
+            and not isinstance(item, (dict, list, str))
+            and all(character in _NUMBER for character in buffer[end:])
+        ):
+            read_more()
+            continue
+        yield item
+        position = end
+        if position > STREAM_CHUNK_SIZE:
+            buffer = buffer[position:]
+            position = 0
 
 
 class Server:
@@ -7,29 +137,64 @@ class Server:
 
     Parameters:
         url -- the url the server is running
+        session -- pooled keep-alive session shared by every request. A new
+            one is created when omitted.
     """
 
-    def __init__(self, url):
+    def __init__(self, url, session=None):
         self._url = url
+        self._session = session if session is not None else create_session()
 
     @property
     def url(self):
         return self._url
 
+    @property
+    def session(self):
+        return self._session
+
+    def connection_stats(self):
+        return connection_stats(self._session)
+
+    def close(self):
+        self._session.close()
+
     def make_get_request(self, api):
-        response = requests.get(api)
+        response = self._session.get(api)
         response.raise_for_status()
         return response.json()
 
+    def iter_get_request(self, api, params=None):
+        """
+        Stream a JSON array response, yielding items while the body is
+        still arriving. Closing the generator early drops the rest.
+        """
+        response = self._session.get(api, params=params, stream=True)
+        try:
+            response.raise_for_status()
+            yield from iter_json_array(response.iter_content(STREAM_CHUNK_SIZE))
+        finally:
+            response.close()
+
     def _make_post_request(self, api, data):
         self.send_to_api("post", api, data)
 
     def _make_patch_request(self, api, data):
         self.send_to_api("patch", api, data)
 
+    def send_data_to_api(self, method, api, body):
+        headers = {"content-type": "application/json"}
+        response = self._session.request(
+            method=method, url=api, data=body, headers=headers
+        )
+        response.raise_for_status()
+        return response
+
     def send_to_api(self, method, api, data):
         headers = {"content-type": "application/json"}
-        response = requests.request(method=method, url=api, json=data, headers=headers)
+        response = self._session.request(
+            method=method, url=api, json=data, headers=headers
+        )
         response.raise_for_status()
         return response
 
@@ -41,11 +206,38 @@ class ServerBuilder:
 
     def __init__(self):
         self._url = None
+        self._session = None
+        self._pool_connections = DEFAULT_POOL_CONNECTIONS
+        self._pool_size = DEFAULT_POOL_SIZE
+        self._max_retries = DEFAULT_MAX_RETRIES
 
     def with_url(self, url):
         self._url = url
         return self
 
+    def with_session(self, session):
+        self._session = session
+        return self
+
+    def with_pool_connections(self, pool_connections):
+        self._pool_connections = pool_connections
+        return self
+
+    def with_pool_size(self, pool_size):
+        self._pool_size = pool_size
+        return self
+
+    def with_max_retries(self, max_retries):
+        self._max_retries = max_retries
+        return self
+
+    def _get_session(self):
+        if self._session is not None:
+            return self._session
+        return create_session(
+            self._pool_connections, self._pool_size, self._max_retries
+        )
+
     def construct(self):
         assert self._url is not None
-        return Server(self._url)
+        return Server(self._url, self._get_session())
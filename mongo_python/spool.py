@@ -0,0 +1,358 @@
+import functools
+import glob
+import gzip
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from requests import RequestException
+
+from .build import BuildBuilder
+from .log_file import DEFAULT_COMPRESS_LEVEL, LogFileBuilder, LogUploadError
+from .record import TestRecord
+from .selene_server import DEFAULT_BATCH_SIZE, SeleneRequestError
+
+SEGMENT_SUFFIX = ".ndjson.gz"
+ON_ERROR = "on-error"
+ALWAYS = "always"
+MODES = (ON_ERROR, ALWAYS)
+DEFAULT_REPLAY_JOBS = 8
+# Errors meaning the receiver is down or refusing requests.
+RECEIVER_ERRORS = (SeleneRequestError, RequestException, LogUploadError)
+
+
+def segments(directory):
+    """
+    Finished spool segments in directory, oldest first.
+    """
+    return sorted(glob.glob(os.path.join(glob.escape(directory), "*" + SEGMENT_SUFFIX)))
+
+
+class ResultSpool:
+    """
+    Gzip compressed NDJSON segment holding what mongo-post would have sent
+    to the receiver: builds, references to log files, and the JSON payload
+    of each test. The segment is written under a temporary name and only
+    renamed into place on close, so replay never reads a partial one.
+
+    Parameters:
+        directory -- folder the segments are kept in. Created when missing.
+        compresslevel -- gzip level of the segment
+    """
+
+    def __init__(self, directory, compresslevel=DEFAULT_COMPRESS_LEVEL):
+        os.makedirs(directory, exist_ok=True)
+        name = "{0}-{1}-{2}".format(
+            time.strftime("%Y%m%dT%H%M%S", time.gmtime()),
+            os.getpid(),
+            uuid.uuid4().hex[:8],
+        )
+        self._path = os.path.join(directory, name + SEGMENT_SUFFIX)
+        self._temp_path = self._path + ".tmp"
+        self._lock = threading.Lock()
+        self._file = gzip.open(self._temp_path, "wb", compresslevel)
+        self._entries = 0
+        self._logs = set()
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def entries(self):
+        return self._entries
+
+    def write_build(self, build):
+        entry = {
+            "type": "build",
+            "name": build.name,
+            "branch": build.branch.name,
+            "status": build.status,
+        }
+        self._write([json.dumps(entry).encode("utf-8")])
+
+    def write_log(self, log_path, output_file=None):
+        """
+        Reference a log to upload on replay. Returns the reference, which
+        stands in for the stored name in the payload of the log's tests.
+        """
+        reference = os.path.abspath(log_path)
+        with self._lock:
+            if reference in self._logs:
+                return reference
+            self._logs.add(reference)
+        entry = {"type": "log", "path": reference, "output": output_file}
+        self._write([json.dumps(entry).encode("utf-8")])
+        return reference
+
+    def is_log_reference(self, log_file):
+        with self._lock:
+            return log_file in self._logs
+
+    def write_tests(self, tests):
+        # The payload is already JSON, so it is embedded as it is.
+        self._write(
+            [b'{"type":"test","test":' + test.payload() + b"}" for test in tests]
+        )
+
+    def close(self):
+        """
+        Finish the segment. An empty segment is removed instead.
+        """
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.close()
+            if self._entries:
+                os.replace(self._temp_path, self._path)
+            else:
+                os.remove(self._temp_path)
+
+    def _write(self, lines):
+        if not lines:
+            return
+        with self._lock:
+            self._file.write(b"\n".join(lines) + b"\n")
+            self._entries += len(lines)
+
+
+class SpoolingServer:
+    """
+    Stands in for a SeleneServer, writing to a ResultSpool what the server
+    would have posted. With always, the receiver is never contacted.
+    Otherwise requests go to the server until it first fails; that
+    request and everything after it are spooled, so a receiver outage
+    costs one failed request rather than one per test. Of a bulk post that
+    fails partway, only the tests the receiver did not accept are spooled.
+    A failed case post spools nothing itself: spooling is on by the time
+    the results of those tests are posted, so they are spooled and replay
+    creates their cases.
+
+    Parameters:
+        server -- selene server posts go to while the receiver is up
+        spool -- ResultSpool taking the posts otherwise
+        always -- spool everything without contacting the receiver
+    """
+
+    def __init__(self, server, spool, always=False):
+        self._server = server
+        self._spool = spool
+        self._lock = threading.Lock()
+        self._spooling = always
+
+    @property
+    def session(self):
+        return self._server.session
+
+    @property
+    def spool(self):
+        return self._spool
+
+    @property
+    def spooling(self):
+        with self._lock:
+            return self._spooling
+
+    def connection_stats(self):
+        return self._server.connection_stats()
+
+    def close(self):
+        try:
+            self._server.close()
+        finally:
+            self._spool.close()
+
+    def create_build(self, build):
+        if self._post(self._server.create_build, build):
+            return
+        self._spool.write_build(build)
+
+    def post_log(self, log_path, upload, output_file=None):
+        """
+        Upload a log through upload, returning its stored name, or return a
+        spool reference to it once spooling.
+        """
+        if not self.spooling:
+            try:
+                return upload()
+            except RECEIVER_ERRORS as error:
+                self._start_spooling(error)
+        return self._spool.write_log(log_path, output_file)
+
+    def create_test_cases(self, tests, posted=None):
+        """
+        Create the cases of tests unless spooling. posted is only called
+        with the tests whose case the receiver accepted.
+        """
+        # A spooled test is one entry; its case is created on replay.
+        self._post_bulk(self._server.create_test_cases, tests, posted)
+
+    def create_test_results(self, tests, posted=None):
+        """
+        Post the results of tests, spooling those the receiver did not
+        accept. posted is called with the tests that were posted or
+        spooled, as both are handed off.
+        """
+        rest = self._post_bulk(self._server.create_test_results, tests, posted)
+        if rest:
+            self._spool.write_tests(rest)
+            if posted is not None:
+                posted(rest)
+
+    def create_test_case(self, test):
+        self._post(self._server.create_test_case, test)
+
+    def create_test_result(self, test):
+        if not self._post(self._server.create_test_result, test):
+            self._spool.write_tests([test])
+
+    def _post_bulk(self, post, tests, posted):
+        """
+        Bulk post tests unless spooling. Returns the tests that were not
+        posted.
+        """
+        tests = list(tests)
+        accepted = set()
+
+        def accept(chunk):
+            accepted.update(id(test) for test in chunk)
+            if posted is not None:
+                posted(chunk)
+
+        if self._post(functools.partial(post, posted=accept), tests):
+            return []
+        return [test for test in tests if id(test) not in accepted]
+
+    def _post(self, post, item):
+        """
+        Post item unless spooling. Returns whether it was posted.
+        """
+        if self.spooling:
+            return False
+        try:
+            post(item)
+        except RECEIVER_ERRORS as error:
+            self._start_spooling(error)
+            return False
+        return True
+
+    def _start_spooling(self, error):
+        with self._lock:
+            if self._spooling:
+                return
+            self._spooling = True
+        print(
+            "Receiver unavailable ({0}), spooling to {1}".format(
+                error, self._spool.path
+            )
+        )
+
+
+class SpoolReplay:
+    """
+    Drains spool segments into the receiver. Each segment's builds are
+    posted first, then its logs are uploaded and their stored names put
+    in place of the spool references, then its tests are posted in bulk
+    batches on a thread pool. A segment is deleted once all of it is
+    posted, so a failed replay can be run again. Running it again posts
+    the failed segment in full, so the receiver must treat a repeated
+    build, case or result as the same one. Tests whose log is gone are
+    posted without it and counted in without_log.
+
+    Parameters:
+        server -- selene server the spool is replayed into
+        jobs -- number of batches and log uploads in flight at once
+        batch size -- number of tests per bulk request
+    """
+
+    def __init__(self, server, jobs=DEFAULT_REPLAY_JOBS, batch_size=DEFAULT_BATCH_SIZE):
+        self._server = server
+        self._jobs = max(jobs or 1, 1)
+        self._batch_size = batch_size
+        self._without_log = 0
+
+    @property
+    def without_log(self):
+        return self._without_log
+
+    def replay(self, directory):
+        """
+        Replay every finished segment in directory. Returns the number of
+        tests posted.
+        """
+        posted = 0
+        with ThreadPoolExecutor(max_workers=self._jobs) as executor:
+            for path in segments(directory):
+                posted += self.replay_segment(path, executor)
+                os.remove(path)
+        return posted
+
+    def replay_segment(self, path, executor):
+        builds, logs, tests = _read_segment(path)
+        for build in builds:
+            self._server.create_build(
+                BuildBuilder()
+                .with_name(build["name"])
+                .with_branch_name(build["branch"])
+                .with_status(build["status"])
+                .construct()
+            )
+        stored = dict(
+            zip(
+                [log["path"] for log in logs],
+                executor.map(self._upload_log, logs),
+            )
+        )
+        records = []
+        for test in tests:
+            if test.get("log") in stored:
+                test["log"] = stored[test["log"]]
+                if test["log"] is None:
+                    self._without_log += 1
+            records.append(TestRecord.from_json(test))
+        batches = [
+            records[start : start + self._batch_size]
+            for start in range(0, len(records), self._batch_size)
+        ]
+        # list() re-raises the first failed batch.
+        list(executor.map(self._post_batch, batches))
+        return len(records)
+
+    def _upload_log(self, log):
+        if not os.path.isfile(log["path"]):
+            print(
+                "Spooled log {0} is gone, posting its tests without it".format(
+                    log["path"]
+                )
+            )
+            return None
+        log_file = (
+            LogFileBuilder()
+            .with_output_file(log["output"])
+            .with_receiver(self._server.url)
+            .with_session(self._server.session)
+            .construct()
+        )
+        log_file.gzip_log(log["path"])
+        log_file.post_log_file(log["path"])
+        return log_file.log_file
+
+    def _post_batch(self, batch):
+        self._server.create_test_cases(batch)
+        self._server.create_test_results(batch)
+
+
+def _read_segment(path):
+    builds, logs, tests = [], [], []
+    entries = {"build": builds, "log": logs}
+    with gzip.open(path, "rb") as fp:
+        for line in fp:
+            entry = json.loads(line)
+            if entry["type"] == "test":
+                tests.append(entry["test"])
+            else:
+                entries[entry["type"]].append(entry)
+    return builds, logs, tests
@@ -1,5 +1,71 @@
+import json
 from datetime import datetime
 
+from .record import TestRecord
+
+TIMESTAMP_FORMAT = "%Y%m%d %H:%M:%S.%f"
+
+
+def _time_of_day_ms(value):
+    """
+    Milliseconds since midnight of a Robot timestamp in the fixed-width
+    "20180826 04:43:00.939" layout, read by slicing instead of strptime.
+    None when value has any other layout.
+    """
+    if (
+        len(value) != 21
+        or value[8] != " "
+        or value[11] != ":"
+        or value[14] != ":"
+        or value[17] != "."
+    ):
+        return None
+    hours, minutes, seconds = value[9:11], value[12:14], value[15:17]
+    if not (hours + minutes + seconds + value[18:21]).isdecimal():
+        return None
+    hours, minutes, seconds = int(hours), int(minutes), int(seconds)
+    if hours > 23 or minutes > 59 or seconds > 61:
+        return None
+    return ((hours * 60 + minutes) * 60 + seconds) * 1000 + int(value[18:21])
+
+
+def _get_duration(status):
+    """
+    Seconds between the start and end of a <status>. Robot 7 writes the
+    duration itself as elapsed. Older files give start and end times; on
+    the same day those are subtracted as milliseconds since midnight, and
+    anything else goes through strptime.
+    """
+    elapsed = status.get("elapsed")
+    if elapsed is not None:
+        try:
+            return float(elapsed)
+        except ValueError:
+            pass
+    starttime = status.get("starttime")
+    endtime = status.get("endtime")
+    if starttime[:8] == endtime[:8] and starttime[:8].isdecimal():
+        executed_at = _time_of_day_ms(starttime)
+        completed_at = _time_of_day_ms(endtime)
+        if executed_at is not None and completed_at is not None:
+            # Integer milliseconds divide to the same float as
+            # timedelta.total_seconds().
+            return (completed_at - executed_at) / 1000
+    executed_at = datetime.strptime(starttime, TIMESTAMP_FORMAT)
+    completed_at = datetime.strptime(endtime, TIMESTAMP_FORMAT)
+    return (completed_at - executed_at).total_seconds()
+
+
+def _parse_status(status):
+    """
+    Return (result, critical, duration) from a test's <status>, read once.
+    """
+    result = status.get("status").lower()
+    critical = result != "skip" and status.get("critical", "yes").lower() != "no"
+    if result == "skip":
+        result = "fail"
+    return result, critical, _get_duration(status)
+
 
 class Test:
     """
@@ -81,15 +147,28 @@ class Test:
         items["test_duration"] = self.test_duration
         return {k: v for k, v in items.items() if v is not None}
 
+    def payload(self):
+        """
+        The test as the compact JSON body posted to the receiver.
+        """
+        return json.dumps(self.to_json(), separators=(",", ":")).encode("utf-8")
+
     def parse_test(self, test, prefix):
         self._name = self._get_test_name(test, prefix)
-        self._result = test.find("status").get("status").lower()
-        if self._result == "skip":
-            self._result = "fail"
-        self._critical = self._get_critical_value(test)
-        self._test_duration = self._get_test_duration(test)
+        self._result, self._critical, self._test_duration = _parse_status(
+            test.find("status")
+        )
         return self.to_json()
 
+    def parse_record(self, test, prefix):
+        """
+        Parse test into a TestRecord without touching this test's fields.
+        """
+        result, critical, test_duration = _parse_status(test.find("status"))
+        return TestRecord(
+            self._get_test_name(test, prefix), result, critical, test_duration
+        )
+
     def _get_test_name(self, test, prefix):
         name = test.get("name")
         return "{0}.{1}".format(prefix, name)
@@ -104,13 +183,7 @@ class Test:
         return True
 
     def _get_test_duration(self, test):
-        executed_at = datetime.strptime(
-            test.find("status").get("starttime"), "%Y%m%d %H:%M:%S.%f"
-        )
-        completed_at = datetime.strptime(
-            test.find("status").get("endtime"), "%Y%m%d %H:%M:%S.%f"
-        )
-        return (completed_at - executed_at).total_seconds()
+        return _get_duration(test.find("status"))
 
     def get_name(self):
         return self._name
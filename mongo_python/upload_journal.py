@@ -0,0 +1,280 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+JOURNAL_NAME = ".selene-journal.ndjson"
+DEFAULT_SYNC_EVERY = 500
+DEFAULT_SYNC_INTERVAL = 1.0
+# Compact on open once the file holds this many lines per live entry.
+COMPACT_RATIO = 2
+COMPACT_MIN_LINES = 1000
+_VERSION = 1
+_MISSING = object()
+
+BUILD = "build"
+LOG = "log"
+CASE = "case"
+RESULT = "result"
+KINDS = (BUILD, LOG, CASE, RESULT)
+
+
+def open_journal(directory, scope, resume=False):
+    """
+    Open the journal kept in the results directory. Returns None when the
+    directory cannot hold one, in which case the run is not resumable.
+    """
+    try:
+        return UploadJournal(os.path.join(directory, JOURNAL_NAME), scope, resume)
+    except OSError:
+        return None
+
+
+class UploadJournal:
+    """
+    Write-ahead record of what the receiver acknowledged during a
+    mongo-post run: the build, each log's stored name, and the test cases
+    and results by test key (see OutputJournal). Entries are appended as
+    NDJSON lines and flushed to disk every sync_every entries or
+    sync_interval seconds, whichever comes first, so a crash loses at most
+    that much progress. A posted result implies its case, so compaction
+    keeps only one line per test.
+
+    Parameters:
+        path -- location of the journal file
+        scope -- JSON list identifying the run, such as receiver, branch,
+            build and stage. Entries recorded under another scope are
+            discarded.
+        resume -- keep the entries of a previous run and skip the work
+            they acknowledge. A fresh journal is started otherwise.
+        sync every -- number of entries between fsyncs
+        sync interval -- maximum seconds between fsyncs
+        clock -- monotonic time source, replaceable in tests
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        path,
+        scope,
+        resume=False,
+        sync_every=DEFAULT_SYNC_EVERY,
+        sync_interval=DEFAULT_SYNC_INTERVAL,
+        clock=time.monotonic,
+    ):
+        self._path = path
+        self._scope = list(scope)
+        self._sync_every = max(sync_every, 1)
+        self._sync_interval = sync_interval
+        self._clock = clock
+        self._resume = resume
+        self._lock = threading.Lock()
+        self._entries = {kind: {} for kind in KINDS}
+        self._torn = False
+        lines = self._load() if resume else None
+        # A torn last line would swallow the next append, so it is
+        # compacted away along with any redundant lines.
+        if lines is None or self._torn:
+            self._rewrite()
+        elif lines >= COMPACT_MIN_LINES and lines > COMPACT_RATIO * self._live():
+            self._rewrite()
+        self._file = open(self._path, "a", encoding="utf-8")
+        self._unsynced = 0
+        self._synced_at = self._clock()
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def scope(self):
+        return self._scope
+
+    @property
+    def resume(self):
+        return self._resume
+
+    def acknowledged(self, kind, key):
+        with self._lock:
+            return self._is_acknowledged(kind, key)
+
+    def value(self, kind, key):
+        """
+        Value recorded with key, such as the stored name of a log.
+        """
+        with self._lock:
+            return self._entries[kind].get(key)
+
+    def pending(self, kind, rows):
+        """
+        Return the (key, item) rows whose kind of entry is not acknowledged
+        yet.
+        """
+        with self._lock:
+            return [row for row in rows if not self._is_acknowledged(kind, row[0])]
+
+    def record(self, kind, key, value=None):
+        self.record_many(kind, [key], value)
+
+    def record_many(self, kind, keys, value=None):
+        with self._lock:
+            lines = []
+            for key in keys:
+                if self._entries[kind].get(key, _MISSING) != value:
+                    self._entries[kind][key] = value
+                    lines.append(_encode_entry(kind, key, value))
+            if not lines:
+                return
+            self._file.write("".join(lines))
+            self._unsynced += len(lines)
+            if (
+                self._unsynced >= self._sync_every
+                or self._clock() - self._synced_at >= self._sync_interval
+            ):
+                self._sync()
+
+    def sync(self):
+        with self._lock:
+            self._sync()
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._sync()
+                self._file.close()
+
+    def _is_acknowledged(self, kind, key):
+        if key in self._entries[kind]:
+            return True
+        return kind == CASE and key in self._entries[RESULT]
+
+    def _live(self):
+        cases = self._entries[CASE].keys() - self._entries[RESULT].keys()
+        return len(cases) + sum(
+            len(self._entries[kind]) for kind in (BUILD, LOG, RESULT)
+        )
+
+    def _sync(self):
+        if self._unsynced:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+        self._synced_at = self._clock()
+
+    def _load(self):
+        """
+        Read the entries of a previous run. Returns the number of lines
+        read, or None when there is no journal for this scope. A line cut
+        short by a crash is skipped and marks the journal as torn.
+        """
+        try:
+            with open(self._path, encoding="utf-8") as fp:
+                header = _decode(fp.readline())
+                if not isinstance(header, dict) or header.get("scope") != self._scope:
+                    return None
+                lines = 1
+                for line in fp:
+                    lines += 1
+                    entry = _decode(line)
+                    if not _is_entry(entry) or not line.endswith("\n"):
+                        self._torn = True
+                        continue
+                    value = entry[2] if len(entry) > 2 else None
+                    self._entries[entry[0]][_decode_key(entry[1])] = value
+        except OSError:
+            return None
+        return lines
+
+    def _rewrite(self):
+        """
+        Atomically replace the journal with the live entries, dropping the
+        case of every test whose result is recorded.
+        """
+        directory = os.path.dirname(os.path.abspath(self._path))
+        handle, temp_path = tempfile.mkstemp(dir=directory, prefix=JOURNAL_NAME)
+        try:
+            with os.fdopen(handle, "w", encoding="utf-8") as fp:
+                fp.write(json.dumps({"scope": self._scope, "version": _VERSION}))
+                fp.write("\n")
+                for kind in KINDS:
+                    for key, value in self._entries[kind].items():
+                        if kind == CASE and key in self._entries[RESULT]:
+                            continue
+                        fp.write(_encode_entry(kind, key, value))
+                fp.flush()
+                os.fsync(fp.fileno())
+            os.replace(temp_path, self._path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+
+def _encode_entry(kind, key, value):
+    entry = [kind, key] if value is None else [kind, key, value]
+    return json.dumps(entry, separators=(",", ":")) + "\n"
+
+
+def _decode_key(key):
+    # Test keys are tuples, which JSON stores as lists.
+    return tuple(key) if isinstance(key, list) else key
+
+
+def _is_entry(entry):
+    return isinstance(entry, list) and len(entry) >= 2 and entry[0] in KINDS
+
+
+def _decode(line):
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+
+class OutputJournal:
+    """
+    View of an UploadJournal for the tests of one output file. A test is
+    keyed by the file, its name and how many tests of that name came
+    before it in the file, so a name repeated within a file or across
+    files keeps an entry per occurrence. Only a resumed run skips the
+    tests a journal acknowledges; otherwise every test is pending and the
+    journal is only written for the next run.
+
+    Parameters:
+        journal -- UploadJournal of the run
+        output file -- output file the tests come from, relative to the
+            results folder
+    """
+
+    def __init__(self, journal, output_file):
+        self._journal = journal
+        self._output_file = output_file
+        self._occurrences = {}
+
+    @property
+    def journal(self):
+        return self._journal
+
+    @property
+    def output_file(self):
+        return self._output_file
+
+    def keyed(self, tests):
+        """
+        Pair each test with its key. Tests must be keyed once each, in the
+        order of the file.
+        """
+        rows = []
+        for test in tests:
+            occurrence = self._occurrences.get(test.name, 0)
+            self._occurrences[test.name] = occurrence + 1
+            rows.append(((self._output_file, test.name, occurrence), test))
+        return rows
+
+    def pending(self, kind, rows):
+        if not self._journal.resume:
+            return rows
+        return self._journal.pending(kind, rows)
+
+    def record(self, kind, rows):
+        self._journal.record_many(kind, [key for key, _ in rows])
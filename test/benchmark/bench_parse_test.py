@@ -0,0 +1,83 @@
+"""
+Benchmark Test.parse_record against the strptime based parsing it
+replaced. Run from the repository root:
+
+    python test/benchmark/bench_parse_test.py [tests] [repeats]
+"""
+
+import sys
+import timeit
+import xml.etree.ElementTree as ET
+from datetime import datetime
+
+from mongo_python.test import TIMESTAMP_FORMAT, TestBuilder as _TestBuilder
+
+
+def create_tests(count, robot_7=False):
+    tests = []
+    for index in range(count):
+        test = ET.Element("test", name="test{0}".format(index))
+        if robot_7:
+            attributes = {"start": "2018-08-26T04:43:00.939000", "elapsed": "1.300"}
+        else:
+            attributes = {
+                "starttime": "20180826 04:43:00.939",
+                "endtime": "20180826 04:43:02.{0:03d}".format(index % 1000),
+                "critical": "yes",
+            }
+        test.append(ET.Element("status", status="PASS", **attributes))
+        tests.append(test)
+    return tests
+
+
+def parse_with_strptime(test, prefix):
+    # Test.parse_test as it was: four <status> lookups and two strptime calls.
+    name = "{0}.{1}".format(prefix, test.get("name"))
+    result = test.find("status").get("status").lower()
+    if result == "skip":
+        result = "fail"
+    status = test.find("status")
+    critical = not (
+        status.get("status").lower() == "skip"
+        or status.get("critical", "yes").lower() == "no"
+    )
+    executed_at = datetime.strptime(
+        test.find("status").get("starttime"), TIMESTAMP_FORMAT
+    )
+    completed_at = datetime.strptime(
+        test.find("status").get("endtime"), TIMESTAMP_FORMAT
+    )
+    return name, result, critical, (completed_at - executed_at).total_seconds()
+
+
+def best_of(function, tests, repeats):
+    return min(
+        timeit.repeat(
+            lambda: [function(test, "suite") for test in tests],
+            number=1,
+            repeat=repeats,
+        )
+    )
+
+
+def main(count=20000, repeats=5):
+    parser = _TestBuilder().construct()
+    tests = create_tests(count)
+    baseline = best_of(parse_with_strptime, tests, repeats)
+    fast = best_of(parser.parse_record, tests, repeats)
+    elapsed = best_of(parser.parse_record, create_tests(count, robot_7=True), repeats)
+    print("{0} tests, best of {1}".format(count, repeats))
+    for label, seconds in (
+        ("strptime (before)", baseline),
+        ("fixed-width timestamps", fast),
+        ("robot 7 elapsed", elapsed),
+    ):
+        print(
+            "{0:<24}{1:8.1f} ms {2:8.2f} us/test {3:6.1f}x".format(
+                label, seconds * 1000, seconds / count * 1e6, baseline / seconds
+            )
+        )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
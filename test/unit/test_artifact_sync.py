@@ -0,0 +1,165 @@
+import os
+import threading
+
+import pytest
+from hamcrest import assert_that, equal_to, is_
+from mock import patch
+
+from mongo_python.artifact_sync import MANIFEST_NAME, ArtifactSync, SyncManifest
+from mongo_python.log_memo import file_digest
+from mongo_python.result_scanner import ResultScanner
+
+
+class FakeGridIn:
+    def __init__(self, fs, filename, metadata):
+        self.fs = fs
+        self.filename = filename
+        self.metadata = metadata
+        self.data = b""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.fs.store(self.filename, self.metadata, self.data)
+
+    def write(self, data):
+        self.data += data
+
+
+class FakeGridOut:
+    def __init__(self, filename, metadata, data):
+        self.filename = filename
+        self.metadata = metadata
+        self.data = data
+
+
+class FakeFilesCollection:
+    def __init__(self, fs):
+        self.fs = fs
+
+    def find(self, _, projection):
+        assert_that(projection, is_(equal_to({"metadata": True})))
+        return [
+            {"_id": file_id, "metadata": grid_out.metadata}
+            for file_id, grid_out in self.fs.files.items()
+        ]
+
+
+class FakeGridFS:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.files = {}
+        self.uploads = 0
+
+    def new_file(self, filename, metadata):
+        return FakeGridIn(self, filename, metadata)
+
+    def store(self, filename, metadata, data):
+        with self.lock:
+            self.uploads += 1
+            file_id = len(self.files) + self.uploads
+            self.files[file_id] = FakeGridOut(filename, metadata, data)
+
+    def delete(self, file_id):
+        with self.lock:
+            del self.files[file_id]
+
+    def by_path(self):
+        return {
+            grid_out.metadata["relative_path"]: grid_out
+            for grid_out in self.files.values()
+        }
+
+
+@pytest.fixture(name="results")
+def fixture_results(tmp_path):
+    (tmp_path / "screenshots").mkdir()
+    (tmp_path / "output.xml").write_bytes(b"<robot/>")
+    (tmp_path / "screenshots" / "one.png").write_bytes(b"1" * 10)
+    return tmp_path
+
+
+def sync(fs, results):
+    manifest = SyncManifest(str(results / MANIFEST_NAME))
+    scan = ResultScanner(str(results), excludes=[MANIFEST_NAME + "*"]).scan()
+    artifact_sync = ArtifactSync(fs, FakeFilesCollection(fs), manifest, workers=2)
+    return artifact_sync.sync(scan.files)
+
+
+class TestArtifactSync:
+    def test_uploads_with_digest(self, results):
+        fs = FakeGridFS()
+
+        summary = sync(fs, results)
+
+        stored = fs.by_path()
+        assert_that(summary.files, is_(equal_to(2)))
+        assert_that(sorted(stored), is_(["output.xml", "screenshots/one.png"]))
+        assert_that(
+            stored["screenshots/one.png"].metadata["sha256"],
+            is_(equal_to(file_digest(str(results / "screenshots" / "one.png")))),
+        )
+
+    def test_rerun_skips_without_hashing(self, results):
+        fs = FakeGridFS()
+        sync(fs, results)
+
+        with patch("mongo_python.artifact_sync.file_digest") as mock_digest:
+            summary = sync(fs, results)
+
+        mock_digest.assert_not_called()
+        assert_that(summary.files, is_(equal_to(0)))
+        assert_that(summary.skipped, is_(equal_to(2)))
+        assert_that(fs.uploads, is_(equal_to(2)))
+
+    def test_skips_stored_content_without_manifest(self, results):
+        fs = FakeGridFS()
+        sync(fs, results)
+        os.remove(str(results / MANIFEST_NAME))
+
+        summary = sync(fs, results)
+
+        assert_that(summary.skipped, is_(equal_to(2)))
+
+    def test_changed_file_replaces_stored_copy(self, results):
+        fs = FakeGridFS()
+        sync(fs, results)
+        (results / "screenshots" / "one.png").write_bytes(b"changed")
+
+        summary = sync(fs, results)
+
+        assert_that(summary.files, is_(equal_to(1)))
+        assert_that(len(fs.files), is_(equal_to(2)))
+        assert_that(fs.by_path()["screenshots/one.png"].data, is_(b"changed"))
+
+
+class TestSyncManifest:
+    def test_round_trip(self, results):
+        scanned = ResultScanner(str(results)).scan().files[0]
+        manifest = SyncManifest(str(results / MANIFEST_NAME))
+        manifest.record(scanned, "digest")
+        manifest.save()
+
+        reloaded = SyncManifest(str(results / MANIFEST_NAME))
+
+        assert_that(reloaded.digest_for(scanned), is_("digest"))
+
+    def test_stale_entry_is_ignored(self, results):
+        scanned = ResultScanner(str(results)).scan().files[0]
+        manifest = SyncManifest(str(results / MANIFEST_NAME))
+        manifest.record(scanned, "digest")
+        with open(scanned.path, "ab") as fp:
+            fp.write(b"more")
+
+        rescanned = ResultScanner(str(results)).scan().files[0]
+
+        assert_that(manifest.digest_for(rescanned), is_(None))
+
+    def test_unreadable_manifest_starts_empty(self, results):
+        (results / MANIFEST_NAME).write_text("not json")
+        scanned = ResultScanner(str(results)).scan().files[0]
+
+        manifest = SyncManifest(str(results / MANIFEST_NAME))
+
+        assert_that(manifest.digest_for(scanned), is_(None))
@@ -0,0 +1,65 @@
+import threading
+
+import pytest
+from hamcrest import assert_that, equal_to, is_
+
+from mongo_python.artifact_upload import ArtifactUploader, UploadSummary
+from mongo_python.result_scanner import ResultScanner
+
+
+class FakeGridFS:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.files = {}
+
+    def put(self, data, filename, metadata):
+        with self.lock:
+            self.files[metadata["relative_path"]] = (filename, data.read())
+
+
+@pytest.fixture(name="results")
+def fixture_results(tmp_path):
+    (tmp_path / "screenshots" / "suite").mkdir(parents=True)
+    (tmp_path / "output.xml").write_bytes(b"<robot/>")
+    (tmp_path / "screenshots" / "one.png").write_bytes(b"1" * 10)
+    (tmp_path / "screenshots" / "suite" / "one.png").write_bytes(b"2" * 20)
+    return ResultScanner(str(tmp_path)).scan()
+
+
+class TestArtifactUploader:
+    @pytest.mark.parametrize("workers", [1, 4])
+    def test_uploads_recursively(self, results, workers):
+        fs = FakeGridFS()
+
+        ArtifactUploader(fs, workers).upload(results.files)
+
+        assert_that(
+            fs.files,
+            is_(
+                equal_to(
+                    {
+                        "output.xml": ("output.xml", b"<robot/>"),
+                        "screenshots/one.png": ("one.png", b"1" * 10),
+                        "screenshots/suite/one.png": ("one.png", b"2" * 20),
+                    }
+                )
+            ),
+        )
+
+    def test_summary(self, results):
+        clock = iter([10.0, 12.0])
+
+        summary = ArtifactUploader(FakeGridFS(), 2, clock=lambda: next(clock)).upload(
+            results.files
+        )
+
+        assert_that(summary.files, is_(equal_to(3)))
+        assert_that(summary.bytes, is_(equal_to(38)))
+        assert_that(summary.seconds, is_(equal_to(2.0)))
+        assert_that(summary.throughput, is_(equal_to(19.0)))
+
+
+def test_upload_summary_str():
+    summary = UploadSummary(3, 3 * 1024 * 1024, 2.0)
+
+    assert_that(str(summary), is_("Uploaded 3 files (3.0 MiB) in 2.0s, 1.5 MiB/s"))
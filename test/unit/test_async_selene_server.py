@@ -0,0 +1,160 @@
+import asyncio
+import json
+
+import pytest
+from hamcrest import assert_that, equal_to, is_
+
+from mongo_python.async_selene_server import AsyncSeleneServer, SeleneStatusError
+from mongo_python.build import BuildBuilder, BuildNotFoundError
+from mongo_python.selene_server import SeleneRequestError
+from mongo_python.test import TestBuilder as _TestBuilder
+
+
+class FakeReceiver:
+    """
+    Stand-in for AsyncSeleneServer._request that records every call and
+    answers from a table of (method, url) -> (status, body).
+    """
+
+    def __init__(self, responses=None, default=(200, b"")):
+        self.responses = responses or {}
+        self.default = default
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, method, api, body=None):
+        self.calls.append((method, api, body))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0)
+        self.in_flight -= 1
+        return self.responses.get((method, api), self.default)
+
+
+def create_server(receiver, **kwargs):
+    server = AsyncSeleneServer("http://skydocker.adtran.com", **kwargs)
+    # pylint: disable=protected-access
+    server._request = receiver
+    return server
+
+
+def create_tests(count):
+    return [
+        _TestBuilder()
+        .with_name("suite.test{0}".format(index))
+        .with_result("pass")
+        .construct()
+        for index in range(count)
+    ]
+
+
+def create_build():
+    return BuildBuilder().with_name("build-name").with_branch_name("branch").construct()
+
+
+class TestAsyncSeleneServer:
+    def test_get_build_id(self):
+        builds = [{"build_id": 4, "name": "build-name", "branch_name": "branch"}]
+        receiver = FakeReceiver(
+            {
+                ("get", "http://skydocker.adtran.com/api/build"): (
+                    200,
+                    json.dumps(builds).encode(),
+                )
+            }
+        )
+        server = create_server(receiver)
+
+        build_id = asyncio.run(server.get_build_id(create_build()))
+
+        assert_that(build_id, is_(equal_to(4)))
+
+    def test_get_build_id_not_found(self):
+        receiver = FakeReceiver(default=(200, b"[]"))
+        server = create_server(receiver)
+
+        with pytest.raises(BuildNotFoundError):
+            asyncio.run(server.get_build_id(create_build()))
+
+    def test_get_build_id_unexpected_response(self):
+        receiver = FakeReceiver(default=(200, b'{"error": "Internal error"}'))
+        server = create_server(receiver)
+
+        with pytest.raises(SeleneRequestError):
+            asyncio.run(server.get_build_id(create_build()))
+
+    def test_create_build_creates_missing_branch(self):
+        receiver = FakeReceiver(default=(200, b"[]"))
+        server = create_server(receiver)
+
+        asyncio.run(server.create_build(create_build()))
+
+        assert_that(
+            [call[:2] for call in receiver.calls],
+            is_(
+                equal_to(
+                    [
+                        ("get", "http://skydocker.adtran.com/api/branch"),
+                        ("post", "http://skydocker.adtran.com/api/branch"),
+                        ("post", "http://skydocker.adtran.com/api/build"),
+                    ]
+                )
+            ),
+        )
+
+    def test_create_test_cases_in_bulk(self):
+        receiver = FakeReceiver()
+        server = create_server(receiver, batch_size=2)
+
+        asyncio.run(server.create_test_cases(create_tests(5)))
+
+        urls = {call[1] for call in receiver.calls}
+        assert_that(len(receiver.calls), is_(equal_to(3)))
+        assert_that(urls, is_({"http://skydocker.adtran.com/api/testcase/bulk"}))
+
+    def test_concurrency_is_bounded(self):
+        receiver = FakeReceiver()
+        server = create_server(receiver, concurrency=2, batch_size=1)
+        # pylint: disable=protected-access
+        server._request = lambda *args: _bounded(server, receiver, *args)
+
+        asyncio.run(server.create_test_results(create_tests(6)))
+
+        assert_that(len(receiver.calls), is_(equal_to(6)))
+        assert_that(receiver.max_in_flight, is_(equal_to(2)))
+
+    def test_fallback_when_bulk_endpoint_missing(self):
+        bulk = ("post", "http://skydocker.adtran.com/api/test-result/bulk")
+        receiver = FakeReceiver({bulk: (404, b"")})
+        server = create_server(receiver)
+
+        asyncio.run(server.create_test_results(create_tests(3)))
+
+        urls = [call[1] for call in receiver.calls]
+        assert_that(urls.count(bulk[1]), is_(equal_to(1)))
+        assert_that(
+            urls.count("http://skydocker.adtran.com/api/test-result"), is_(equal_to(3))
+        )
+
+    def test_error_status(self):
+        receiver = FakeReceiver(default=(500, b""))
+        server = create_server(receiver)
+
+        with pytest.raises(SeleneRequestError):
+            asyncio.run(server.create_test_cases(create_tests(1)))
+
+
+async def _bounded(server, receiver, *args):
+    # pylint: disable=protected-access
+    async with server._get_semaphore():
+        return await receiver(*args)
+
+
+# pylint: disable=too-few-public-methods
+class TestSeleneStatusError:
+    def test_throw_error(self):
+        expected = "Error: http://skydocker.adtran.com returned HTTP 503"
+        with pytest.raises(SeleneRequestError, match=expected) as error:
+            raise SeleneStatusError("http://skydocker.adtran.com", 503)
+        assert_that(error.value.status, is_(equal_to(503)))
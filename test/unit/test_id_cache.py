@@ -0,0 +1,98 @@
+import threading
+import time
+
+import pytest
+from hamcrest import assert_that, equal_to, is_
+
+from mongo_python.id_cache import IdCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestIdCache:
+    def test_put_and_get(self):
+        cache = IdCache()
+        cache.put(("branch", "master"), 4)
+        assert_that(cache.get(("branch", "master")), is_(equal_to(4)))
+        assert_that(cache.get(("branch", "release")), is_(None))
+
+    def test_entries_expire(self):
+        clock = FakeClock()
+        cache = IdCache(ttl=10, clock=clock)
+        cache.put("key", 1)
+        clock.now = 9.9
+        assert_that(cache.get("key"), is_(equal_to(1)))
+        clock.now = 10.0
+        assert_that(cache.get("key"), is_(None))
+
+    def test_no_ttl(self):
+        clock = FakeClock()
+        cache = IdCache(ttl=None, clock=clock)
+        cache.put("key", 1)
+        clock.now = 1e9
+        assert_that(cache.get("key"), is_(equal_to(1)))
+
+    def test_invalidate(self):
+        cache = IdCache()
+        cache.put("one", 1)
+        cache.put("two", 2)
+        cache.invalidate("one")
+        assert_that(cache.get("one"), is_(None))
+        assert_that(cache.get("two"), is_(equal_to(2)))
+        cache.invalidate()
+        assert_that(cache.get("two"), is_(None))
+
+    def test_load_caches_result(self):
+        cache = IdCache()
+        calls = []
+
+        def loader():
+            calls.append(1)
+            return 7
+
+        assert_that(cache.load("key", loader), is_(equal_to(7)))
+        assert_that(cache.load("key", loader), is_(equal_to(7)))
+        assert_that(len(calls), is_(equal_to(1)))
+
+    def test_load_does_not_cache_errors(self):
+        cache = IdCache()
+
+        def failing_loader():
+            raise KeyError("missing")
+
+        with pytest.raises(KeyError):
+            cache.load("key", failing_loader)
+        assert_that(cache.load("key", lambda: 3), is_(equal_to(3)))
+
+    def test_concurrent_loads_share_one_flight(self):
+        cache = IdCache()
+        calls = []
+
+        def loader():
+            calls.append(1)
+            time.sleep(0.05)
+            cache.put("other", 2)
+            return 1
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda key=key: results.append(
+                    cache.load(key, loader, flight="builds")
+                )
+            )
+            for key in ["key", "key", "other", "key"]
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert_that(len(calls), is_(equal_to(1)))
+        assert_that(sorted(results), is_(equal_to([1, 1, 1, 2])))
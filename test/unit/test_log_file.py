@@ -1,10 +1,23 @@
+import gzip
+import hashlib
 import os
+import zlib
+
 import pytest
 from hamcrest import assert_that, equal_to, instance_of, is_, calling
-from mock import patch
-from mock import mock_open
+from mock import Mock, patch
+from requests import ConnectionError as RequestsConnectionError
 
-from mongo_python.log_file import LogFile, LogFileBuilder, LogFileNotFoundError
+from mongo_python.log_file import (
+    GZIP_MAGIC,
+    LogFile,
+    LogFileBuilder,
+    LogFileNotFoundError,
+    LogUploadError,
+    get_log_path,
+)
+from mongo_python.log_memo import LogMemo
+from mongo_python.server import create_session
 
 
 def create_log_file():
@@ -27,6 +40,18 @@ class TestLogFileBuilder:
         assert_that(log.log_path, is_(None))
         assert_that(log.log_file, is_(None))
 
+    def test_create_log_file_with_session(self):
+        session = create_session()
+        log = (
+            LogFileBuilder()
+            .with_output_file("output.xml")
+            .with_receiver("http://skydocker.adtran.com")
+            .with_session(session)
+            .construct()
+        )
+        # pylint: disable=protected-access
+        assert_that(log._session, is_(session))
+
 
 class TestLogFile:
     attributes = ["output_file", "receiver", "log_path", "log_file"]
@@ -84,53 +109,263 @@ class TestLogFile:
         log_file.post_log_file()
         assert_that(calling(log_file.post_log_file))
 
-    @patch("selene_python.log_file.os")
-    @patch.object(LogFile, "_get_log_path")
-    @patch("builtins.bytearray")
-    @patch("builtins.open", new_callable=mock_open, read_data="data")
-    @patch("selene_python.log_file.gzip")
-    def test_gzip_log(
-        self, mock_gzip, mock_open_file, mock_bytearray, mock_get_path, mock_os
-    ):
+    def test_post_log_streams_multipart(self, tmp_path):
+        path = tmp_path / "log.html"
+        path.write_bytes(b"I am a log file")
+        session = Mock()
+        session.post.side_effect = lambda url, data, headers: Mock(
+            text="stored.html", body=data.read()
+        )
+        log_file = LogFile("output.xml", "http://receiver", session=session)
+
+        log_file.post_log_file(str(path))
+
+        assert_that(log_file.log_file, is_("stored.html"))
+        kwargs = session.post.call_args[1]
+        assert_that(kwargs["url"], is_("http://receiver/api/log/upload"))
+        assert_that(
+            kwargs["headers"]["Content-Type"].startswith("multipart/form-data"),
+            is_(True),
+        )
+
+    def test_gzip_log(self, tmp_path):
+        path = tmp_path / "log.html"
+        path.write_bytes(b"<html>log</html>" * 1000)
         log_file = LogFile("output_file", "receiver")
 
-        log_file.gzip_log("log_file")
+        log_file.gzip_log(str(path))
 
-        mock_gzip.open.assert_called_once_with("log_file", "wb")
+        assert_that(path.read_bytes()[:2], is_(equal_to(GZIP_MAGIC)))
+        assert_that(
+            gzip.decompress(path.read_bytes()),
+            is_(equal_to(b"<html>log</html>" * 1000)),
+        )
+        assert_that(os.listdir(str(tmp_path)), is_(equal_to(["log.html"])))
 
-    @patch("selene_python.log_file.os")
-    @patch.object(LogFile, "_get_log_path")
-    @patch("builtins.bytearray")
-    @patch("builtins.open", new_callable=mock_open, read_data="filedata")
-    @patch("selene_python.log_file.gzip")
-    def test_gzip_log_bytearray(
-        self, mock_gzip, mock_open_file, mock_bytearray, mock_get_path, mock_os
-    ):
+    def test_gzip_log_records_digest(self, tmp_path):
+        path = tmp_path / "log.html"
+        path.write_bytes(b"<html>log</html>")
+        memo = LogMemo()
+        log_file = LogFile("output_file", "receiver", memo=memo)
+
+        log_file.gzip_log(str(path))
+
+        assert_that(
+            memo.digest_for(str(path)),
+            is_(equal_to(hashlib.sha256(path.read_bytes()).hexdigest())),
+        )
+
+    def test_gzip_log_is_reproducible(self, tmp_path):
+        first, second = tmp_path / "first.html", tmp_path / "second.html"
+        first.write_bytes(b"data")
+        second.write_bytes(b"data")
         log_file = LogFile("output_file", "receiver")
 
-        log_file.gzip_log("log_file")
+        log_file.gzip_log(str(first))
+        log_file.gzip_log(str(second))
+
+        assert_that(first.read_bytes(), is_(equal_to(second.read_bytes())))
+
+    def test_gzip_log_skips_gzipped_file(self, tmp_path):
+        path = tmp_path / "log.html"
+        path.write_bytes(gzip.compress(b"data"))
+        compressed = path.read_bytes()
+        log_file = LogFile("output_file", "receiver")
 
-        mock_bytearray.assert_called_once_with("filedata")
+        log_file.gzip_log(str(path))
+
+        assert_that(path.read_bytes(), is_(equal_to(compressed)))
+
+    @pytest.mark.parametrize("size", [0, 10, 3 * 1024 + 1])
+    @patch("mongo_python.log_file.PARALLEL_BLOCK_SIZE", 1024)
+    def test_gzip_log_in_parallel(self, tmp_path, size):
+        data = os.urandom(size // 2) + b"a" * (size - size // 2)
+        path = tmp_path / "log.html"
+        path.write_bytes(data)
+        log_file = LogFile("output_file", "receiver")
+
+        log_file.gzip_log(str(path), workers=2)
+
+        # One member: nothing follows the first trailer.
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        assert_that(decompressor.decompress(path.read_bytes()), is_(equal_to(data)))
+        assert_that(decompressor.eof, is_(True))
+        assert_that(decompressor.unused_data, is_(equal_to(b"")))
 
-    @patch("selene_python.log_file.os")
     @patch.object(LogFile, "_get_log_path")
-    @patch("builtins.bytearray")
-    @patch("builtins.open", new_callable=mock_open, read_data="filedata")
-    @patch("selene_python.log_file.gzip")
-    def test_gzip_log_no_path(
-        self, mock_gzip, mock_open_file, mock_bytearray, mock_get_path, mock_os
-    ):
-        mock_get_path.return_value = "GeneratedPath"
+    @patch("mongo_python.log_file.tempfile")
+    def test_gzip_log_no_path(self, mock_tempfile, mock_get_path, tmp_path):
+        mock_get_path.return_value = str(tmp_path / "log.html")
         log_file = LogFile("output_file", "receiver")
-        mock_os.path.isfile.return_value = False
 
         log_file.gzip_log(None)
 
         mock_get_path.assert_called_once()
-        mock_gzip.assert_not_called()
-        mock_open_file.assert_not_called()
-        mock_bytearray.assert_not_called()
-        mock_os.path.isfile.assert_called_once_with("GeneratedPath")
+        mock_tempfile.mkstemp.assert_not_called()
+
+
+def response(status=200, text="", json=None):
+    res = Mock(status_code=status, text=text)
+    res.json.return_value = json
+    if status >= 400:
+        res.raise_for_status.side_effect = RequestsConnectionError(status)
+    return res
+
+
+class TestResumableUpload:
+    @pytest.fixture(name="log_path")
+    def fixture_log_path(self, tmp_path):
+        path = tmp_path / "log.html"
+        path.write_bytes(b"0123456789")
+        return str(path)
+
+    @staticmethod
+    def create_log_file(session, progress=None):
+        return LogFile(
+            "output.xml",
+            "http://receiver",
+            session=session,
+            progress=progress,
+            resumable_threshold=1,
+        )
+
+    @patch("mongo_python.log_file.time")
+    @patch("mongo_python.log_file.UPLOAD_CHUNK_SIZE", 4)
+    def test_resumes_after_failure(self, _, log_path):
+        session = Mock()
+        session.post.side_effect = [
+            response(json={"upload_id": "abc"}),
+            response(text="stored.html"),
+        ]
+        session.put.side_effect = [
+            response(),
+            RequestsConnectionError("reset"),
+            response(),
+            response(),
+        ]
+        session.get.return_value = response(json={"offset": 4})
+        progress = []
+        log_file = self.create_log_file(session, lambda *args: progress.append(args))
+
+        log_file.post_log_file(log_path)
+
+        ranges = [c[1]["headers"]["Content-Range"] for c in session.put.call_args_list]
+        assert_that(
+            ranges,
+            is_(
+                equal_to(
+                    ["bytes 0-3/10", "bytes 4-7/10", "bytes 4-7/10", "bytes 8-9/10"]
+                )
+            ),
+        )
+        assert_that(
+            session.post.call_args[1]["url"],
+            is_("http://receiver/api/log/upload/session/abc/commit"),
+        )
+        assert_that(log_file.log_file, is_("stored.html"))
+        assert_that(progress[-1], is_(equal_to((10, 10))))
+
+    def test_falls_back_without_upload_sessions(self, log_path):
+        session = Mock()
+        session.post.side_effect = [
+            response(status=404),
+            response(text="stored.html"),
+        ]
+        log_file = self.create_log_file(session)
+
+        log_file.post_log_file(log_path)
+
+        assert_that(
+            session.post.call_args[1]["url"], is_("http://receiver/api/log/upload")
+        )
+        assert_that(log_file.log_file, is_("stored.html"))
+        session.put.assert_not_called()
+
+    @patch("mongo_python.log_file.time")
+    def test_gives_up_after_max_attempts(self, _, log_path):
+        session = Mock()
+        session.post.return_value = response(json={"upload_id": "abc"})
+        session.put.side_effect = RequestsConnectionError("reset")
+        session.get.return_value = response(json={"offset": 0})
+        log_file = self.create_log_file(session)
+
+        with pytest.raises(LogUploadError, match="Failed to upload"):
+            log_file.post_log_file(log_path)
+
+
+class TestLogDeduplication:
+    @pytest.fixture(name="log_path")
+    def fixture_log_path(self, tmp_path):
+        path = tmp_path / "log.html"
+        path.write_bytes(b"I am a log file")
+        return str(path)
+
+    @staticmethod
+    def create_session(lookup_status=404, lookup_text=""):
+        session = Mock()
+        session.get.return_value = response(status=lookup_status, text=lookup_text)
+        session.post.return_value = response(text="stored.html")
+        return session
+
+    def test_failed_upload_is_not_remembered(self, log_path):
+        session = self.create_session()
+        session.post.return_value = response(
+            status=500, text="<html>Internal Server Error</html>"
+        )
+        memo = LogMemo()
+        log_file = LogFile("output.xml", "http://receiver", session, memo=memo)
+
+        with pytest.raises(LogUploadError):
+            log_file.post_log_file(log_path)
+
+        assert_that(log_file.log_file, is_(None))
+        assert_that(memo.stored_name(memo.digest_for(log_path)), is_(None))
+
+    def test_uploads_once_per_run(self, log_path):
+        session = self.create_session()
+        memo = LogMemo()
+
+        for output_file in ["one/output.xml", "two/output.xml"]:
+            log_file = LogFile(output_file, "http://receiver", session, memo=memo)
+            log_file.post_log_file(log_path)
+            assert_that(log_file.log_file, is_("stored.html"))
+
+        session.post.assert_called_once()
+        headers = session.post.call_args[1]["headers"]
+        assert_that(
+            headers["X-Content-SHA256"],
+            is_(equal_to(hashlib.sha256(b"I am a log file").hexdigest())),
+        )
+
+    def test_skips_upload_of_known_content(self, log_path):
+        session = self.create_session(lookup_status=200, lookup_text="existing.html")
+        log_file = LogFile("output.xml", "http://receiver", session)
+
+        log_file.post_log_file(log_path)
+
+        assert_that(log_file.log_file, is_("existing.html"))
+        assert_that(
+            session.get.call_args[1]["url"],
+            is_(
+                "http://receiver/api/log/digest/"
+                + hashlib.sha256(b"I am a log file").hexdigest()
+            ),
+        )
+        session.post.assert_not_called()
+
+    def test_stops_looking_up_when_unsupported(self, log_path, tmp_path):
+        other_path = tmp_path / "other.html"
+        other_path.write_bytes(b"another log")
+        session = self.create_session(lookup_status=501)
+        memo = LogMemo()
+
+        for path in [log_path, str(other_path)]:
+            LogFile("output.xml", "http://receiver", session, memo=memo).post_log_file(
+                path
+            )
+
+        session.get.assert_called_once()
+        assert_that(session.post.call_count, is_(equal_to(2)))
 
 
 # pylint: disable=too-few-public-methods
@@ -139,3 +374,24 @@ class TestLogFileNotFoundError:
         expected = "Error not found: No file found in path: test_results/log.html"
         with pytest.raises(LogFileNotFoundError, match=expected):
             raise LogFileNotFoundError("test_results/log.html")
+
+
+@pytest.mark.parametrize(
+    "output_file,log_path",
+    [
+        ("output.xml", "log.html"),
+        ("results/output.xml", "results/log.html"),
+        ("results/pabot-output-1.xml", "results/pabot-log.html"),
+        ("output_dir/shard/output.xml", "output_dir/shard/log.html"),
+    ],
+)
+def test_get_log_path(output_file, log_path):
+    assert_that(get_log_path(output_file), is_(equal_to(log_path)))
+
+
+# pylint: disable=too-few-public-methods
+class TestLogUploadError:
+    def test_throw_error(self):
+        expected = "Error: Failed to upload log.html: timed out"
+        with pytest.raises(LogUploadError, match=expected):
+            raise LogUploadError("log.html", "timed out")
@@ -0,0 +1,76 @@
+import hashlib
+import io
+import os
+
+from hamcrest import assert_that, equal_to, is_
+from mock import patch
+
+from mongo_python.log_memo import HashingWriter, LogMemo, file_digest
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def test_file_digest(tmp_path):
+    path = tmp_path / "log.html"
+    path.write_bytes(b"I am a log file")
+
+    assert_that(file_digest(str(path)), is_(equal_to(sha256(b"I am a log file"))))
+
+
+def test_hashing_writer():
+    output = io.BytesIO()
+    writer = HashingWriter(output)
+
+    writer.write(b"I am ")
+    writer.write(b"a log file")
+
+    assert_that(output.getvalue(), is_(equal_to(b"I am a log file")))
+    assert_that(writer.hexdigest(), is_(equal_to(sha256(b"I am a log file"))))
+
+
+class TestLogMemo:
+    @patch("mongo_python.log_memo.file_digest", side_effect=file_digest)
+    def test_digest_is_memoized(self, mock_digest, tmp_path):
+        path = tmp_path / "log.html"
+        path.write_bytes(b"data")
+        memo = LogMemo()
+
+        first = memo.digest_for(str(path))
+        second = memo.digest_for(str(path))
+
+        assert_that(first, is_(equal_to(second)))
+        mock_digest.assert_called_once()
+
+    def test_changed_file_is_hashed_again(self, tmp_path):
+        path = tmp_path / "log.html"
+        path.write_bytes(b"data")
+        memo = LogMemo()
+        memo.digest_for(str(path))
+
+        path.write_bytes(b"other data")
+        os.utime(str(path), ns=(0, 0))
+
+        assert_that(memo.digest_for(str(path)), is_(equal_to(sha256(b"other data"))))
+
+    def test_remembered_digest_is_used(self, tmp_path):
+        path = tmp_path / "log.html"
+        path.write_bytes(b"data")
+        memo = LogMemo()
+
+        memo.remember_digest(str(path), "digest")
+
+        assert_that(memo.digest_for(str(path)), is_("digest"))
+
+    def test_stored_name(self):
+        memo = LogMemo()
+        memo.remember_name("digest", "stored.html")
+
+        assert_that(memo.stored_name("digest"), is_("stored.html"))
+        assert_that(memo.stored_name("other"), is_(None))
+
+    def test_flight_is_shared_per_digest(self):
+        memo = LogMemo()
+
+        assert_that(memo.flight("digest"), is_(memo.flight("digest")))
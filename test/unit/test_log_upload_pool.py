@@ -0,0 +1,72 @@
+import threading
+
+import pytest
+from hamcrest import assert_that, equal_to, is_
+
+from mongo_python.log_upload_pool import LogUploadPool
+
+
+@pytest.fixture(name="logs")
+def fixture_logs(tmp_path):
+    paths = []
+    for name in ["one.html", "two.html"]:
+        path = tmp_path / name
+        path.write_bytes(b"0123456789")
+        paths.append(str(path))
+    return paths
+
+
+class TestLogUploadPool:
+    def test_returns_upload_result(self, logs):
+        pool = LogUploadPool(workers=2)
+
+        future = pool.submit(logs[0], lambda name: name.upper(), "stored.html")
+
+        assert_that(future.result(timeout=5), is_("STORED.HTML"))
+        pool.shutdown()
+
+    def test_same_log_is_uploaded_once(self, logs):
+        calls = []
+        pool = LogUploadPool(workers=2)
+
+        first = pool.submit(logs[0], calls.append, "first")
+        second = pool.submit(logs[0], calls.append, "second")
+        pool.shutdown()
+
+        assert_that(second, is_(first))
+        assert_that(calls, is_(equal_to(["first"])))
+
+    def test_bytes_in_flight_are_capped(self, logs):
+        release = threading.Event()
+        first_started = threading.Event()
+        started = []
+
+        def upload(name):
+            started.append(name)
+            first_started.set()
+            release.wait(5)
+            return name
+
+        pool = LogUploadPool(workers=2, max_bytes=15)
+        first = pool.submit(logs[0], upload, "one")
+        second = pool.submit(logs[1], upload, "two")
+        first_started.wait(5)
+
+        assert_that(started, is_(equal_to(["one"])))
+        assert_that(pool.bytes_in_flight, is_(equal_to(10)))
+        release.set()
+        assert_that(first.result(timeout=5), is_("one"))
+        assert_that(second.result(timeout=5), is_("two"))
+        pool.shutdown()
+        assert_that(pool.bytes_in_flight, is_(equal_to(0)))
+
+    def test_errors_are_raised_by_result(self, logs):
+        def upload():
+            raise ValueError("upload failed")
+
+        pool = LogUploadPool(workers=1)
+        future = pool.submit(logs[0], upload)
+
+        with pytest.raises(ValueError, match="upload failed"):
+            future.result(timeout=5)
+        pool.shutdown()
@@ -0,0 +1,114 @@
+import sqlite3
+
+import pytest
+from hamcrest import assert_that, equal_to, instance_of, is_
+
+from mongo_python.lookup_cache import LookupCache, open_lookup_cache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(name="cache_file")
+def fixture_cache_file(tmp_path):
+    return str(tmp_path / "cache" / "selene.db")
+
+
+class TestLookupCache:
+    def test_branch_ids(self, cache_file):
+        cache = LookupCache(cache_file, "http://receiver")
+        cache.put_branch_id("master", 4)
+        assert_that(cache.get_branch_id("master"), is_(equal_to(4)))
+        assert_that(cache.get_branch_id("release"), is_(None))
+        cache.invalidate_branch("master")
+        assert_that(cache.get_branch_id("master"), is_(None))
+
+    def test_build_ids(self, cache_file):
+        cache = LookupCache(cache_file, "http://receiver")
+        cache.put_build_id("master", "42", 9000)
+        assert_that(cache.get_build_id("master", "42"), is_(equal_to(9000)))
+        assert_that(cache.get_build_id("release", "42"), is_(None))
+        cache.invalidate_build("master", "42")
+        assert_that(cache.get_build_id("master", "42"), is_(None))
+
+    def test_entries_expire(self, cache_file):
+        clock = FakeClock()
+        cache = LookupCache(cache_file, "http://receiver", ttl=60, clock=clock)
+        cache.put_branch_id("master", 4)
+        clock.now += 60
+        assert_that(cache.get_branch_id("master"), is_(None))
+
+    def test_string_ids_keep_their_type(self, cache_file):
+        cache = LookupCache(cache_file, "http://receiver")
+        cache.put_branch_id("master", "123")
+        assert_that(cache.get_branch_id("master"), is_(equal_to("123")))
+
+    def test_test_cases_expire(self, cache_file):
+        clock = FakeClock()
+        cache = LookupCache(cache_file, "http://receiver", ttl=60, clock=clock)
+        cache.add_test_cases(["suite.old"])
+        clock.now += 30
+        cache.add_test_cases(["suite.new"])
+        clock.now += 30
+        assert_that(
+            cache.known_test_cases(["suite.old", "suite.new"]),
+            is_(equal_to({"suite.new"})),
+        )
+
+    def test_older_schema_is_replaced(self, cache_file):
+        LookupCache(cache_file, "http://receiver").close()
+        connection = sqlite3.connect(cache_file)
+        connection.executescript(
+            "DROP TABLE test_cases;"
+            "CREATE TABLE test_cases (receiver TEXT, name TEXT);"
+            "INSERT INTO test_cases VALUES ('http://receiver', 'suite.test');"
+            "PRAGMA user_version = 0;"
+        )
+        connection.close()
+
+        cache = LookupCache(cache_file, "http://receiver")
+        assert_that(cache.has_test_case("suite.test"), is_(False))
+        cache.add_test_cases(["suite.test"])
+        assert_that(cache.has_test_case("suite.test"), is_(True))
+
+    def test_entries_are_scoped_to_receiver(self, cache_file):
+        LookupCache(cache_file, "http://one").put_branch_id("master", 1)
+        cache = LookupCache(cache_file, "http://two")
+        assert_that(cache.get_branch_id("master"), is_(None))
+
+    def test_persists_across_instances(self, cache_file):
+        first = LookupCache(cache_file, "http://receiver")
+        first.put_build_id("master", "42", 9000)
+        first.add_test_cases(["suite.test"])
+        first.close()
+
+        second = LookupCache(cache_file, "http://receiver")
+        assert_that(second.get_build_id("master", "42"), is_(equal_to(9000)))
+        assert_that(second.has_test_case("suite.test"), is_(True))
+
+    def test_known_test_cases(self, cache_file):
+        cache = LookupCache(cache_file, "http://receiver")
+        names = ["suite.test{0}".format(index) for index in range(1200)]
+        cache.add_test_cases(names[::2])
+        known = cache.known_test_cases(names)
+        assert_that(known, is_(equal_to(set(names[::2]))))
+
+
+class TestOpenLookupCache:
+    def test_disabled_by_default(self, monkeypatch):
+        monkeypatch.delenv("SELENE_CACHE_FILE", raising=False)
+        assert_that(open_lookup_cache(None, "http://receiver"), is_(None))
+
+    def test_from_environment(self, monkeypatch, cache_file):
+        monkeypatch.setenv("SELENE_CACHE_FILE", cache_file)
+        cache = open_lookup_cache(None, "http://receiver")
+        assert_that(cache, is_(instance_of(LookupCache)))
+        assert_that(cache.path, is_(equal_to(cache_file)))
+
+    def test_no_cache(self, cache_file):
+        assert_that(open_lookup_cache(cache_file, "http://receiver", True), is_(None))
@@ -0,0 +1,67 @@
+import pytest
+from hamcrest import assert_that, equal_to, is_
+from mock import patch
+
+from mongo_python import mongo_client
+from mongo_python.mongo_client import MongoConnection
+
+
+@pytest.fixture(autouse=True, name="reset")
+def fixture_reset():
+    yield
+    mongo_client.close()
+    # pylint: disable=protected-access
+    mongo_client._CONNECTION = None
+
+
+class TestMongoConnection:
+    @patch("pymongo.MongoClient")
+    def test_client_is_created_lazily(self, mock_client):
+        connection = MongoConnection("mongodb://mongo:27017/", 8, 2.5)
+
+        mock_client.assert_not_called()
+        client = connection.client
+
+        assert_that(connection.client, is_(client))
+        mock_client.assert_called_once_with(
+            "mongodb://mongo:27017/",
+            maxPoolSize=8,
+            connectTimeoutMS=2500,
+            serverSelectionTimeoutMS=2500,
+        )
+
+    @patch.dict("os.environ", {"SELENE_MONGO_URI": "mongodb://env:27017/"})
+    def test_uri_from_environment(self):
+        assert_that(MongoConnection().uri, is_("mongodb://env:27017/"))
+
+    @patch.dict("os.environ", clear=True)
+    def test_default_uri(self):
+        assert_that(MongoConnection().uri, is_(mongo_client.DEFAULT_MONGO_URI))
+
+    @patch("pymongo.MongoClient")
+    def test_close(self, mock_client):
+        connection = MongoConnection()
+        _ = connection.client
+
+        connection.close()
+        connection.close()
+
+        mock_client.return_value.close.assert_called_once()
+
+
+class TestProcessWideClient:
+    @patch("pymongo.MongoClient")
+    def test_client_is_shared(self, mock_client):
+        assert_that(mongo_client.get_client(), is_(mongo_client.get_client()))
+        mock_client.assert_called_once()
+
+    @patch("pymongo.MongoClient")
+    def test_configure_closes_previous_client(self, mock_client):
+        previous = mongo_client.get_client()
+
+        connection = mongo_client.configure("mongodb://other:27017/", 4, 1)
+
+        previous.close.assert_called_once()
+        assert_that(connection.uri, is_("mongodb://other:27017/"))
+        assert_that(mongo_client.get_connection(), is_(connection))
+        assert_that(mock_client.call_count, is_(equal_to(1)))
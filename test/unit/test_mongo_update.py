@@ -0,0 +1,98 @@
+from argparse import Namespace
+
+import pytest
+from hamcrest import assert_that, equal_to, is_
+from mock import patch
+
+from mongo_python.log_file import LogUploadError
+from mongo_python.mongo_update import (
+    _create_parser_add_args,
+    create_result,
+    ensure_indexes,
+    replay_spool,
+)
+
+
+def create_args(**kwargs):
+    values = {
+        "branch_name": "master",
+        "build_name": None,
+        "mongo_uri": None,
+        "dry_run": False,
+    }
+    values.update(kwargs)
+    return Namespace(**values)
+
+
+def test_index_ensure_parser():
+    args = _create_parser_add_args().parse_args(
+        ["index", "ensure", "--branch-name", "master", "--dry-run"]
+    )
+
+    assert_that(args.func, is_(ensure_indexes))
+    assert_that(args.dry_run, is_(True))
+
+
+def test_spool_replay_parser():
+    args = _create_parser_add_args().parse_args(
+        ["spool", "replay", "spool-dir", "--jobs", "16"]
+    )
+
+    assert_that(args.func, is_(replay_spool))
+    assert_that(args.directory, is_(equal_to("spool-dir")))
+    assert_that(args.jobs, is_(equal_to(16)))
+
+
+class TestEnsureIndexes:
+    @patch("mongo_python.mongo_update.selene_mongodb.SeleneMongoDB")
+    @patch("mongo_python.mongo_update.mongo_client.configure")
+    def test_builds_missing_indexes_of_every_build(
+        self, mock_configure, mock_mongodb, capsys
+    ):
+        database = mock_configure.return_value.client.__getitem__.return_value
+        database.list_collection_names.return_value = ["2", "1", "1.files"]
+        mock_mongodb.return_value.missing_indexes.return_value = ["name_1"]
+
+        ensure_indexes(create_args())
+
+        assert_that(
+            [call[0] for call in mock_mongodb.call_args_list],
+            is_(equal_to([("master", "1"), ("master", "2")])),
+        )
+        assert_that(
+            mock_mongodb.return_value.ensure_indexes.call_count, is_(equal_to(2))
+        )
+        assert_that("1: missing name_1" in capsys.readouterr().out, is_(True))
+        mock_configure.return_value.close.assert_called_once()
+
+    @patch("mongo_python.mongo_update.selene_mongodb.SeleneMongoDB")
+    @patch("mongo_python.mongo_update.mongo_client.configure")
+    def test_dry_run_only_lists(self, _, mock_mongodb):
+        mock_mongodb.return_value.missing_indexes.return_value = ["name_1"]
+
+        ensure_indexes(create_args(build_name="1", dry_run=True))
+
+        mock_mongodb.return_value.ensure_indexes.assert_not_called()
+
+
+class TestCreateResult:
+    @patch("mongo_python.mongo_update.log_file.LogFile")
+    @patch("mongo_python.mongo_update._create_server")
+    def test_server_is_closed_when_the_log_fails(self, mock_server, mock_log_file):
+        mock_log_file.return_value.post_log_file.side_effect = LogUploadError(
+            "log.html", "500"
+        )
+        args = Namespace(
+            branch_name="master",
+            build_name="1",
+            result="pass",
+            receiver="http://selene",
+            log_path="log.html",
+            test_name="suite.test",
+        )
+
+        with pytest.raises(LogUploadError):
+            create_result(args)
+
+        mock_server.return_value.create_test_case.assert_not_called()
+        mock_server.return_value.close.assert_called_once()
@@ -0,0 +1,55 @@
+import pytest
+from hamcrest import assert_that, equal_to, is_
+
+from mongo_python.multipart import MultipartFileEncoder
+
+EXPECTED = (
+    b"--boundary\r\n"
+    b'Content-Disposition: form-data; name="file"; filename="log.html"\r\n'
+    b"\r\n"
+    b"I am a log file"
+    b"\r\n--boundary--\r\n"
+)
+
+
+@pytest.fixture(name="log_path")
+def fixture_log_path(tmp_path):
+    path = tmp_path / "log.html"
+    path.write_bytes(b"I am a log file")
+    return str(path)
+
+
+class TestMultipartFileEncoder:
+    def test_read(self, log_path):
+        with MultipartFileEncoder("file", log_path, boundary="boundary") as body:
+            assert_that(body.read(), is_(equal_to(EXPECTED)))
+            assert_that(body.read(), is_(equal_to(b"")))
+
+    @pytest.mark.parametrize("size", [1, 7, 64])
+    def test_read_in_chunks(self, log_path, size):
+        with MultipartFileEncoder("file", log_path, boundary="boundary") as body:
+            data = b"".join(iter(lambda: body.read(size), b""))
+        assert_that(data, is_(equal_to(EXPECTED)))
+
+    def test_len_and_content_type(self, log_path):
+        with MultipartFileEncoder("file", log_path, boundary="boundary") as body:
+            assert_that(len(body), is_(equal_to(len(EXPECTED))))
+            assert_that(
+                body.content_type,
+                is_(equal_to("multipart/form-data; boundary=boundary")),
+            )
+
+    def test_progress(self, log_path):
+        calls = []
+        with MultipartFileEncoder(
+            "file", log_path, progress=lambda *args: calls.append(args)
+        ) as body:
+            list(body)
+        assert_that(calls[-1], is_(equal_to((15, 15))))
+
+    def test_seek_rewinds(self, log_path):
+        with MultipartFileEncoder("file", log_path, boundary="boundary") as body:
+            body.read(90)
+            body.seek(0)
+            assert_that(body.tell(), is_(equal_to(0)))
+            assert_that(body.read(), is_(equal_to(EXPECTED)))
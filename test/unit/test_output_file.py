@@ -1,19 +1,70 @@
 import json
+import xml.etree.ElementTree as ET
 import pytest
 from hamcrest import assert_that, equal_to, instance_of, is_
 
 from mongo_python.output_file import (
     OutputFile,
     OutputFileBuilder,
+    _iterparse_not_robot,
+    _iterparse_robot,
     _parse_robot,
     _parse_not_robot,
 )
 
+ROBOT_OUTPUT = """<?xml version="1.0"?>
+<robot>
+  <suite name="top">
+    <kw name="Setup"><status status="PASS"/></kw>
+    <suite name="child">
+      <test name="one">
+        <kw name="Step">
+          <msg>noise</msg>
+          <kw name="Inner"><status status="FAIL"/></kw>
+          <status status="FAIL"/>
+        </kw>
+        <status status="PASS" critical="yes"
+                starttime="20180826 04:43:00.939" endtime="20180826 04:43:02.239"/>
+      </test>
+    </suite>
+    <test name="two">
+      <status status="SKIP" starttime="20180826 04:43:00.000"
+              endtime="20180826 04:43:00.500"/>
+    </test>
+    <status status="PASS"/>
+  </suite>
+  <statistics>
+    <suite><stat name="top">top</stat></suite>
+  </statistics>
+</robot>
+"""
+
 
 def create_output_file(filename="output.xml"):
     return OutputFileBuilder().with_filename(filename).construct()
 
 
+JUNIT_OUTPUT = """<?xml version="1.0"?>
+<testsuites>
+  <testsuite name="suite">
+    <properties><property name="a" value="b"/></properties>
+    <testcase classname="suite" name="passes" time="0.5">
+      <system-out>lots of captured output</system-out>
+    </testcase>
+    <testcase classname="suite" name="fails" time="1.5">
+      <failure message="boom">traceback</failure>
+      <system-err>more output</system-err>
+    </testcase>
+    <testcase classname="suite" name="skips" time="0">
+      <skipped/>
+    </testcase>
+    <testcase classname="suite" name="errors" status="failure" time="2"/>
+  </testsuite>
+  <system-out>suite level output</system-out>
+</testsuites>
+"""
+
+
 # pylint: disable=too-few-public-methods
 class TestOutputFileBuilder:
     def test_create_output_file(self):
@@ -71,3 +122,63 @@ class TestOutputFile:
         output_file.parse_output_file()
         result = output_file.get_tests()
         assert_that(result, is_(equal_to(expected)))
+
+
+class TestStreamingParsers:
+    @pytest.mark.parametrize(
+        "filename",
+        [
+            ("test/data/output.xml"),
+            ("test/data/TESTS-project.xml"),
+            ("test/data/pytest_xUnit.xml"),
+            ("test/data/gtest_xUnit.xml"),
+        ],
+    )
+    def test_iter_tests(self, filename):
+        output_file = create_output_file(filename)
+        with open(filename + ".json") as f:
+            expected = json.loads(f.read())
+        result = list(output_file.iter_tests())
+        assert_that(result, is_(equal_to(expected)))
+
+    def test_iterparse_robot_skips_keywords_and_statistics(self, tmp_path):
+        filename = tmp_path / "output.xml"
+        filename.write_text(ROBOT_OUTPUT)
+        result = [test.to_json() for test in _iterparse_robot(str(filename))]
+        assert_that(
+            result,
+            is_(
+                equal_to(
+                    [
+                        {
+                            "name": "top.child.one",
+                            "result": "pass",
+                            "critical": True,
+                            "test_duration": 1.3,
+                        },
+                        {
+                            "name": "top.two",
+                            "result": "fail",
+                            "critical": False,
+                            "test_duration": 0.5,
+                        },
+                    ]
+                )
+            ),
+        )
+
+    def test_iterparse_not_robot_matches_tree_parser(self, tmp_path):
+        filename = tmp_path / "TESTS-suite.xml"
+        filename.write_text(JUNIT_OUTPUT)
+        root = ET.parse(str(filename)).getroot()
+        expected = [test.to_json() for test in _parse_not_robot(root)]
+        result = [test.to_json() for test in _iterparse_not_robot(str(filename))]
+        assert_that(result, is_(equal_to(expected)))
+        assert_that(
+            [(test["result"], test["critical"]) for test in result],
+            is_(
+                equal_to(
+                    [("pass", True), ("fail", True), ("fail", False), ("fail", True)]
+                )
+            ),
+        )
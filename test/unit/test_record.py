@@ -0,0 +1,76 @@
+from hamcrest import assert_that, equal_to, is_
+
+from mongo_python.record import TestContext as _TestContext
+from mongo_python.record import TestRecord as _TestRecord
+from mongo_python.test import TestBuilder as _TestBuilder
+
+
+def create_context():
+    return _TestContext("master", "1", "One", "log.html")
+
+
+class TestTestRecord:
+    def test_to_json_matches_test(self):
+        record = _TestRecord("suite.test", "pass", True, 1.3)
+        record.attach(create_context())
+        test = (
+            _TestBuilder()
+            .with_name("suite.test")
+            .with_result("pass")
+            .with_branch_name("master")
+            .with_build_name("1")
+            .with_stage("One")
+            .with_log("log.html")
+            .with_critical(True)
+            .with_test_duration(1.3)
+            .construct()
+        )
+
+        assert_that(list(record.to_json().items()), is_(list(test.to_json().items())))
+        assert_that(record.payload(), is_(equal_to(test.payload())))
+
+    def test_without_context(self):
+        record = _TestRecord("suite.test", "fail", False, 0.5)
+
+        assert_that(record.branch_name, is_(None))
+        assert_that(
+            record.to_json(),
+            is_(
+                equal_to(
+                    {
+                        "name": "suite.test",
+                        "result": "fail",
+                        "critical": False,
+                        "test_duration": 0.5,
+                    }
+                )
+            ),
+        )
+
+    def test_records_share_context(self):
+        context = create_context()
+        records = [_TestRecord(name, "pass").attach(context) for name in "ab"]
+
+        assert_that(records[0].context, is_(records[1].context))
+        assert_that(records[1].stage, is_(equal_to("One")))
+
+    def test_payload_is_encoded_once(self):
+        record = _TestRecord("suite.test", "pass")
+
+        assert_that(record.payload(), is_(record.payload()))
+
+    def test_attach_resets_payload(self):
+        record = _TestRecord("suite.test", "pass")
+        before = record.payload()
+
+        record.attach(create_context())
+
+        assert_that(b'"log"' in before, is_(False))
+        assert_that(b'"log":"log.html"' in record.payload(), is_(True))
+
+    def test_from_json(self):
+        items = {"name": "suite.test", "result": "pass", "stage": "One"}
+
+        record = _TestRecord.from_json(items)
+
+        assert_that(record.to_json(), is_(equal_to(items)))
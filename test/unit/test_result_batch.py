@@ -0,0 +1,130 @@
+import pickle
+
+import pytest
+from hamcrest import assert_that, close_to, equal_to, is_
+
+from mongo_python.output_file import OutputFileBuilder
+from mongo_python.record import TestContext as _TestContext
+from mongo_python.record import TestRecord as _TestRecord
+from mongo_python.result_batch import ResultBatch, StageSummary
+
+numpy = pytest.importorskip("numpy")
+
+
+def create_records(stage, rows):
+    context = _TestContext(stage=stage)
+    return [
+        _TestRecord(name, result, critical, duration).attach(context)
+        for name, result, critical, duration in rows
+    ]
+
+
+def create_batch():
+    return ResultBatch.from_records(
+        create_records(
+            "One",
+            [
+                ("suite.a", "pass", True, 1.0),
+                ("suite.b", "fail", True, 4.0),
+                ("suite.c", "fail", False, 2.0),
+                ("suite.d", "pass", True, None),
+            ],
+        )
+        + create_records("Two", [("suite.a", "fail", True, 3.0)])
+    )
+
+
+class TestResultBatch:
+    def test_columns(self):
+        batch = create_batch()
+
+        assert_that(len(batch), is_(equal_to(5)))
+        assert_that(
+            batch.names, is_(equal_to(["suite.a", "suite.b", "suite.c", "suite.d"]))
+        )
+        assert_that(batch.name_ids.tolist(), is_(equal_to([0, 1, 2, 3, 0])))
+        assert_that(batch.stages, is_(equal_to(["One", "Two"])))
+        assert_that(
+            batch.passed().tolist(), is_(equal_to([True, False, False, True, False]))
+        )
+        assert_that(bool(numpy.isnan(batch.durations[3])), is_(True))
+
+    def test_summarize(self):
+        one, two = create_batch().summarize(slowest=2)
+
+        assert_that(one.stage, is_(equal_to("One")))
+        assert_that(one.tests, is_(equal_to(4)))
+        assert_that(one.passed, is_(equal_to(2)))
+        assert_that(one.failed, is_(equal_to(2)))
+        assert_that(one.pass_rate, is_(close_to(0.5, 1e-9)))
+        assert_that(one.critical_failures, is_(equal_to(1)))
+        assert_that(one.total_duration, is_(close_to(7.0, 1e-9)))
+        assert_that(one.slowest, is_(equal_to([("suite.b", 4.0), ("suite.c", 2.0)])))
+        assert_that(two.tests, is_(equal_to(1)))
+        assert_that(two.critical_failures, is_(equal_to(1)))
+        assert_that(two.slowest, is_(equal_to([("suite.a", 3.0)])))
+
+    def test_summarize_empty(self):
+        assert_that(ResultBatch.from_records([]).summarize(), is_(equal_to([])))
+
+    def test_stage_summary_str(self):
+        summary = StageSummary("One", 4, 3, 1, 12.5, [])
+
+        assert_that(
+            str(summary),
+            is_(equal_to("One: 4 tests, 75.0% passed, 1 critical failures, 12.5s")),
+        )
+
+    def test_concatenate_merges_tables(self):
+        first = ResultBatch.from_records(
+            create_records("One", [("suite.a", "pass", True, 1.0)])
+        )
+        second = ResultBatch.from_records(
+            create_records(
+                "Two", [("suite.b", "fail", True, 2.0), ("suite.a", "pass", True, 3.0)]
+            )
+        )
+
+        batch = ResultBatch.concatenate([first, second])
+
+        assert_that(batch.names, is_(equal_to(["suite.a", "suite.b"])))
+        assert_that(batch.name_ids.tolist(), is_(equal_to([0, 1, 0])))
+        assert_that(batch.stage_ids.tolist(), is_(equal_to([0, 1, 1])))
+        assert_that(batch.durations.tolist(), is_(equal_to([1.0, 2.0, 3.0])))
+
+    def test_records_round_trip(self):
+        records = create_records("One", [("suite.a", "pass", False, None)])
+        context = _TestContext("master", "1", "One", "log.html")
+
+        batch = pickle.loads(pickle.dumps(ResultBatch.from_records(records)))
+        (record,) = batch.records(context)
+
+        assert_that(record.context, is_(context))
+        assert_that(
+            record.to_json(),
+            is_(
+                equal_to(
+                    {
+                        "name": "suite.a",
+                        "result": "pass",
+                        "branch_name": "master",
+                        "build_name": "1",
+                        "log": "log.html",
+                        "stage": "One",
+                        "critical": False,
+                    }
+                )
+            ),
+        )
+
+    def test_from_output_file(self):
+        output_file = (
+            OutputFileBuilder().with_filename("test/data/pytest_xUnit.xml").construct()
+        )
+
+        batch = output_file.result_batch()
+
+        assert_that(
+            [record.to_json() for record in batch.records()],
+            is_(equal_to(list(output_file.iter_tests()))),
+        )
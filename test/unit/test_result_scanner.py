@@ -0,0 +1,134 @@
+import os
+import pytest
+from hamcrest import assert_that, equal_to, is_
+
+from mongo_python.result_scanner import (
+    ARTIFACT,
+    JUNIT,
+    LOG,
+    ROBOT_OUTPUT,
+    ResultScanner,
+)
+
+
+def create_results(root):
+    paths = [
+        "output.xml",
+        "log.html",
+        "report.html",
+        "screenshot.png",
+        "shard1/pabot-output-1.xml",
+        "shard1/pabot-log.html",
+        "shard2/output.xml",
+        "junit/TESTS-project.xml",
+        "junit/nested/capture.txt",
+        ".hidden/output.xml",
+        ".journal",
+    ]
+    for path in paths:
+        full_path = root / path
+        full_path.parent.mkdir(parents=True, exist_ok=True)
+        full_path.write_text(path)
+    return str(root)
+
+
+def relative_paths(scanned_files):
+    return [scanned.relative_path for scanned in scanned_files]
+
+
+class TestResultScanner:
+    def test_classifies_files(self, tmp_path):
+        directory = create_results(tmp_path)
+        scan = ResultScanner(directory).scan()
+
+        kinds = {scanned.relative_path: scanned.kind for scanned in scan.files}
+        assert_that(
+            kinds,
+            is_(
+                equal_to(
+                    {
+                        ".journal": ARTIFACT,
+                        "junit/TESTS-project.xml": JUNIT,
+                        "junit/nested/capture.txt": ARTIFACT,
+                        "log.html": LOG,
+                        "output.xml": ROBOT_OUTPUT,
+                        "report.html": ARTIFACT,
+                        "screenshot.png": ARTIFACT,
+                        "shard1/pabot-log.html": LOG,
+                        "shard1/pabot-output-1.xml": ROBOT_OUTPUT,
+                        "shard2/output.xml": ROBOT_OUTPUT,
+                    }
+                )
+            ),
+        )
+
+    def test_outputs_list_robot_before_junit(self, tmp_path):
+        directory = create_results(tmp_path)
+        scan = ResultScanner(directory).scan()
+
+        assert_that(
+            scan.outputs(),
+            is_(
+                equal_to(
+                    [
+                        os.path.join(directory, "output.xml"),
+                        os.path.join(directory, "shard1/pabot-output-1.xml"),
+                        os.path.join(directory, "shard2/output.xml"),
+                        os.path.join(directory, "junit/TESTS-project.xml"),
+                    ]
+                )
+            ),
+        )
+
+    def test_pairs_outputs_with_logs(self, tmp_path):
+        directory = create_results(tmp_path)
+        scan = ResultScanner(directory).scan()
+
+        assert_that(
+            scan.log_for(os.path.join(directory, "shard1/pabot-output-1.xml")),
+            is_(equal_to(os.path.join(directory, "shard1/pabot-log.html"))),
+        )
+        assert_that(
+            scan.log_for(os.path.join(directory, "shard2/output.xml")), is_(None)
+        )
+
+    def test_excludes(self, tmp_path):
+        directory = create_results(tmp_path)
+        scan = ResultScanner(directory, excludes=["shard*", "*.png"]).scan()
+
+        assert_that(
+            relative_paths(scan.files),
+            is_(
+                equal_to(
+                    [
+                        ".journal",
+                        "junit/TESTS-project.xml",
+                        "junit/nested/capture.txt",
+                        "log.html",
+                        "output.xml",
+                        "report.html",
+                    ]
+                )
+            ),
+        )
+
+    @pytest.mark.parametrize("workers", [2, 8])
+    def test_parallel_scan_matches_serial(self, tmp_path, workers):
+        directory = create_results(tmp_path)
+        serial = ResultScanner(directory).scan()
+        parallel = ResultScanner(directory, workers=workers).scan()
+
+        assert_that(
+            relative_paths(parallel.files), is_(equal_to(relative_paths(serial.files)))
+        )
+
+    def test_size(self, tmp_path):
+        directory = create_results(tmp_path)
+        scan = ResultScanner(directory).scan()
+
+        sizes = {scanned.relative_path: scanned.size for scanned in scan.files}
+        assert_that(sizes["output.xml"], is_(equal_to(len("output.xml"))))
+
+    def test_missing_directory(self, tmp_path):
+        scan = ResultScanner(str(tmp_path / "missing")).scan()
+        assert_that(scan.files, is_(equal_to([])))
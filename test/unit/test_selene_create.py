@@ -1,6 +1,39 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from argparse import Namespace
+from concurrent.futures import Future
+
+import pytest
 from mock import patch
-from mock import Mock
-from mongo_python.mongo_create import _post_log_file
+from mock import AsyncMock, Mock
+from hamcrest import assert_that, equal_to, is_
+
+from mongo_python.mongo_create import (
+    ParallelTestPoster,
+    _async_post_tests,
+    _create_parse_pool,
+    _iter_output_tests,
+    _parse_output_files,
+    _post_log_file_for,
+    _post_log_file,
+    _post_tests,
+    async_post_results,
+    post_results,
+    run_cli,
+)
+from mongo_python.selene_server import SelenePostError, SeleneRequestError
+from mongo_python.test import TestBuilder as _TestBuilder
+from mongo_python.record import TestRecord as _TestRecord
+from mongo_python.upload_journal import (
+    CASE,
+    LOG,
+    RESULT,
+    OutputJournal,
+    UploadJournal,
+)
 import mongo_python.mongo_create
 
 
@@ -13,17 +46,540 @@ class TestUnitSuite:
 
 
 class TestPostLogFile:
-    @patch("selene_python.selene_create.LogFileBuilder")
+    @patch("mongo_python.mongo_create.LogFileBuilder")
     def test_gzip_is_called(self, mock_log_file_builder):
         mock_log = Mock()
         intermediate_mock = Mock()
         mock_log_file_builder.return_value.with_output_file.return_value = (
             intermediate_mock
         )
-        intermediate_mock.with_receiver.return_value.construct.return_value = mock_log
+        with_session = intermediate_mock.with_receiver.return_value.with_session
+        with_progress = with_session.return_value.with_progress
+        with_memo = with_progress.return_value.with_memo
+        with_memo.return_value.construct.return_value = mock_log
 
-        _post_log_file("FileName", "ReceiverURL", "LogFileName")
+        _post_log_file("FileName", "ReceiverURL", "LogFileName", gzip_workers=4)
 
         intermediate_mock.with_receiver.assert_called_once()
-        mock_log.gzip_log.assert_called_once_with("LogFileName")
+        mock_log.gzip_log.assert_called_once_with(
+            "LogFileName", compresslevel=9, workers=4
+        )
         mock_log.post_log_file.assert_called_once_with("LogFileName")
+
+
+def create_rows(count):
+    return [
+        _TestRecord("suite.test{0}".format(index), "pass", True, 1.0)
+        for index in range(count)
+    ]
+
+
+def create_server():
+    # Reports every bulk post as accepted, as a receiver that is up does.
+    def accept(tests, posted=None):
+        if posted is not None:
+            posted(tests)
+
+    server = Mock()
+    server.create_test_cases.side_effect = accept
+    server.create_test_results.side_effect = accept
+    return server
+
+
+def create_args(**kwargs):
+    values = {
+        "branch": "master",
+        "build": "1",
+        "stage": "One",
+        "batch_size": 2,
+        "gzip_level": 6,
+        "gzip_workers": 1,
+    }
+    values.update(kwargs)
+    return Namespace(**values)
+
+
+class TestPostTests:
+    @patch("mongo_python.mongo_create._LOGGER")
+    def test_posts_in_batches(self, _):
+        server = Mock()
+
+        _post_tests(server, create_rows(3), "log.html", create_args())
+
+        assert_that(server.create_test_cases.call_count, is_(equal_to(2)))
+        assert_that(server.create_test_results.call_count, is_(equal_to(2)))
+        cases = server.create_test_cases.call_args_list[0][0][0]
+        assert_that([test.name for test in cases], is_(["suite.test0", "suite.test1"]))
+        assert_that(cases[0].log, is_(equal_to("log.html")))
+        assert_that(cases[0].context, is_(cases[1].context))
+        assert_that(
+            cases[0].payload(),
+            is_(
+                equal_to(
+                    b'{"name":"suite.test0","result":"pass","branch_name":"master",'
+                    b'"build_name":"1","log":"log.html","stage":"One",'
+                    b'"critical":true,"test_duration":1.0}'
+                )
+            ),
+        )
+
+    @patch("mongo_python.mongo_create._LOGGER")
+    def test_resume_posts_only_the_remaining_work(self, _, tmp_path):
+        path = str(tmp_path / "journal.ndjson")
+        journal = UploadJournal(path, ["scope"])
+        output = OutputJournal(journal, "output.xml")
+        rows = output.keyed(create_rows(2))
+        output.record(CASE, rows)
+        output.record(RESULT, rows[:1])
+        journal.close()
+        journal = UploadJournal(path, ["scope"], resume=True)
+        server = create_server()
+
+        _post_tests(
+            server,
+            create_rows(3),
+            "log.html",
+            create_args(),
+            journal=OutputJournal(journal, "output.xml"),
+        )
+
+        cases = [
+            [test.name for test in call[0][0]]
+            for call in server.create_test_cases.call_args_list
+        ]
+        results = [
+            [test.name for test in call[0][0]]
+            for call in server.create_test_results.call_args_list
+        ]
+        assert_that(cases, is_(equal_to([["suite.test2"]])))
+        assert_that(results, is_(equal_to([["suite.test1"], ["suite.test2"]])))
+        assert_that(
+            journal.acknowledged(RESULT, ("output.xml", "suite.test2", 0)),
+            is_(True),
+        )
+        journal.close()
+
+    @patch("mongo_python.mongo_create._LOGGER")
+    def test_partial_batch_keeps_its_progress(self, _, tmp_path):
+        path = str(tmp_path / "journal.ndjson")
+        journal = UploadJournal(path, ["scope"])
+        server = create_server()
+
+        def accept_first(tests, posted=None):
+            posted(tests[:1])
+            raise SeleneRequestError("down")
+
+        server.create_test_results.side_effect = accept_first
+        with pytest.raises(SeleneRequestError):
+            _post_tests(
+                server,
+                create_rows(2),
+                "log.html",
+                create_args(),
+                journal=OutputJournal(journal, "output.xml"),
+            )
+        journal.close()
+        journal = UploadJournal(path, ["scope"], resume=True)
+        server = create_server()
+
+        _post_tests(
+            server,
+            create_rows(2),
+            "log.html",
+            create_args(),
+            journal=OutputJournal(journal, "output.xml"),
+        )
+
+        results = server.create_test_results.call_args[0][0]
+        assert_that([test.name for test in results], is_(equal_to(["suite.test1"])))
+        journal.close()
+
+    @patch("mongo_python.mongo_create._LOGGER")
+    def test_repeated_names_are_all_posted(self, _, tmp_path):
+        journal = UploadJournal(str(tmp_path / "journal.ndjson"), ["scope"])
+        server = Mock()
+
+        for output_file in ("one/output.xml", "two/output.xml"):
+            _post_tests(
+                server,
+                create_rows(1),
+                "log.html",
+                create_args(),
+                journal=OutputJournal(journal, output_file),
+            )
+
+        assert_that(server.create_test_cases.call_count, is_(equal_to(2)))
+        assert_that(server.create_test_results.call_count, is_(equal_to(2)))
+        journal.close()
+
+
+class FakeAsyncServer:
+    concurrency = 2
+
+    def __init__(self):
+        self.calls = []
+
+    async def create_test_cases(self, tests):
+        self.calls.append(("cases", [test.name for test in tests]))
+
+    async def create_test_results(self, tests):
+        self.calls.append(("results", [test.name for test in tests]))
+
+
+class TestAsyncPostTests:
+    @patch("mongo_python.mongo_create._LOGGER")
+    def test_posts_cases_before_results(self, _):
+        server = FakeAsyncServer()
+
+        asyncio.run(
+            _async_post_tests(server, create_rows(5), "log.html", create_args())
+        )
+
+        assert_that(
+            server.calls,
+            is_(
+                equal_to(
+                    [
+                        ("cases", ["suite.test{0}".format(i) for i in range(4)]),
+                        ("results", ["suite.test{0}".format(i) for i in range(4)]),
+                        ("cases", ["suite.test4"]),
+                        ("results", ["suite.test4"]),
+                    ]
+                )
+            ),
+        )
+
+
+class TestRunCli:
+    @pytest.mark.parametrize(
+        "option", [["--spool", "spool"], ["--jobs", "2"], ["--cache-file", "c.db"]]
+    )
+    @patch("mongo_python.mongo_create.async_post_results")
+    def test_rejects_options_the_async_client_ignores(self, mock_post, option):
+        argv = ["mongo-post", "results", "--concurrency", "4"] + option
+
+        with patch("sys.argv", argv), pytest.raises(SystemExit):
+            run_cli()
+
+        mock_post.assert_not_called()
+
+
+class TestAsyncPostResults:
+    @patch("mongo_python.mongo_create._create_mongodb")
+    @patch("mongo_python.mongo_create.files_collection")
+    @patch("mongo_python.mongo_create.files")
+    @patch("mongo_python.mongo_create._scan_results")
+    @patch("mongo_python.mongo_create._post_build_to_mongo")
+    @patch("mongo_python.mongo_create._create_build")
+    @patch("mongo_python.mongo_create.create_session")
+    @patch("mongo_python.mongo_create.AsyncSeleneServer")
+    def test_uploads_to_gridfs_before_parsing(self, mock_server, *_):
+        mock_server.return_value = AsyncMock()
+        steps = []
+
+        def upload(*_):
+            # A slow upload would be overtaken by parsing if they overlapped.
+            time.sleep(0.05)
+            steps.append("upload")
+
+        async def parse(*_):
+            steps.append("parse")
+
+        with patch(
+            "mongo_python.mongo_create.upload_files_in_directory", upload
+        ), patch("mongo_python.mongo_create._async_parse_output_files", parse):
+            asyncio.run(async_post_results(create_run_args()))
+
+        assert_that(steps, is_(equal_to(["upload", "parse"])))
+
+
+class TestPostResults:
+    @patch("mongo_python.mongo_create._LOGGER")
+    @patch("mongo_python.mongo_create.ParallelTestPoster")
+    @patch("mongo_python.mongo_create._post_build")
+    @patch("mongo_python.mongo_create.SeleneServerBuilder")
+    def test_poster_stops_before_the_server_closes(
+        self, mock_builder, mock_post_build, mock_poster, _
+    ):
+        builder = mock_builder.return_value
+        for step in (
+            "with_url",
+            "with_pool_size",
+            "with_max_retries",
+            "with_batch_size",
+            "with_batch_bytes",
+            "with_lookup_cache",
+        ):
+            getattr(builder, step).return_value = builder
+        server = builder.construct.return_value
+        manager = Mock()
+        manager.attach_mock(mock_poster.return_value.shutdown, "shutdown")
+        manager.attach_mock(server.close, "close")
+        mock_post_build.side_effect = SeleneRequestError("down")
+
+        with pytest.raises(SeleneRequestError):
+            post_results(
+                create_run_args(jobs=2, spool=None, cache_file=None, no_cache=True)
+            )
+
+        calls = [call[0] for call in manager.mock_calls]
+        assert_that(calls, is_(equal_to(["shutdown", "close"])))
+
+
+def create_run_args(**kwargs):
+    values = dict(
+        receiver="http://selene",
+        concurrency=2,
+        batch_size=2,
+        batch_bytes=1024,
+        pool_size=1,
+        log_workers=None,
+        max_retries=0,
+        path="results",
+        branch="master",
+        build="1",
+        upload_workers=1,
+        sync=None,
+    )
+    values.update(kwargs)
+    return Namespace(**values)
+
+
+def create_test(name):
+    return _TestBuilder().with_name(name).with_result("pass").construct()
+
+
+class TestParallelTestPoster:
+    def test_posts_case_before_result(self):
+        server = Mock()
+        poster = ParallelTestPoster(server, 4)
+
+        for index in range(10):
+            poster.submit(create_test("suite.test{0}".format(index)))
+        poster.finish()
+
+        calls = [(call[0], call[1][0].name) for call in server.method_calls]
+        assert_that(len(calls), is_(equal_to(20)))
+        for index in range(10):
+            name = "suite.test{0}".format(index)
+            case = calls.index(("create_test_case", name))
+            result = calls.index(("create_test_result", name))
+            assert_that(case < result, is_(True))
+
+    def test_errors_are_aggregated(self):
+        server = Mock()
+
+        def create_test_case(test):
+            if test.name.endswith("1"):
+                raise SeleneRequestError("refused")
+
+        server.create_test_case.side_effect = create_test_case
+        poster = ParallelTestPoster(server, 2)
+
+        for index in range(3):
+            poster.submit(create_test("suite.test{0}".format(index)))
+        with pytest.raises(SelenePostError, match="1 test") as error:
+            poster.finish()
+
+        assert_that(error.value.errors[0][0], is_(equal_to("suite.test1")))
+        assert_that(server.create_test_result.call_count, is_(equal_to(2)))
+
+    def test_shutdown_cancels_pending_tests(self):
+        server = Mock()
+        started = threading.Event()
+        release = threading.Event()
+
+        def create_test_case(_):
+            started.set()
+            release.wait(5)
+
+        server.create_test_case.side_effect = create_test_case
+        poster = ParallelTestPoster(server, 1)
+
+        for index in range(3):
+            poster.submit(create_test("suite.test{0}".format(index)))
+        started.wait(5)
+        threading.Timer(0.05, release.set).start()
+        poster.shutdown()
+
+        # Only the test in flight finished, and it did so before shutdown returned.
+        assert_that(server.create_test_case.call_count, is_(equal_to(1)))
+        assert_that(server.create_test_result.call_count, is_(equal_to(1)))
+
+    @patch("mongo_python.mongo_create._LOGGER")
+    def test_post_tests_writes_to_mongodb(self, _):
+        server = Mock()
+        mongodb = Mock()
+
+        _post_tests(server, create_rows(3), "log.html", create_args(), None, mongodb)
+
+        batches = [call[0][0] for call in mongodb.post_tests.call_args_list]
+        assert_that([len(batch) for batch in batches], is_(equal_to([2, 1])))
+        assert_that(server.create_test_results.call_count, is_(equal_to(2)))
+
+    @patch("mongo_python.mongo_create._LOGGER")
+    def test_post_tests_submits_to_poster(self, _):
+        server = Mock()
+        poster = Mock()
+
+        _post_tests(server, create_rows(3), "log.html", create_args(), poster)
+
+        assert_that(poster.submit.call_count, is_(equal_to(3)))
+        server.create_test_cases.assert_not_called()
+
+
+DATA_FILES = [
+    "test/data/output.xml",
+    "test/data/TESTS-project.xml",
+    "test/data/pytest_xUnit.xml",
+    "test/data/gtest_xUnit.xml",
+]
+
+
+class TestIterOutputTests:
+    @pytest.mark.parametrize("workers", [None, 2])
+    def test_matches_expected_in_order(self, workers):
+        result = [
+            (filename, [test.to_json() for test in tests])
+            for filename, tests in _iter_output_tests(DATA_FILES, workers)
+        ]
+
+        expected = []
+        for filename in DATA_FILES:
+            with open(filename + ".json") as f:
+                expected.append((filename, json.loads(f.read())))
+        assert_that(result, is_(equal_to(expected)))
+
+    def test_pool_does_not_fork(self):
+        pool = _create_parse_pool(2)
+        try:
+            # pylint: disable=protected-access
+            start_method = pool._mp_context.get_start_method()
+        finally:
+            pool.shutdown()
+
+        assert_that(start_method in ("forkserver", "spawn"), is_(True))
+
+
+class TestParseOutputFiles:
+    @patch("mongo_python.mongo_create._LOGGER")
+    @patch("mongo_python.mongo_create._post_log_file_for")
+    @pytest.mark.parametrize("log_workers", [None, 2])
+    def test_tests_get_their_log(self, mock_post_log, _, log_workers, tmp_path):
+        logfile = tmp_path / "log.html"
+        logfile.write_bytes(b"I am a log file")
+        mock_post_log.return_value = "stored.html"
+        scan = Mock()
+        scan.outputs.return_value = DATA_FILES[:2]
+        server = Mock()
+        args = create_args(
+            logfile=str(logfile),
+            parse_workers=None,
+            log_workers=log_workers,
+            log_bytes_in_flight=1024,
+        )
+
+        _parse_output_files(server, scan, args)
+
+        logs = {
+            test.log
+            for call in server.create_test_results.call_args_list
+            for test in call[0][0]
+        }
+        assert_that(logs, is_({"stored.html"}))
+        # The pool uploads a log shared by several outputs only once.
+        assert_that(mock_post_log.call_count, is_(equal_to(1 if log_workers else 2)))
+
+    @patch("mongo_python.mongo_create._LOGGER")
+    @patch("mongo_python.mongo_create._submit_log_uploads")
+    @patch("mongo_python.mongo_create._iter_output_tests")
+    def test_parses_while_log_uploads(self, mock_iter, mock_submit, _):
+        events = []
+        upload = Future()
+
+        def records():
+            events.append("parsed")
+            yield from create_rows(2)
+
+        def store():
+            events.append("stored")
+            upload.set_result("stored.html")
+
+        mock_iter.return_value = iter([("output.xml", records())])
+        mock_submit.return_value = {"output.xml": upload}
+        server = Mock()
+        timer = threading.Timer(0.2, store)
+        timer.start()
+
+        _parse_output_files(
+            server, Mock(), create_args(parse_workers=None, log_workers=None)
+        )
+
+        timer.join()
+        assert_that(events, is_(equal_to(["parsed", "stored"])))
+        tests = server.create_test_results.call_args[0][0]
+        assert_that(tests[0].log, is_(equal_to("stored.html")))
+
+
+class TestPostLogFileFor:
+    @patch("mongo_python.mongo_create._post_log_file")
+    def test_skips_outputs_without_log(self, mock_post):
+        scan = Mock()
+        scan.log_for.return_value = None
+
+        log_file = _post_log_file_for(
+            "output.xml", scan, create_args(logfile=None), None
+        )
+
+        assert_that(log_file, is_(None))
+        mock_post.assert_not_called()
+
+    @patch("mongo_python.mongo_create._post_log_file")
+    def test_uses_paired_log(self, mock_post):
+        scan = Mock()
+        scan.log_for.return_value = "shard/log.html"
+        args = create_args(logfile=None, receiver="http://receiver")
+
+        _post_log_file_for("shard/output.xml", scan, args, "session")
+
+        mock_post.assert_called_once_with(
+            "shard/output.xml",
+            "http://receiver",
+            "shard/log.html",
+            "session",
+            compresslevel=6,
+            gzip_workers=1,
+        )
+
+    @patch("mongo_python.mongo_create._post_log_file")
+    def test_journal_skips_posted_log(self, mock_post, tmp_path):
+        scan = Mock()
+        scan.log_for.return_value = "shard/log.html"
+        args = create_args(logfile=None, receiver="http://receiver")
+        mock_post.return_value = "stored.html"
+        path = str(tmp_path / "journal.ndjson")
+        journal = UploadJournal(path, ["scope"])
+        first = _post_log_file_for("shard/output.xml", scan, args, None, journal)
+        journal.close()
+        journal = UploadJournal(path, ["scope"], resume=True)
+
+        second = _post_log_file_for("shard/output.xml", scan, args, None, journal)
+
+        assert_that((first, second), is_(("stored.html", "stored.html")))
+        mock_post.assert_called_once()
+        journal.close()
+
+    @patch("mongo_python.mongo_create._post_log_file")
+    def test_journal_skips_missing_stored_name(self, mock_post, tmp_path):
+        scan = Mock()
+        scan.log_for.return_value = "shard/log.html"
+        args = create_args(logfile=None, receiver="http://receiver")
+        mock_post.return_value = None
+        journal = UploadJournal(str(tmp_path / "journal.ndjson"), ["scope"])
+
+        _post_log_file_for("shard/output.xml", scan, args, None, journal)
+
+        assert_that(
+            journal.acknowledged(LOG, os.path.abspath("shard/log.html")), is_(False)
+        )
+        journal.close()
@@ -0,0 +1,160 @@
+import pytest
+from hamcrest import assert_that, equal_to, is_
+from mock import MagicMock, patch
+from pymongo import UpdateOne
+
+import mongo_python.selene_mongodb
+from mongo_python.selene_mongodb import (
+    SeleneMongoDB,
+    is_build_collection,
+    parse_write_concern,
+)
+from mongo_python.test import TestBuilder as _TestBuilder
+
+
+@pytest.fixture(autouse=True, name="reset")
+def fixture_reset():
+    # pylint: disable=protected-access
+    mongo_python.selene_mongodb._ENSURED.clear()
+
+
+def create_mongodb(indexes=None, **kwargs):
+    client = MagicMock()
+    mongodb = SeleneMongoDB("branch", "build", client, **kwargs)
+    mongodb.collection.index_information.return_value = indexes or {
+        "_id_": {"key": [("_id", 1)]}
+    }
+    return mongodb
+
+
+def create_tests(count):
+    return [
+        _TestBuilder()
+        .with_name("suite.test{0}".format(index))
+        .with_result("pass")
+        .with_branch_name("branch")
+        .with_build_name("build")
+        .with_stage("One")
+        .with_critical(True)
+        .construct()
+        for index in range(count)
+    ]
+
+
+class TestSeleneMongoDB:
+    def test_post_build(self):
+        client = MagicMock()
+
+        mongodb = SeleneMongoDB("branch", "build", client)
+        mongodb.post_build({"build": "build"})
+
+        client.__getitem__.assert_called_once_with("branch")
+        mongodb.collection.insert_one.assert_called_once_with({"build": "build"})
+
+    @patch("pymongo.MongoClient")
+    def test_uses_shared_client(self, mock_client):
+        mongodb = SeleneMongoDB("branch", "build")
+
+        assert_that(mongodb.client, is_(mock_client.return_value))
+
+    def test_missing_indexes(self):
+        mongodb = create_mongodb(
+            {
+                "_id_": {"key": [("_id", 1)]},
+                "by_name": {"key": [("name", 1)]},
+                "result_1": {"key": [("result", 1)]},
+            }
+        )
+
+        assert_that(
+            mongodb.missing_indexes(),
+            is_(equal_to(["stage_1", "critical_1", "test_key"])),
+        )
+
+    def test_ensure_indexes_builds_missing_once(self):
+        mongodb = create_mongodb()
+
+        built = mongodb.ensure_indexes()
+        again = mongodb.ensure_indexes()
+
+        assert_that(
+            built,
+            is_(equal_to(["name_1", "result_1", "stage_1", "critical_1", "test_key"])),
+        )
+        assert_that(again, is_(equal_to([])))
+        models = mongodb.collection.create_indexes.call_args[0][0]
+        test_key = models[-1].document
+        assert_that(
+            list(test_key["key"].items()),
+            is_(equal_to([("branch", 1), ("build", 1), ("stage", 1), ("name", 1)])),
+        )
+        assert_that(test_key["unique"], is_(True))
+        assert_that(
+            test_key["partialFilterExpression"], is_({"name": {"$exists": True}})
+        )
+        mongodb.collection.index_information.assert_called_once()
+
+    def test_post_tests_upserts_in_batches(self):
+        mongodb = create_mongodb(batch_size=2)
+
+        written = mongodb.post_tests(create_tests(5))
+
+        calls = mongodb.collection.bulk_write.call_args_list
+        assert_that(written, is_(equal_to(5)))
+        assert_that([len(call[0][0]) for call in calls], is_(equal_to([2, 2, 1])))
+        assert_that({call[1]["ordered"] for call in calls}, is_(equal_to({False})))
+        assert_that(
+            calls[0][0][0][0],
+            is_(
+                equal_to(
+                    UpdateOne(
+                        {
+                            "branch": "branch",
+                            "build": "build",
+                            "stage": "One",
+                            "name": "suite.test0",
+                        },
+                        {
+                            "$set": {
+                                "name": "suite.test0",
+                                "result": "pass",
+                                "stage": "One",
+                                "critical": True,
+                                "branch": "branch",
+                                "build": "build",
+                            }
+                        },
+                        upsert=True,
+                    )
+                )
+            ),
+        )
+
+    def test_post_tests_with_write_concern(self):
+        mongodb = create_mongodb(write_concern={"w": "majority"})
+
+        mongodb.post_tests(create_tests(1))
+
+        options = mongodb.collection.with_options.call_args[1]
+        assert_that(options["write_concern"].document, is_({"w": "majority"}))
+        mongodb.collection.with_options.return_value.bulk_write.assert_called_once()
+
+
+@pytest.mark.parametrize(
+    "value,expected", [(None, None), ("0", {"w": 0}), ("majority", {"w": "majority"})]
+)
+def test_parse_write_concern(value, expected):
+    assert_that(parse_write_concern(value), is_(equal_to(expected)))
+
+
+@pytest.mark.parametrize(
+    "name,expected",
+    [
+        ("1234", True),
+        ("1234.files", False),
+        ("1234.chunks", False),
+        ("system.views", False),
+    ],
+)
+def test_is_build_collection(name, expected):
+    assert_that(is_build_collection(name), is_(expected))
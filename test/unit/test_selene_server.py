@@ -1,17 +1,21 @@
+import threading
+
 from mock import patch, Mock
 import pytest
-from requests import RequestException
+from requests import HTTPError, RequestException
 from hamcrest import assert_that, equal_to, instance_of, is_, is_not
 
 from mongo_python.test import TestBuilder as _TestBuilder
 from mongo_python.build import BuildBuilder, BuildNotFoundError
 from mongo_python.branch import BranchBuilder, BranchNotFoundError
 from mongo_python.selene_server import (
+    SelenePostError,
     SeleneRequestError,
     SeleneServer,
     SeleneServerBuilder,
 )
-from mongo_python.server import Server
+from mongo_python.lookup_cache import LookupCache
+from mongo_python.server import Server, create_session
 
 
 def create_selene_server():
@@ -88,6 +92,16 @@ class TestSeleneServerBuilder:
         assert_that(selene_server, is_(instance_of(SeleneServer)))
         assert_that(selene_server.url, is_(equal_to("http://skydocker.adtran.com")))
 
+    def test_create_server_with_session(self):
+        session = create_session()
+        selene_server = (
+            SeleneServerBuilder()
+            .with_url("http://skydocker.adtran.com")
+            .with_session(session)
+            .construct()
+        )
+        assert_that(selene_server.session, is_(session))
+
 
 class TestSeleneServer:
     def test_get_builds(self):
@@ -117,12 +131,21 @@ class TestSeleneServer:
 
         with patch.object(
             selene_server,
-            "make_get_request",
-            return_value=mock_builds_response.response,
-        ):
+            "iter_get_request",
+            return_value=iter(mock_builds_response.response),
+        ) as mock_request:
             build_id = selene_server.get_build_id(build)
 
         assert_that(build_id, is_(equal_to(4)))
+        mock_request.assert_called_once_with(
+            "http://skydocker.adtran.com/api/build",
+            {
+                "name": "build-name",
+                "branch_name": "branch-name",
+                "limit": 100,
+                "offset": 0,
+            },
+        )
 
     def test_get_build_id_build_not_found(self):
         selene_server = create_selene_server()
@@ -136,12 +159,204 @@ class TestSeleneServer:
 
         with patch.object(
             selene_server,
-            "make_get_request",
-            return_value=mock_builds_response.response,
+            "iter_get_request",
+            return_value=iter(mock_builds_response.response),
         ):
             with pytest.raises(BuildNotFoundError):
                 selene_server.get_build_id(build)
 
+    def test_get_build_id_request_error(self):
+        selene_server = create_selene_server()
+        with patch.object(selene_server, "iter_get_request") as mock_request:
+            mock_request.side_effect = RequestException()
+            with pytest.raises(SeleneRequestError):
+                selene_server.get_build_id(create_build())
+
+    @pytest.mark.parametrize(
+        "response", [[{"error": "Internal error"}], [["build-name"]], [None]]
+    )
+    def test_get_build_id_unexpected_response(self, response):
+        selene_server = create_selene_server()
+        with patch.object(
+            selene_server, "iter_get_request", return_value=iter(response)
+        ):
+            with pytest.raises(SeleneRequestError):
+                selene_server.get_build_id(create_build())
+
+    def test_get_build_id_pages_through_results(self):
+        selene_server = create_selene_server()
+        build = create_build()
+        first_page = [
+            {"build_id": index, "name": "other", "branch_name": "branch-name"}
+            for index in range(100)
+        ]
+        second_page = create_mock_builds_response().response
+        offsets = []
+
+        def iter_get_request(_, params):
+            offsets.append(params["offset"])
+            return iter(first_page if params["offset"] == 0 else second_page)
+
+        with patch.object(
+            selene_server, "iter_get_request", side_effect=iter_get_request
+        ):
+            build_id = selene_server.get_build_id(build)
+
+        assert_that(build_id, is_(equal_to(4)))
+        assert_that(offsets, is_(equal_to([0, 100])))
+
+    def test_get_build_id_stops_when_offset_is_ignored(self):
+        selene_server = create_selene_server()
+        page = [
+            {"build_id": index, "name": "other", "branch_name": "branch-name"}
+            for index in range(100)
+        ]
+
+        with patch.object(
+            selene_server, "iter_get_request", side_effect=lambda *_: iter(page)
+        ) as mock_request:
+            with pytest.raises(BuildNotFoundError):
+                selene_server.get_build_id(create_build())
+
+        assert_that(mock_request.call_count, is_(equal_to(2)))
+
+    def test_get_build_id_is_cached(self):
+        selene_server = create_selene_server()
+        mock_builds_response = create_mock_builds_response()
+
+        with patch.object(
+            selene_server,
+            "iter_get_request",
+            side_effect=lambda *_: iter(mock_builds_response.response),
+        ) as mock_request:
+            selene_server.get_build_id(create_build())
+            build_id = selene_server.get_build_id(create_build())
+
+        assert_that(build_id, is_(equal_to(4)))
+        mock_request.assert_called_once()
+
+    def test_different_builds_are_looked_up_concurrently(self):
+        selene_server = create_selene_server()
+        mock_builds_response = create_mock_builds_response()
+        # Both lookups must be in flight at once to pass the barrier.
+        barrier = threading.Barrier(2, timeout=5)
+        build_ids = {}
+
+        def iter_get_request(*_):
+            barrier.wait()
+            return iter(mock_builds_response.response)
+
+        def lookup(name):
+            build = (
+                BuildBuilder()
+                .with_name(name)
+                .with_branch_name("branch-name")
+                .construct()
+            )
+            build_ids[name] = selene_server.get_build_id(build)
+
+        with patch.object(
+            selene_server, "iter_get_request", side_effect=iter_get_request
+        ):
+            threads = [
+                threading.Thread(target=lookup, args=(name,))
+                for name in ("product", "build-name")
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        assert_that(build_ids, is_(equal_to({"product": 9000, "build-name": 4})))
+
+    def test_get_build_id_from_lookup_cache(self, tmp_path):
+        cache = LookupCache(str(tmp_path / "selene.db"), "http://skydocker.adtran.com")
+        cache.put_build_id("branch-name", "build-name", 4)
+        selene_server = (
+            SeleneServerBuilder()
+            .with_url("http://skydocker.adtran.com")
+            .with_lookup_cache(cache)
+            .construct()
+        )
+
+        with patch.object(selene_server, "iter_get_request") as mock_request:
+            build_id = selene_server.get_build_id(create_build())
+
+        assert_that(build_id, is_(equal_to(4)))
+        mock_request.assert_not_called()
+
+    def test_get_branch_id_fills_lookup_cache(self, tmp_path):
+        cache = LookupCache(str(tmp_path / "selene.db"), "http://skydocker.adtran.com")
+        selene_server = (
+            SeleneServerBuilder()
+            .with_url("http://skydocker.adtran.com")
+            .with_lookup_cache(cache)
+            .construct()
+        )
+
+        with patch.object(
+            selene_server,
+            "make_get_request",
+            return_value=create_mock_branches_response().response,
+        ):
+            selene_server.get_branch_id(
+                BranchBuilder().with_name("branch-name").construct()
+            )
+
+        assert_that(cache.get_branch_id("branch-name"), is_(equal_to(9000)))
+
+    def test_create_test_cases_skips_known_names(self, tmp_path):
+        cache = LookupCache(str(tmp_path / "selene.db"), "http://skydocker.adtran.com")
+        cache.add_test_cases(["suite.test0"])
+        selene_server = (
+            SeleneServerBuilder()
+            .with_url("http://skydocker.adtran.com")
+            .with_lookup_cache(cache)
+            .construct()
+        )
+
+        with patch.object(selene_server, "send_data_to_api") as mock_request:
+            selene_server.create_test_cases(create_tests(2))
+            selene_server.create_test_cases(create_tests(2))
+
+        mock_request.assert_called_once_with(
+            "post",
+            "http://skydocker.adtran.com/api/testcase/bulk",
+            b'[{"name":"suite.test1","result":"pass","build_name":"bar"}]',
+        )
+
+    def test_create_build_invalidates_cached_id(self):
+        selene_server = create_selene_server()
+        build = create_build()
+        selene_server.id_cache.put(("build", "branch-name", "build-name"), 4)
+        with patch.object(selene_server, "get_branch_id", return_value=1):
+            with patch.object(selene_server, "send_to_api", return_value=Mock()):
+                selene_server.create_build(build)
+
+        assert_that(
+            selene_server.id_cache.get(("build", "branch-name", "build-name")),
+            is_(None),
+        )
+
+    def test_get_branch_id_is_cached(self):
+        selene_server = create_selene_server()
+        mock_branches_response = create_mock_branches_response()
+
+        with patch.object(
+            selene_server,
+            "make_get_request",
+            return_value=mock_branches_response.response,
+        ) as mock_request:
+            selene_server.get_branch_id(
+                BranchBuilder().with_name("branch-name").construct()
+            )
+            branch_id = selene_server.get_branch_id(
+                BranchBuilder().with_name("super-branch-name").construct()
+            )
+
+        assert_that(branch_id, is_(equal_to(9001)))
+        mock_request.assert_called_once()
+
     def test_create_build(self):
         selene_server = create_selene_server()
         build = create_build()
@@ -245,6 +460,16 @@ class TestSeleneServer:
 
         assert_that(branch_id, is_(equal_to(9001)))
 
+    def test_get_branch_id_unexpected_response(self):
+        selene_server = create_selene_server()
+        branch = BranchBuilder().with_name("super-branch-name").construct()
+
+        with patch.object(
+            selene_server, "make_get_request", return_value={"error": "Forbidden"}
+        ):
+            with pytest.raises(SeleneRequestError):
+                selene_server.get_branch_id(branch)
+
     def test_get_branch_id_branch_not_found(self):
         selene_server = create_selene_server()
         mock_branches_response = create_mock_branches_response()
@@ -295,22 +520,16 @@ class TestSeleneServer:
         )
 
         with patch.object(
-            selene_server, "send_to_api", return_value=Mock()
+            selene_server, "send_data_to_api", return_value=Mock()
         ) as mock_request:
             selene_server.create_test_case(test)
 
         mock_request.assert_called_once_with(
             "post",
             "http://skydocker.adtran.com/api/testcase",
-            {
-                "name": "suite.test",
-                "result": "pass",
-                "build_name": "bar",
-                "log": "log_file.log",
-                "stage": "One",
-                "critical": True,
-                "test_duration": 1.3,
-            },
+            b'{"name":"suite.test","result":"pass","build_name":"bar",'
+            b'"log":"log_file.log","stage":"One","critical":true,'
+            b'"test_duration":1.3}',
         )
 
     def test_create_test_case_request_error(self):
@@ -327,7 +546,7 @@ class TestSeleneServer:
             .construct()
         )
 
-        with patch.object(selene_server, "_make_post_request") as mock_request:
+        with patch.object(selene_server, "send_data_to_api") as mock_request:
             mock_request.side_effect = RequestException()
             with pytest.raises(SeleneRequestError):
                 selene_server.create_test_case(test)
@@ -347,22 +566,16 @@ class TestSeleneServer:
         )
 
         with patch.object(
-            selene_server, "send_to_api", return_value=Mock()
+            selene_server, "send_data_to_api", return_value=Mock()
         ) as mock_request:
             selene_server.create_test_result(test)
 
         mock_request.assert_called_once_with(
             "post",
             "http://skydocker.adtran.com/api/test-result",
-            {
-                "name": "suite.test",
-                "result": "pass",
-                "build_name": "bar",
-                "log": "log_file.log",
-                "stage": "One",
-                "critical": True,
-                "test_duration": 1.3,
-            },
+            b'{"name":"suite.test","result":"pass","build_name":"bar",'
+            b'"log":"log_file.log","stage":"One","critical":true,'
+            b'"test_duration":1.3}',
         )
 
     def test_create_test_result_request_error(self):
@@ -379,15 +592,133 @@ class TestSeleneServer:
             .construct()
         )
 
-        with patch.object(selene_server, "_make_post_request") as mock_request:
+        with patch.object(selene_server, "send_data_to_api") as mock_request:
             mock_request.side_effect = RequestException()
             with pytest.raises(SeleneRequestError):
                 selene_server.create_test_result(test)
 
 
+def create_tests(count):
+    return [
+        _TestBuilder()
+        .with_name("suite.test{0}".format(index))
+        .with_result("pass")
+        .with_build_name("bar")
+        .construct()
+        for index in range(count)
+    ]
+
+
+def create_http_error(status_code):
+    response = Mock()
+    response.status_code = status_code
+    return HTTPError(response=response)
+
+
+class TestSeleneServerBulk:
+    def test_create_test_cases(self):
+        selene_server = create_selene_server()
+        with patch.object(
+            selene_server, "send_data_to_api", return_value=Mock()
+        ) as mock_request:
+            selene_server.create_test_cases(create_tests(2))
+
+        mock_request.assert_called_once_with(
+            "post",
+            "http://skydocker.adtran.com/api/testcase/bulk",
+            b'[{"name":"suite.test0","result":"pass","build_name":"bar"},'
+            b'{"name":"suite.test1","result":"pass","build_name":"bar"}]',
+        )
+
+    def test_create_test_results(self):
+        selene_server = create_selene_server()
+        with patch.object(
+            selene_server, "send_data_to_api", return_value=Mock()
+        ) as mock_request:
+            selene_server.create_test_results(create_tests(1))
+
+        mock_request.assert_called_once_with(
+            "post",
+            "http://skydocker.adtran.com/api/test-result/bulk",
+            b'[{"name":"suite.test0","result":"pass","build_name":"bar"}]',
+        )
+
+    def test_chunk_by_count(self):
+        selene_server = (
+            SeleneServerBuilder()
+            .with_url("http://skydocker.adtran.com")
+            .with_batch_size(2)
+            .construct()
+        )
+        with patch.object(selene_server, "send_data_to_api") as mock_request:
+            selene_server.create_test_cases(create_tests(5))
+
+        assert_that(mock_request.call_count, is_(equal_to(3)))
+
+    def test_chunk_by_bytes(self):
+        selene_server = (
+            SeleneServerBuilder()
+            .with_url("http://skydocker.adtran.com")
+            .with_batch_bytes(130)
+            .construct()
+        )
+        with patch.object(selene_server, "send_data_to_api") as mock_request:
+            selene_server.create_test_cases(create_tests(4))
+
+        assert_that(mock_request.call_count, is_(equal_to(2)))
+        for call in mock_request.call_args_list:
+            assert_that(len(call[0][2]) <= 130, is_(True))
+
+    def test_fallback_when_bulk_endpoint_missing(self):
+        selene_server = create_selene_server()
+        with patch.object(selene_server, "send_data_to_api") as mock_bulk:
+            mock_bulk.side_effect = create_http_error(404)
+            with patch.object(selene_server, "create_test_case") as mock_create:
+                selene_server.create_test_cases(create_tests(3))
+                selene_server.create_test_cases(create_tests(2))
+
+        mock_bulk.assert_called_once()
+        assert_that(mock_create.call_count, is_(equal_to(5)))
+
+    def test_posted_reports_accepted_requests(self):
+        selene_server = (
+            SeleneServerBuilder()
+            .with_url("http://skydocker.adtran.com")
+            .with_batch_size(2)
+            .construct()
+        )
+        posted = []
+        with patch.object(selene_server, "send_data_to_api") as mock_request:
+            mock_request.side_effect = [Mock(), create_http_error(500)]
+            with pytest.raises(SeleneRequestError):
+                selene_server.create_test_results(create_tests(4), posted.extend)
+
+        assert_that(
+            [test.name for test in posted],
+            is_(equal_to(["suite.test0", "suite.test1"])),
+        )
+
+    def test_bulk_request_error(self):
+        selene_server = create_selene_server()
+        with patch.object(selene_server, "send_data_to_api") as mock_bulk:
+            mock_bulk.side_effect = create_http_error(500)
+            with pytest.raises(SeleneRequestError):
+                selene_server.create_test_results(create_tests(1))
+
+
 # pylint: disable=too-few-public-methods
 class TestSeleneRequestError:
     def test_throw_error(self):
         expected = "Error: Get Error"
         with pytest.raises(SeleneRequestError, match=expected):
             raise SeleneRequestError("Get Error")
+
+
+# pylint: disable=too-few-public-methods
+class TestSelenePostError:
+    def test_throw_error(self):
+        errors = [("suite.test{0}".format(i), "refused") for i in range(7)]
+        expected = "Error: 7 test\\(s\\) failed to post: suite.test0: refused;"
+        with pytest.raises(SelenePostError, match=expected) as error:
+            raise SelenePostError(errors)
+        assert_that(str(error.value).endswith("; ..."), is_(True))
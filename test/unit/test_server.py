@@ -1,9 +1,16 @@
+import json
+
 import pytest
 import requests
 import httpretty
 from hamcrest import assert_that, equal_to, instance_of, is_
 
-from mongo_python.server import Server, ServerBuilder
+from mongo_python.server import (
+    Server,
+    ServerBuilder,
+    create_session,
+    iter_json_array,
+)
 
 
 def create_server():
@@ -71,3 +78,88 @@ class TestServer:
         assert_that(response.status_code, is_(equal_to(200)))
         assert_that(response.json(), is_(equal_to({"name": "foobar"})))
         httpretty.disable()
+
+    def test_requests_share_session(self):
+        session = create_session()
+        server = (
+            ServerBuilder()
+            .with_url("http://skydocker.adtran.com")
+            .with_session(session)
+            .construct()
+        )
+        assert_that(server.session, is_(session))
+
+    def test_builder_configures_pool(self):
+        server = (
+            ServerBuilder()
+            .with_url("http://skydocker.adtran.com")
+            .with_pool_size(32)
+            .with_max_retries(5)
+            .construct()
+        )
+        adapter = server.session.get_adapter("http://skydocker.adtran.com")
+        # pylint: disable=protected-access
+        assert_that(adapter._pool_maxsize, is_(equal_to(32)))
+        assert_that(adapter.max_retries.total, is_(equal_to(5)))
+
+    def test_connection_stats(self):
+        server = create_server()
+        httpretty.enable()
+        httpretty.register_uri(
+            httpretty.GET,
+            "http://skydocker.adtran.com/api/build",
+            body='{"name": "foobar"}',
+        )
+        server.make_get_request("http://skydocker.adtran.com/api/build")
+        server.make_get_request("http://skydocker.adtran.com/api/build")
+        stats = server.connection_stats()
+        httpretty.disable()
+        assert_that(stats["requests"], is_(equal_to(2)))
+        assert_that(stats["connections"], is_(equal_to(1)))
+        assert_that(stats["reused"], is_(equal_to(1)))
+
+    def test_iter_get_request(self):
+        server = create_server()
+        httpretty.enable()
+        httpretty.register_uri(
+            httpretty.GET,
+            "http://skydocker.adtran.com/api/build",
+            body='[{"name": "foo"}, {"name": "bar"}]',
+        )
+        items = list(
+            server.iter_get_request(
+                "http://skydocker.adtran.com/api/build", {"name": "foo"}
+            )
+        )
+        query = httpretty.last_request().querystring
+        httpretty.disable()
+        assert_that(items, is_(equal_to([{"name": "foo"}, {"name": "bar"}])))
+        assert_that(query, is_(equal_to({"name": ["foo"]})))
+
+
+class TestIterJsonArray:
+    documents = [
+        [],
+        [1, -2.5e10, True, None, "a,]b"],
+        [{"name": "é" * 3, "items": [1, {"nested": False}]}] * 5,
+    ]
+
+    @pytest.mark.parametrize("document", documents)
+    @pytest.mark.parametrize("chunk_size", [1, 3, 1024])
+    def test_decode_in_chunks(self, document, chunk_size):
+        data = json.dumps(document, indent=2).encode("utf-8")
+        chunks = [data[i : i + chunk_size] for i in range(0, len(data), chunk_size)]
+        assert_that(list(iter_json_array(chunks)), is_(equal_to(document)))
+
+    def test_stops_reading_after_consumer_stops(self):
+        chunks = iter([b'[{"id": 1},', b' {"id": 2},', b" {broken"])
+        items = iter_json_array(chunks)
+        assert_that(next(items), is_(equal_to({"id": 1})))
+        assert_that(next(items), is_(equal_to({"id": 2})))
+
+    def test_not_an_array(self):
+        assert_that(list(iter_json_array([b'{"a"', b": 1}"])), is_([{"a": 1}]))
+
+    def test_truncated_array(self):
+        with pytest.raises(ValueError):
+            list(iter_json_array([b'[{"id": 1}, {"id"']))
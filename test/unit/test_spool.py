@@ -0,0 +1,224 @@
+import gzip
+import json
+import os
+
+import pytest
+from hamcrest import assert_that, equal_to, is_
+from mock import Mock, patch
+
+from mongo_python.build import BuildBuilder
+from mongo_python.log_file import LogUploadError
+from mongo_python.record import TestContext as _TestContext
+from mongo_python.record import TestRecord as _TestRecord
+from mongo_python.selene_server import SeleneRequestError
+from mongo_python.spool import ResultSpool, SpoolingServer, SpoolReplay, segments
+
+
+def create_records(*names, log="log.html"):
+    context = _TestContext("master", "1", "One", log)
+    return [_TestRecord(name, "pass", True, 0.5).attach(context) for name in names]
+
+
+def create_build():
+    return (
+        BuildBuilder()
+        .with_name("1")
+        .with_branch_name("master")
+        .with_status("SUCCESS")
+        .construct()
+    )
+
+
+def read_entries(path):
+    with gzip.open(path, "rb") as fp:
+        return [json.loads(line) for line in fp]
+
+
+class TestResultSpool:
+    def test_segment_appears_on_close(self, tmp_path):
+        spool = ResultSpool(str(tmp_path))
+        spool.write_tests(create_records("a", "b"))
+
+        assert_that(segments(str(tmp_path)), is_(equal_to([])))
+        spool.close()
+
+        assert_that(segments(str(tmp_path)), is_(equal_to([spool.path])))
+        assert_that(
+            [entry["test"]["name"] for entry in read_entries(spool.path)],
+            is_(equal_to(["a", "b"])),
+        )
+
+    def test_empty_segment_is_removed(self, tmp_path):
+        spool = ResultSpool(str(tmp_path))
+        spool.close()
+
+        assert_that(os.listdir(str(tmp_path)), is_(equal_to([])))
+
+    def test_log_is_referenced_once(self, tmp_path):
+        spool = ResultSpool(str(tmp_path))
+        log_path = str(tmp_path / "log.html")
+
+        reference = spool.write_log(log_path, "output.xml")
+        spool.write_log(log_path, "output.xml")
+        spool.close()
+
+        assert_that(reference, is_(equal_to(os.path.abspath(log_path))))
+        assert_that(spool.is_log_reference(reference), is_(True))
+        assert_that(
+            read_entries(spool.path),
+            is_(equal_to([{"type": "log", "path": reference, "output": "output.xml"}])),
+        )
+
+
+class TestSpoolingServer:
+    def test_spools_once_the_receiver_fails(self, tmp_path):
+        server = Mock()
+        server.create_test_results.side_effect = [
+            None,
+            SeleneRequestError("down"),
+        ]
+        spooler = SpoolingServer(server, ResultSpool(str(tmp_path)))
+
+        spooler.create_test_results(create_records("a"))
+        spooler.create_test_results(create_records("b"))
+        spooler.create_test_cases(create_records("c"))
+        spooler.create_test_results(create_records("c"))
+        spooler.close()
+
+        assert_that(spooler.spooling, is_(True))
+        assert_that(server.create_test_cases.call_count, is_(equal_to(0)))
+        assert_that(server.create_test_results.call_count, is_(equal_to(2)))
+        assert_that(
+            [entry["test"]["name"] for entry in read_entries(spooler.spool.path)],
+            is_(equal_to(["b", "c"])),
+        )
+        server.close.assert_called_once()
+
+    def test_spools_only_what_the_receiver_did_not_accept(self, tmp_path):
+        server = Mock()
+
+        def accept_first(tests, posted):
+            posted(tests[:1])
+            raise SeleneRequestError("down")
+
+        server.create_test_results.side_effect = accept_first
+        spooler = SpoolingServer(server, ResultSpool(str(tmp_path)))
+        posted = []
+
+        spooler.create_test_results(create_records("a", "b", "c"), posted.extend)
+        spooler.close()
+
+        assert_that(
+            [entry["test"]["name"] for entry in read_entries(spooler.spool.path)],
+            is_(equal_to(["b", "c"])),
+        )
+        # Spooled tests are handed off too.
+        assert_that([test.name for test in posted], is_(equal_to(["a", "b", "c"])))
+
+    def test_failed_cases_are_not_reported_posted(self, tmp_path):
+        server = Mock()
+        server.create_test_cases.side_effect = SeleneRequestError("down")
+        spooler = SpoolingServer(server, ResultSpool(str(tmp_path)))
+        posted = []
+
+        spooler.create_test_cases(create_records("a"), posted.extend)
+        spooler.create_test_results(create_records("a"))
+        spooler.close()
+
+        assert_that(posted, is_(equal_to([])))
+        server.create_test_results.assert_not_called()
+        assert_that(len(read_entries(spooler.spool.path)), is_(equal_to(1)))
+
+    def test_failed_log_upload_starts_spooling(self, tmp_path):
+        spooler = SpoolingServer(Mock(), ResultSpool(str(tmp_path)))
+        upload = Mock(side_effect=LogUploadError("log.html", "500"))
+
+        reference = spooler.post_log("log.html", upload)
+        spooler.close()
+
+        assert_that(spooler.spooling, is_(True))
+        assert_that(reference, is_(equal_to(os.path.abspath("log.html"))))
+
+    def test_always_never_contacts_the_receiver(self, tmp_path):
+        server = Mock()
+        spooler = SpoolingServer(server, ResultSpool(str(tmp_path)), always=True)
+        upload = Mock()
+
+        spooler.create_build(create_build())
+        reference = spooler.post_log("log.html", upload)
+        spooler.create_test_case(create_records("a")[0])
+        spooler.create_test_result(create_records("a", log=reference)[0])
+        spooler.close()
+
+        upload.assert_not_called()
+        server.create_build.assert_not_called()
+        server.create_test_case.assert_not_called()
+        assert_that(
+            [entry["type"] for entry in read_entries(spooler.spool.path)],
+            is_(equal_to(["build", "log", "test"])),
+        )
+
+    def test_post_log_returns_stored_name(self, tmp_path):
+        spooler = SpoolingServer(Mock(), ResultSpool(str(tmp_path)))
+
+        log_file = spooler.post_log("log.html", Mock(return_value="stored.html"))
+        spooler.close()
+
+        assert_that(log_file, is_(equal_to("stored.html")))
+        assert_that(segments(str(tmp_path)), is_(equal_to([])))
+
+
+class TestSpoolReplay:
+    def write_segment(self, directory):
+        spool = ResultSpool(directory)
+        spool.write_build(create_build())
+        reference = spool.write_log(os.path.join(directory, "log.html"))
+        spool.write_tests(create_records("a", "b", "c", log=reference))
+        spool.close()
+        return spool.path
+
+    @patch("mongo_python.spool.SpoolReplay._upload_log", return_value="stored.html")
+    def test_replays_and_removes_segment(self, _, tmp_path):
+        server = Mock()
+        path = self.write_segment(str(tmp_path))
+
+        posted = SpoolReplay(server, jobs=2, batch_size=2).replay(str(tmp_path))
+
+        assert_that(posted, is_(equal_to(3)))
+        assert_that(os.path.exists(path), is_(False))
+        assert_that(server.create_build.call_args[0][0].name, is_(equal_to("1")))
+        batches = [call[0][0] for call in server.create_test_results.call_args_list]
+        assert_that(sorted(len(batch) for batch in batches), is_(equal_to([1, 2])))
+        assert_that(
+            {test.log for batch in batches for test in batch},
+            is_(equal_to({"stored.html"})),
+        )
+
+    @patch("mongo_python.spool.SpoolReplay._upload_log", return_value="stored.html")
+    def test_failed_segment_is_kept(self, _, tmp_path):
+        server = Mock()
+        server.create_test_results.side_effect = SeleneRequestError("down")
+        path = self.write_segment(str(tmp_path))
+
+        with pytest.raises(SeleneRequestError):
+            SpoolReplay(server).replay(str(tmp_path))
+
+        assert_that(os.path.exists(path), is_(True))
+
+    @patch("mongo_python.spool.SpoolReplay._upload_log", return_value=None)
+    def test_counts_tests_without_log(self, _, tmp_path):
+        self.write_segment(str(tmp_path))
+        replay = SpoolReplay(Mock())
+
+        replay.replay(str(tmp_path))
+
+        assert_that(replay.without_log, is_(equal_to(3)))
+
+    def test_missing_log_is_skipped(self, tmp_path, capsys):
+        replay = SpoolReplay(Mock())
+        log = {"path": str(tmp_path / "gone.html"), "output": None}
+
+        stored = replay._upload_log(log)  # pylint: disable=protected-access
+
+        assert_that(stored, is_(None))
+        assert_that("gone.html" in capsys.readouterr().out, is_(True))
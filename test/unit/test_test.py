@@ -1,8 +1,11 @@
+import json
 import xml.etree.ElementTree as ET
+from datetime import datetime
 import pytest
 from hamcrest import assert_that, equal_to, instance_of, is_
 
 from mongo_python.test import Test as _Test, TestBuilder as _TestBuilder
+from mongo_python.test import TIMESTAMP_FORMAT
 
 
 def create_test():
@@ -94,6 +97,28 @@ class TestTest:
         }
         assert_that(json, is_(equal_to(expected)))
 
+    def test_parse_record(self):
+        test = create_test()
+        sample_test = ET.fromstring(
+            "<test name='test'><status status='skip' \
+                             endtime='20180826 04:43:02.239' \
+                             starttime='20180826 04:43:00.939'> \
+                             </status></test>"
+        )
+        record = test.parse_record(sample_test, "suite")
+        expected = {
+            "name": "suite.test",
+            "result": "fail",
+            "critical": False,
+            "test_duration": 1.3,
+        }
+        assert_that(record.to_json(), is_(equal_to(expected)))
+        assert_that(test.result, is_(equal_to("pass")))
+
+    def test_payload(self):
+        test = create_test()
+        assert_that(json.loads(test.payload()), is_(equal_to(test.to_json())))
+
     def test_get_critical_value_when_false(self):
         test = create_test()
         sample_test = ET.fromstring(
@@ -110,3 +135,59 @@ class TestTest:
         test = create_test()
         result = test.get_name()
         assert_that(result, is_(equal_to("suite.test")))
+
+
+def create_status(**attributes):
+    status = ET.Element("status", status="PASS", **attributes)
+    test = ET.Element("test", name="test")
+    test.append(status)
+    return test
+
+
+class TestTestDuration:
+    @pytest.mark.parametrize(
+        "starttime, endtime, expected",
+        [
+            ("20180826 04:43:00.939", "20180826 04:43:02.239", 1.3),
+            ("20180826 23:59:59.500", "20180827 00:00:00.750", 1.25),
+            ("20180826 04:43:00.939000", "20180826 04:43:02.239500", 1.3005),
+            ("20180826 4:43:00.939", "20180826 04:43:02.239", 1.3),
+        ],
+    )
+    def test_start_and_end_times(self, starttime, endtime, expected):
+        test = create_status(starttime=starttime, endtime=endtime)
+        # pylint: disable=protected-access
+        result = create_test()._get_test_duration(test)
+        assert_that(result, is_(equal_to(expected)))
+
+    def test_matches_strptime(self):
+        starttime = "20180826 00:00:00.000"
+        for millis in range(0, 86400000, 8641):
+            endtime = "20180826 {0:02d}:{1:02d}:{2:02d}.{3:03d}".format(
+                millis // 3600000,
+                millis // 60000 % 60,
+                millis // 1000 % 60,
+                millis % 1000,
+            )
+            expected = (
+                datetime.strptime(endtime, TIMESTAMP_FORMAT)
+                - datetime.strptime(starttime, TIMESTAMP_FORMAT)
+            ).total_seconds()
+            test = create_status(starttime=starttime, endtime=endtime)
+            # pylint: disable=protected-access
+            result = create_test()._get_test_duration(test)
+            assert_that(result, is_(equal_to(expected)))
+
+    def test_robot_7_elapsed(self):
+        test = create_status(start="2023-12-13T13:27:15.123456", elapsed="2.500")
+        record = create_test().parse_record(test, "suite")
+        assert_that(record.test_duration, is_(equal_to(2.5)))
+        assert_that(record.critical, is_(True))
+
+    def test_invalid_time_is_rejected(self):
+        test = create_status(
+            starttime="20180826 04:43:00.939", endtime="20180826 04:61:02.239"
+        )
+        with pytest.raises(ValueError):
+            # pylint: disable=protected-access
+            create_test()._get_test_duration(test)
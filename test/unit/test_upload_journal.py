@@ -0,0 +1,194 @@
+import json
+
+from mock import patch
+from hamcrest import assert_that, equal_to, is_
+
+from mongo_python.record import TestRecord as _TestRecord
+from mongo_python.upload_journal import (
+    BUILD,
+    CASE,
+    JOURNAL_NAME,
+    LOG,
+    RESULT,
+    OutputJournal,
+    UploadJournal,
+    open_journal,
+)
+
+SCOPE = ["http://receiver", "master", "1", "One"]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def create_journal(path, resume=False, **kwargs):
+    return UploadJournal(str(path), SCOPE, resume, **kwargs)
+
+
+def read_lines(path):
+    with open(str(path)) as fp:
+        return [json.loads(line) for line in fp]
+
+
+class TestUploadJournal:
+    def test_resume_skips_acknowledged(self, tmp_path):
+        path = tmp_path / JOURNAL_NAME
+        journal = create_journal(path)
+        journal.record(BUILD, "1")
+        journal.record(LOG, "/results/log.html", "log-1.html")
+        journal.record_many(CASE, ["suite.a", "suite.b"])
+        journal.record(RESULT, "suite.a")
+        journal.close()
+
+        resumed = create_journal(path, resume=True)
+        rows = [(name, None) for name in ("suite.a", "suite.b", "suite.c")]
+
+        assert_that(resumed.acknowledged(BUILD, "1"), is_(True))
+        assert_that(resumed.value(LOG, "/results/log.html"), is_("log-1.html"))
+        assert_that([key for key, _ in resumed.pending(CASE, rows)], is_(["suite.c"]))
+        assert_that(
+            [key for key, _ in resumed.pending(RESULT, rows)],
+            is_(["suite.b", "suite.c"]),
+        )
+        resumed.close()
+
+    def test_without_resume_starts_fresh(self, tmp_path):
+        path = tmp_path / JOURNAL_NAME
+        journal = create_journal(path)
+        journal.record(BUILD, "1")
+        journal.close()
+
+        fresh = create_journal(path)
+
+        assert_that(fresh.acknowledged(BUILD, "1"), is_(False))
+        fresh.close()
+
+    def test_other_scope_is_discarded(self, tmp_path):
+        path = tmp_path / JOURNAL_NAME
+        journal = create_journal(path)
+        journal.record(BUILD, "1")
+        journal.close()
+
+        other = UploadJournal(str(path), SCOPE[:-1] + ["Two"], resume=True)
+
+        assert_that(other.acknowledged(BUILD, "1"), is_(False))
+        other.close()
+
+    def test_entries_are_appended_once(self, tmp_path):
+        path = tmp_path / JOURNAL_NAME
+        journal = create_journal(path)
+        journal.record_many(CASE, ["suite.a", "suite.a"])
+        journal.record(CASE, "suite.a")
+        journal.close()
+
+        assert_that(read_lines(path)[1:], is_(equal_to([[CASE, "suite.a"]])))
+
+    def test_fsync_is_batched(self, tmp_path):
+        clock = FakeClock()
+        journal = create_journal(
+            tmp_path / JOURNAL_NAME, sync_every=3, sync_interval=5.0, clock=clock
+        )
+
+        with patch("mongo_python.upload_journal.os.fsync") as mock_fsync:
+            journal.record_many(CASE, ["a", "b"])
+            journal.record(CASE, "c")
+            journal.record(CASE, "d")
+            clock.now = 6.0
+            journal.record(CASE, "e")
+            journal.close()
+
+        # After the third entry, then once the interval passed; close has
+        # nothing left to sync.
+        assert_that(mock_fsync.call_count, is_(equal_to(2)))
+
+    def test_torn_line_is_dropped(self, tmp_path):
+        path = tmp_path / JOURNAL_NAME
+        journal = create_journal(path)
+        journal.record(RESULT, "suite.a")
+        journal.close()
+        with open(str(path), "a") as fp:
+            fp.write('["result","suite.')
+
+        resumed = create_journal(path, resume=True)
+        resumed.record(RESULT, "suite.b")
+        resumed.close()
+
+        assert_that(
+            read_lines(path)[1:],
+            is_(equal_to([[RESULT, "suite.a"], [RESULT, "suite.b"]])),
+        )
+
+    def test_compaction_drops_cases_with_results(self, tmp_path):
+        path = tmp_path / JOURNAL_NAME
+        names = ["suite.test{0}".format(index) for index in range(600)]
+        journal = create_journal(path)
+        journal.record_many(CASE, names)
+        journal.record_many(RESULT, names)
+        journal.close()
+
+        create_journal(path, resume=True).close()
+
+        lines = read_lines(path)
+        assert_that(lines[0]["scope"], is_(equal_to(SCOPE)))
+        assert_that(lines[1:], is_(equal_to([[RESULT, name] for name in names])))
+
+    def test_open_journal_without_directory(self, tmp_path):
+        journal = open_journal(str(tmp_path / "missing"), SCOPE)
+
+        assert_that(journal, is_(None))
+
+
+def create_tests(*names):
+    return [_TestRecord(name, "pass") for name in names]
+
+
+class TestOutputJournal:
+    def test_repeated_names_get_their_own_keys(self, tmp_path):
+        journal = create_journal(tmp_path / JOURNAL_NAME)
+        output = OutputJournal(journal, "shard/output.xml")
+
+        first = output.keyed(create_tests("suite.a", "suite.a"))
+        second = output.keyed(create_tests("suite.a"))
+
+        assert_that(
+            [key for key, _ in first + second],
+            is_(
+                equal_to(
+                    [
+                        ("shard/output.xml", "suite.a", 0),
+                        ("shard/output.xml", "suite.a", 1),
+                        ("shard/output.xml", "suite.a", 2),
+                    ]
+                )
+            ),
+        )
+        journal.close()
+
+    def test_only_resumed_runs_skip_tests(self, tmp_path):
+        path = tmp_path / JOURNAL_NAME
+        journal = create_journal(path)
+        output = OutputJournal(journal, "output.xml")
+        rows = output.keyed(create_tests("suite.a", "suite.b"))
+        output.record(RESULT, rows[:1])
+
+        assert_that(output.pending(RESULT, rows), is_(equal_to(rows)))
+        journal.close()
+
+        resumed = create_journal(path, resume=True)
+        output = OutputJournal(resumed, "output.xml")
+        rows = output.keyed(create_tests("suite.a", "suite.b"))
+
+        assert_that(
+            [test.name for _, test in output.pending(RESULT, rows)],
+            is_(equal_to(["suite.b"])),
+        )
+        assert_that(
+            [test.name for _, test in output.pending(CASE, rows)],
+            is_(equal_to(["suite.b"])),
+        )
+        resumed.close()